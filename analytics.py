@@ -0,0 +1,218 @@
+import sys
+import time
+
+import numpy as np
+
+
+class RunningStats:
+    """Welford mean and variance of many independent series at once.
+
+    add() takes one value per series (and an optional mask of the series it
+    applies to), so a whole population is updated in one vectorized call and
+    memory stays constant however long the run is.
+    """
+
+    def __init__(self, count=0):
+        self.count = np.zeros(count)
+        self.mean = np.zeros(count)
+        self.m2 = np.zeros(count)
+
+    def resize(self, count, keep=None):
+        for name in ("count", "mean", "m2"):
+            values = getattr(self, name)
+            values = values[:count] if keep is None else values[keep]
+            setattr(self, name, np.concatenate((values, np.zeros(count - len(values)))))
+
+    def add(self, values, mask=True):
+        values = np.asarray(values, dtype=float)
+        mask = np.broadcast_to(mask, self.count.shape)
+        self.count += mask
+        delta = np.where(mask, values - self.mean, 0)
+        self.mean += delta / np.maximum(self.count, 1)
+        self.m2 += delta * np.where(mask, values - self.mean, 0)
+
+    @property
+    def variance(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.count > 0, self.m2 / self.count, np.nan)
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    def means(self):
+        return np.where(self.count > 0, self.mean, np.nan)
+
+
+class Histogram:
+    """Counts over fixed bin edges; values outside the edges go to the end bins."""
+
+    def __init__(self, edges):
+        self.edges = np.asarray(edges, dtype=float)
+        self.counts = np.zeros(len(self.edges) - 1, dtype=np.int64)
+
+    def add(self, values):
+        values = np.asarray(values, dtype=float).reshape(-1)
+        bins = np.clip(np.searchsorted(self.edges, values, side="right") - 1, 0, len(self.counts) - 1)
+        self.counts += np.bincount(bins, minlength=len(self.counts))
+
+
+class TrajectoryAnalytics:
+    """Behaviour metrics of a population, updated online every step.
+
+    update() takes the current positions (n, 2) and headings (n,) in
+    degrees, optionally the sun position and any per-vehicle boolean flags
+    (e.g. friend_detected=...). Nothing per step is kept; each metric is a
+    running sum or a RunningStats over the population:
+
+    - time_to_reach: time until a vehicle first came within `reach_distance`
+      of the sun (nan if it has not)
+    - orbit_radius mean and variance: distance to the sun from then on
+    - tortuosity: path length over net displacement (1 is a straight line)
+    - angular_velocity mean and std per vehicle, and a population
+      histogram over `turn_edges`, in degrees per unit of dt
+    - the fraction of time each flag was set
+
+    With a width and height, steps across a wrapped edge are unwrapped to
+    the shortest way round. The population may grow or shrink between
+    updates; vehicles are matched by index and new ones start fresh. When
+    vehicles are removed from anywhere but the end, call resize() with the
+    rows to keep so the others do not inherit their statistics.
+    """
+
+    def __init__(self, count=0, reach_distance=60, width=None, height=None,
+                 turn_edges=np.linspace(-30, 30, 61)):
+        self.reach_distance = reach_distance
+        self.size = None if width is None else np.array([width, height], dtype=float)
+        self.turns = Histogram(turn_edges)
+        self.orbit = RunningStats()
+        self.turn = RunningStats()
+        self.time = 0.0
+        self.steps = 0
+        self.with_sun = False
+        self.count = 0
+        self.previous = np.empty((0, 2))
+        self.heading = np.empty(0)
+        self.reached = np.empty(0)  # Time it took to reach the sun
+        self.first_seen = np.empty(0)
+        self.path_length = np.empty(0)
+        self.displacement = np.empty((0, 2))
+        self.observed = np.empty(0)
+        self.flags = {}  # name -> time each vehicle had it set
+        self.resize(count)
+
+    def resize(self, count, keep=None):
+        """Keep the first `count` rows, or the rows `keep` (indices or a mask)
+        in that order, then add fresh rows up to `count`."""
+        if keep is not None:
+            keep = np.arange(self.count)[keep]
+
+        def fit(values, fill):
+            values = values[:count] if keep is None else values[keep]
+            return np.concatenate((values, np.full((count - len(values),) + values.shape[1:], fill)))
+
+        self.previous = fit(self.previous, np.nan)
+        self.heading = fit(self.heading, np.nan)
+        self.reached = fit(self.reached, np.nan)
+        self.first_seen = fit(self.first_seen, self.time)
+        self.path_length = fit(self.path_length, 0.0)
+        self.displacement = fit(self.displacement, 0.0)
+        self.observed = fit(self.observed, 0.0)
+        self.flags = {name: fit(values, 0.0) for name, values in self.flags.items()}
+        self.orbit.resize(count, keep)
+        self.turn.resize(count, keep)
+        self.count = count
+
+    def update(self, positions, headings, sun_position=None, dt=1.0, **flags):
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        headings = np.asarray(headings, dtype=float).reshape(-1)
+        if len(positions) != self.count:
+            self.resize(len(positions))
+        tracked = ~np.isnan(self.heading)
+        self.time += dt
+        self.steps += 1
+
+        step = positions - self.previous
+        if self.size is not None:
+            step -= self.size * np.round(step / self.size)
+        step[~tracked] = 0
+        self.path_length += np.hypot(step[:, 0], step[:, 1])
+        self.displacement += step
+
+        turn = (headings - self.heading + 180) % 360 - 180
+        self.turn.add(turn / dt, tracked)
+        self.turns.add(turn[tracked] / dt)
+
+        if sun_position is not None:
+            self.with_sun = True
+            distance = np.hypot(positions[:, 0] - sun_position[0], positions[:, 1] - sun_position[1])
+            arrived = np.isnan(self.reached) & (distance <= self.reach_distance)
+            self.reached[arrived] = self.time - self.first_seen[arrived]
+            self.orbit.add(distance, ~np.isnan(self.reached))
+
+        self.observed += dt
+        for name, value in flags.items():
+            if name not in self.flags:
+                self.flags[name] = np.zeros(self.count)
+            self.flags[name] += np.broadcast_to(np.asarray(value, dtype=float), (self.count,)) * dt
+
+        self.previous = positions.copy()
+        self.heading = headings.copy()
+
+    def summary(self):
+        """Every metric as arrays over the population (nan where undefined)."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            net = np.hypot(self.displacement[:, 0], self.displacement[:, 1])
+            tortuosity = np.where(net > 0, self.path_length / net, np.nan)
+            observed = np.where(self.observed > 0, self.observed, np.nan)
+            return {
+                "steps": self.steps,
+                "time": self.time,
+                "time_to_reach": self.reached.copy(),
+                "orbit_radius_mean": self.orbit.means(),
+                "orbit_radius_variance": self.orbit.variance,
+                "tortuosity": tortuosity,
+                "path_length": self.path_length.copy(),
+                "angular_velocity_mean": self.turn.means(),
+                "angular_velocity_std": self.turn.std,
+                "angular_velocity_histogram": (self.turns.counts.copy(), self.turns.edges),
+                "fractions": {name: values / observed for name, values in self.flags.items()},
+            }
+
+    def report(self):
+        """Population medians of the summary, for a HUD or a log."""
+        summary = self.summary()
+
+        def median(values):
+            values = values[~np.isnan(values)]
+            return f"{np.median(values):.2f}" if len(values) else "-"
+
+        lines = [f"{self.count} vehicles, {self.steps} steps"]
+        if self.with_sun:
+            reached = summary["time_to_reach"]
+            lines += [f"Reached sun: {np.sum(~np.isnan(reached))}/{self.count}, "
+                      f"median time {median(reached)}",
+                      f"Orbit radius: {median(summary['orbit_radius_mean'])} "
+                      f"(sd {median(np.sqrt(summary['orbit_radius_variance']))})"]
+        lines += [f"Tortuosity: {median(summary['tortuosity'])}",
+                  f"Angular velocity: {median(summary['angular_velocity_mean'])} "
+                  f"(sd {median(summary['angular_velocity_std'])})"]
+        lines += [f"Fraction {name}: {median(values)}" for name, values in summary["fractions"].items()]
+        return lines
+
+
+if __name__ == "__main__":
+    # python analytics.py [vehicles] [steps]
+    from swarm import Swarm
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 600
+    rng = np.random.default_rng(0)
+    swarm = Swarm(rng.uniform((0, 0), (800, 600), size=(n, 2)), rng.uniform(0, 360, size=n))
+    analytics = TrajectoryAnalytics(n, width=swarm.width, height=swarm.height)
+    start = time.perf_counter()
+    for _ in range(steps):
+        swarm.step((400, 300))
+        analytics.update(swarm.positions, swarm.directions, (400, 300))
+    print("\n".join(analytics.report()))
+    print(f"{steps / (time.perf_counter() - start):.1f} steps/s")
@@ -0,0 +1,196 @@
+import numpy as np
+
+MAX_LEVEL = 16  # Morton codes use 16 bits per axis
+
+
+def _spread_bits(v):
+    v = v.astype(np.uint64) & np.uint64(0xFFFF)
+    v = (v | (v << np.uint64(8))) & np.uint64(0x00FF00FF)
+    v = (v | (v << np.uint64(4))) & np.uint64(0x0F0F0F0F)
+    v = (v | (v << np.uint64(2))) & np.uint64(0x33333333)
+    v = (v | (v << np.uint64(1))) & np.uint64(0x55555555)
+    return v
+
+
+def _expand_ranges(starts, counts):
+    """Concatenate arange(start, start + count) for every pair."""
+    total = counts.sum()
+    first = np.repeat(np.cumsum(counts) - counts, counts)
+    return np.arange(total) - first + np.repeat(starts, counts)
+
+
+class QuadTree:
+    """Quadtree over point sources for summed inverse-distance fields.
+
+    evaluate() returns sum(weight / max(min_distance, d)) at every query point,
+    replacing whole far-away cells by their total weight at their centre of
+    mass whenever the cell's radius is smaller than `theta` times its
+    distance (Barnes-Hut). theta=0 is exact. Weights must be non-negative.
+    """
+
+    def __init__(self, positions, weights=None, leaf_size=8, min_distance=1.0):
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        if weights is None:
+            weights = np.ones(len(positions))
+        weights = np.broadcast_to(np.asarray(weights, dtype=float), (len(positions),))
+        if np.any(weights < 0):
+            raise ValueError("QuadTree weights must be non-negative")
+        self.leaf_size = leaf_size
+        self.min_distance = min_distance
+
+        # Sort sources along a Morton curve so every tree node is a contiguous range
+        if len(positions):
+            low = positions.min(axis=0)
+            extent = max(float((positions.max(axis=0) - low).max()), 1e-9)
+        else:
+            low, extent = np.zeros(2), 1.0
+        cells = np.minimum(((positions - low) / extent * 65536).astype(np.int64), 65535)
+        codes = _spread_bits(cells[:, 0]) | (_spread_bits(cells[:, 1]) << np.uint64(1))
+        order = np.argsort(codes, kind="stable")
+        self.codes = codes[order]
+        self.positions = positions[order]
+        self.weights = np.ascontiguousarray(weights[order])
+
+        self._build()
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _node_stats(self, sources, firsts):
+        # Total weight, centre of mass and bounding radius of consecutive groups
+        w = self.weights[sources]
+        p = self.positions[sources]
+        weight = np.add.reduceat(w, firsts)
+        weighted = np.add.reduceat(p * w[:, None], firsts)
+        plain = np.add.reduceat(p, firsts) / np.diff(np.append(firsts, len(sources)))[:, None]
+        safe = np.where(weight > 0, weight, 1.0)[:, None]
+        com = np.where(weight[:, None] > 0, weighted / safe, plain)
+        group = np.repeat(np.arange(len(firsts)), np.diff(np.append(firsts, len(sources))))
+        spread = np.hypot(*(p - com[group]).T)
+        radius = np.maximum.reduceat(spread, firsts)
+        return weight, com, radius
+
+    def _build(self):
+        n = len(self.positions)
+        starts, counts, weights, coms, radii = [], [], [], [], []
+        parents = []
+        if n:
+            weight, com, radius = self._node_stats(np.arange(n), np.array([0]))
+            starts.append(np.array([0]))
+            counts.append(np.array([n]))
+            weights.append(weight)
+            coms.append(com)
+            radii.append(radius)
+            parents.append(np.array([-1]))
+        node_count = len(starts)
+        split = np.arange(node_count) if n > self.leaf_size else np.empty(0, dtype=np.int64)
+        all_starts = np.concatenate(starts) if starts else np.empty(0, dtype=np.int64)
+        all_counts = np.concatenate(counts) if counts else np.empty(0, dtype=np.int64)
+
+        for level in range(1, MAX_LEVEL + 1):
+            if len(split) == 0:
+                break
+            sources = _expand_ranges(all_starts[split], all_counts[split])
+            owner = np.repeat(split, all_counts[split])
+            prefix = self.codes[sources] >> np.uint64(2 * (MAX_LEVEL - level))
+            new = np.ones(len(sources), dtype=bool)
+            new[1:] = (prefix[1:] != prefix[:-1]) | (owner[1:] != owner[:-1])
+            firsts = np.flatnonzero(new)
+
+            child_starts = sources[firsts]
+            child_counts = np.diff(np.append(firsts, len(sources)))
+            weight, com, radius = self._node_stats(sources, firsts)
+            child_ids = np.arange(node_count, node_count + len(firsts))
+
+            starts.append(child_starts)
+            counts.append(child_counts)
+            weights.append(weight)
+            coms.append(com)
+            radii.append(radius)
+            parents.append(owner[firsts])
+            node_count += len(firsts)
+            all_starts = np.concatenate((all_starts, child_starts))
+            all_counts = np.concatenate((all_counts, child_counts))
+
+            split = child_ids[child_counts > self.leaf_size] if level < MAX_LEVEL \
+                else np.empty(0, dtype=np.int64)
+
+        self.start = all_starts
+        self.count = all_counts
+        self.weight = np.concatenate(weights) if weights else np.empty(0)
+        self.com = np.concatenate(coms) if coms else np.empty((0, 2))
+        self.radius = np.concatenate(radii) if radii else np.empty(0)
+
+        # Children of a node are stored consecutively after its level
+        parent = np.concatenate(parents) if parents else np.empty(0, dtype=np.int64)
+        self.first_child = np.full(node_count, -1, dtype=np.int64)
+        self.child_count = np.zeros(node_count, dtype=np.int64)
+        has_parent = np.flatnonzero(parent >= 0)
+        if len(has_parent):
+            unique, first, count = np.unique(parent[has_parent], return_index=True,
+                                             return_counts=True)
+            self.first_child[unique] = has_parent[first]
+            self.child_count[unique] = count
+
+    def exact(self, points, chunk=1024):
+        """Brute-force field, for validation."""
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        values = np.zeros(len(points))
+        for lo in range(0, len(self.positions), chunk):
+            delta = self.positions[None, lo:lo + chunk] - points[:, None]
+            distance = np.maximum(np.hypot(delta[..., 0], delta[..., 1]), self.min_distance)
+            values += (self.weights[None, lo:lo + chunk] / distance).sum(axis=1)
+        return values
+
+    def evaluate(self, points, theta=0.5, chunk=1024):
+        """Approximate field and a guaranteed bound on its absolute error."""
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        values = np.zeros(len(points))
+        bound = np.zeros(len(points))
+        if len(self.positions) == 0:
+            return values, bound
+        for lo in range(0, len(points), chunk):
+            hi = min(lo + chunk, len(points))
+            v, b = self._evaluate_chunk(points[lo:hi], theta)
+            values[lo:hi] = v
+            bound[lo:hi] = b
+        return values, bound
+
+    def _evaluate_chunk(self, points, theta):
+        m = len(points)
+        values = np.zeros(m)
+        bound = np.zeros(m)
+        query = np.arange(m)
+        nodes = np.zeros(m, dtype=np.int64)
+
+        while len(query):
+            delta = self.com[nodes] - points[query]
+            distance = np.hypot(delta[:, 0], delta[:, 1])
+            radius = self.radius[nodes]
+
+            # Far enough that no source in the cell falls under the min_distance clamp
+            far = (radius <= theta * distance) & (distance - radius >= self.min_distance)
+            if far.any():
+                q, node, d, r = query[far], nodes[far], distance[far], radius[far]
+                w = self.weight[node]
+                values += np.bincount(q, w / d, minlength=m)
+                # |1/x - 1/d| <= r / (d * (d - r)) for every source within r of the centre
+                bound += np.bincount(q, w * r / (d * (d - r)), minlength=m)
+
+            near = ~far
+            leaf = near & (self.first_child[nodes] < 0)
+            if leaf.any():
+                q, node = query[leaf], nodes[leaf]
+                counts = self.count[node]
+                sources = _expand_ranges(self.start[node], counts)
+                q = np.repeat(q, counts)
+                delta = self.positions[sources] - points[q]
+                d = np.maximum(np.hypot(delta[:, 0], delta[:, 1]), self.min_distance)
+                values += np.bincount(q, self.weights[sources] / d, minlength=m)
+
+            inner = near & ~leaf
+            counts = self.child_count[nodes[inner]]
+            query = np.repeat(query[inner], counts)
+            nodes = _expand_ranges(self.first_child[nodes[inner]], counts)
+
+        return values, bound
@@ -0,0 +1,104 @@
+import numpy as np
+import pygame
+
+
+class Camera:
+    """A pan/zoom view of a world that may be much larger than the window.
+
+    `center` is the world point shown in the middle of the window and `zoom`
+    is window pixels per world unit. Drawing code converts world coordinates
+    with to_screen() and skips anything visible() rejects, so only what is in
+    the viewport costs anything to draw. Wheel zooms about the cursor, right
+    or middle drag and the arrow keys pan, Home fits the whole world.
+    """
+
+    def __init__(self, screen_size, world_size, center=None, zoom=1.0, max_zoom=8.0):
+        self.screen_size = np.array(screen_size, dtype=float)
+        self.world_size = np.array(world_size, dtype=float)
+        self.center = np.array(center if center is not None else self.world_size / 2, dtype=float)
+        self.zoom = zoom
+        self.min_zoom = min(1.0, (self.screen_size / self.world_size).min()) / 2
+        self.max_zoom = max_zoom
+        self.dragging = False
+
+    def to_screen(self, points):
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        return (points - self.center) * self.zoom + self.screen_size / 2
+
+    def to_screen_point(self, point):
+        x, y = self.to_screen(point)[0].tolist()
+        return (x, y)
+
+    def to_world(self, point):
+        x, y = ((np.asarray(point, dtype=float) - self.screen_size / 2) / self.zoom + self.center).tolist()
+        return (x, y)
+
+    def viewport(self):
+        """Visible world rectangle as (left, top, right, bottom)."""
+        half = self.screen_size / 2 / self.zoom
+        return (*(self.center - half), *(self.center + half))
+
+    def visible(self, points, margin=0.0):
+        """Mask of points within `margin` world units of the viewport."""
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        left, top, right, bottom = self.viewport()
+        return ((points[:, 0] >= left - margin) & (points[:, 0] <= right + margin) &
+                (points[:, 1] >= top - margin) & (points[:, 1] <= bottom + margin))
+
+    def pan(self, dx, dy):
+        """Move the view by a number of window pixels."""
+        self.center += np.array([dx, dy]) / self.zoom
+
+    def zoom_at(self, factor, screen_point):
+        # Keep the world point under the cursor fixed while zooming
+        anchor = np.array(self.to_world(screen_point))
+        self.zoom = float(np.clip(self.zoom * factor, self.min_zoom, self.max_zoom))
+        self.center += anchor - np.array(self.to_world(screen_point))
+
+    def fit(self):
+        self.center = self.world_size / 2
+        self.zoom = float((self.screen_size / self.world_size).min())
+
+    def world_event(self, event):
+        """A copy of a mouse event with its position in world coordinates."""
+        if not hasattr(event, "pos"):
+            return event
+        return pygame.event.Event(event.type, {**event.dict, "pos": self.to_world(event.pos)})
+
+    def handle_event(self, event):
+        """Apply camera controls; True if the event was used."""
+        if event.type == pygame.MOUSEWHEEL:
+            self.zoom_at(1.2 ** event.y, pygame.mouse.get_pos())
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button in (2, 3):
+            self.dragging = True
+        elif event.type == pygame.MOUSEBUTTONUP and event.button in (2, 3):
+            self.dragging = False
+        elif event.type == pygame.MOUSEMOTION and self.dragging:
+            self.pan(-event.rel[0], -event.rel[1])
+        elif event.type == pygame.KEYDOWN and event.key in PAN_KEYS:
+            dx, dy = PAN_KEYS[event.key]
+            self.pan(dx * self.screen_size[0] / 4, dy * self.screen_size[1] / 4)
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_HOME:
+            self.fit()
+        else:
+            return False
+        return True
+
+    def blit_image(self, surface, image, world_rect=None, smooth=False):
+        """Draw the visible part of an image that covers `world_rect` (default: the world)."""
+        x, y, width, height = world_rect or (0, 0, *self.world_size)
+        scale = np.array(image.get_size()) / (width, height)
+        left, top, right, bottom = self.viewport()
+        lo = np.floor((np.maximum((left, top), (x, y)) - (x, y)) * scale).astype(int)
+        hi = np.ceil((np.minimum((right, bottom), (x + width, y + height)) - (x, y)) * scale).astype(int)
+        hi = np.minimum(hi, image.get_size())
+        if (hi <= lo).any():
+            return
+        part = image.subsurface(pygame.Rect(*lo, *(hi - lo)))
+        corner = self.to_screen(lo / scale + (x, y))[0]
+        size = np.ceil((hi - lo) / scale * self.zoom).astype(int)
+        scale = pygame.transform.smoothscale if smooth else pygame.transform.scale
+        surface.blit(scale(part, size), corner)
+
+
+PAN_KEYS = {pygame.K_LEFT: (-1, 0), pygame.K_RIGHT: (1, 0), pygame.K_UP: (0, -1), pygame.K_DOWN: (0, 1)}
@@ -0,0 +1,69 @@
+import numpy as np
+
+from neighbours import CellList
+
+
+def headings(directions):
+    """Unit heading vectors for directions in degrees (0 is up, as Vector2(0, -1).rotate)."""
+    radians = np.radians(directions)
+    return np.column_stack((np.sin(radians), -np.cos(radians)))
+
+
+def directions_of(vectors):
+    return np.degrees(np.arctan2(vectors[:, 0], -vectors[:, 1]))
+
+
+class CollisionResolver:
+    """Resolves all circle contacts of a step at once.
+
+    Every overlapping pair is found through a CellList. A vehicle in several
+    contacts reflects its heading once, about the sum of its contact normals,
+    and is pushed out by half of each overlap. The sums are taken over pairs
+    sorted by index, so the result does not depend on the order vehicles are
+    stored in or pairs are found.
+    """
+
+    def __init__(self, width, height, max_radius, periodic=False):
+        self.cells = CellList(2 * max_radius, width, height, periodic=periodic)
+
+    def contacts(self, positions, radii):
+        """Unique overlapping pairs i < j, sorted, with unit normals from j to i and overlap depths."""
+        radii = np.broadcast_to(np.asarray(radii, dtype=float), (len(positions),))
+        i, j, offset, distance = self.cells.build(positions).pairs()
+        keep = (i < j) & (distance < radii[i] + radii[j])
+        i, j, offset, distance = i[keep], j[keep], offset[keep], distance[keep]
+        order = np.lexsort((j, i))
+        i, j, offset, distance = i[order], j[order], offset[order], distance[order]
+
+        normals = np.empty_like(offset)
+        apart = distance > 0
+        normals[apart] = -offset[apart] / distance[apart, None]
+        normals[~apart] = (1.0, 0.0)  # Coincident centres: separate along x
+        return i, j, normals, radii[i] + radii[j] - distance
+
+    def resolve(self, positions, directions, radii):
+        """Return new (positions, directions) and the colliding pairs (i, j)."""
+        positions = np.array(positions, dtype=float).reshape(-1, 2)
+        directions = np.array(directions, dtype=float).reshape(-1)
+        n = len(positions)
+        i, j, normals, overlap = self.contacts(positions, radii)
+        if len(i) == 0:
+            return positions, directions, i, j
+
+        def gather(values):
+            # Per-vehicle sum of a per-pair vector, +values on i and -values on j
+            index = np.concatenate((i, j))
+            stacked = np.concatenate((values, -values))
+            return np.column_stack([np.bincount(index, stacked[:, k], minlength=n) for k in range(2)])
+
+        normal = gather(normals)
+        length = np.hypot(normal[:, 0], normal[:, 1])
+        hit = length > 1e-9
+        normal[hit] /= length[hit, None]
+
+        heading = headings(directions[hit])
+        dot = np.einsum("ij,ij->i", heading, normal[hit])
+        directions[hit] = directions_of(heading - 2 * dot[:, None] * normal[hit])
+
+        positions += gather(normals * (overlap / 2)[:, None])
+        return positions, directions, i, j
@@ -0,0 +1,177 @@
+import asyncio
+import inspect
+import json
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+log = logging.getLogger(__name__)
+
+
+class Metrics:
+    """Step rate and per-phase timings, updated by the main loop.
+
+    Updates and snapshot() take a lock, so the server thread never reads
+    the dicts while the loop is changing them.
+    """
+
+    def __init__(self, smoothing=0.1):
+        self.smoothing = smoothing
+        self.steps = 0
+        self.steps_per_second = 0.0
+        self.phases = {}
+        self.values = {}
+        self.last_tick = time.perf_counter()
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        yield
+        elapsed = (time.perf_counter() - start) * 1000
+        with self.lock:
+            previous = self.phases.get(name, elapsed)
+            self.phases[name] = previous + self.smoothing * (elapsed - previous)
+
+    def tick(self, **values):
+        now = time.perf_counter()
+        rate = 1 / max(now - self.last_tick, 1e-9)
+        with self.lock:
+            self.steps_per_second += self.smoothing * (rate - self.steps_per_second)
+            self.last_tick = now
+            self.steps += 1
+            self.values.update(values)
+
+    def note(self, **values):
+        """Report values without counting a step, e.g. from the draw loop."""
+        with self.lock:
+            self.values.update(values)
+
+    def snapshot(self):
+        # Noted values are replaced, never changed in place, so a shallow copy is enough
+        with self.lock:
+            return {
+                "steps": self.steps,
+                "steps_per_second": round(self.steps_per_second, 2),
+                "phase_ms": {name: round(ms, 3) for name, ms in self.phases.items()},
+                **self.values,
+            }
+
+
+class ControlServer:
+    """Localhost HTTP endpoint for metrics and commands, served by asyncio.
+
+    GET /metrics returns Metrics.snapshot() as JSON. POST /command with a JSON
+    body {"name": ..., "args": {...}} queues a command and returns
+    immediately (commands are POST-only, so a prefetch or a followed link
+    cannot change the simulation); the main loop runs queued
+    commands with apply(), so the server never touches simulation state and
+    never waits on the loop. Arguments are checked against the handler's
+    signature and converted by its annotations (e.g. `x: float`) before
+    queueing, so a bad command gets a 400 rather than reaching the loop.
+    """
+
+    def __init__(self, handlers, metrics, host="127.0.0.1", port=8765):
+        self.handlers = handlers
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.commands = queue.Queue()
+        self.loop = None
+        self.server = None
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        self.ready.wait()
+        return self
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(
+            asyncio.start_server(self.handle, self.host, self.port))
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.ready.set()
+        try:
+            self.loop.run_until_complete(self.server.serve_forever())
+        except asyncio.CancelledError:
+            pass  # stop() closed the server
+
+    def stop(self):
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.server.close)
+            self.thread.join(timeout=1)
+
+    def apply(self):
+        """Run queued commands; call once per frame from the main loop."""
+        while True:
+            try:
+                name, args = self.commands.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                self.handlers[name](**args)
+            except Exception:
+                log.exception("command %r with %r failed", name, args)
+
+    @staticmethod
+    def convert(handler, args):
+        """Bind args to the handler's signature, converting annotated parameters."""
+        signature = inspect.signature(handler)
+        bound = signature.bind(**args)
+        for name, value in bound.arguments.items():
+            annotation = signature.parameters[name].annotation
+            if annotation in (int, float, str):
+                bound.arguments[name] = annotation(value)
+        return dict(bound.arguments)
+
+    async def handle(self, reader, writer):
+        try:
+            request = await reader.readline()
+            method, target, _ = request.decode("latin-1").split(" ", 2)
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                key, _, value = line.decode("latin-1").partition(":")
+                if key.strip().lower() == "content-length":
+                    length = int(value)
+            body = await reader.readexactly(length) if length else b""
+            status, payload = self.respond(method, target, body)
+        except (ValueError, json.JSONDecodeError, asyncio.IncompleteReadError) as error:
+            status, payload = "400 Bad Request", {"error": str(error)}
+
+        data = json.dumps(payload).encode()
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode() + data)
+        await writer.drain()
+        writer.close()
+
+    def respond(self, method, target, body):
+        url = urlsplit(target)
+        if url.path == "/metrics" and method == "GET":
+            return "200 OK", self.metrics.snapshot()
+        if url.path == "/command" and method != "POST":
+            return "405 Method Not Allowed", {"error": "commands must be sent with POST"}
+        if url.path == "/command":
+            message = json.loads(body or b"{}")
+            if not isinstance(message, dict):
+                message = {}
+            name, args = message.get("name"), message.get("args", {})
+            if not isinstance(name, str) or not isinstance(args, dict):
+                return "400 Bad Request", {"error": 'expected {"name": "...", "args": {...}}'}
+            if name not in self.handlers:
+                return "404 Not Found", {"error": f"unknown command {name!r}",
+                                         "commands": sorted(self.handlers)}
+            try:
+                args = self.convert(self.handlers[name], args)
+            except (TypeError, ValueError) as error:
+                return "400 Bad Request", {"error": f"{name}: {error}"}
+            self.commands.put((name, args))
+            return "202 Accepted", {"queued": name}
+        return "404 Not Found", {"error": "try GET /metrics or POST /command"}
@@ -0,0 +1,276 @@
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from swarm import Swarm
+
+
+def strip_of(x, width, strips):
+    """Index of the vertical strip containing each x."""
+    return np.minimum((np.asarray(x) * strips // width).astype(np.int32), strips - 1)
+
+
+def band_width(options):
+    """How close to a strip edge a vehicle must be to matter to the neighbour:
+    the mutual cutoff plus the furthest a vehicle can travel in one step."""
+    swarm = Swarm(np.empty((0, 2)), np.empty(0), **options)
+    halo = swarm.mutual_cutoff if swarm.mutual else 0
+    return halo + swarm.speed_scaling / swarm.fps + swarm.radius
+
+
+def edge_bands(x, lo, hi, width, band):
+    """Masks of the x within `band` of the edges lo and hi, either side, wrapped."""
+    def near(edge):
+        offset = (x - edge) % width
+        return (offset < band) | (offset > width - band)
+    return near(lo), near(hi)
+
+
+class SharedState:
+    """Double-buffered vehicle state in shared memory.
+
+    Buffer k holds positions (n, 2), directions (n,) and owner (n,), and for
+    every strip the ids of its vehicles near its left and right edges
+    (bands (strips, 2, n) with counts (strips, 2)). During a step every
+    worker reads buffer `parity` and writes only its own rows and bands of
+    buffer `1 - parity`, so no locking is needed. The bands are sized for the
+    worst case, but shared memory only takes up the pages that are written.
+    """
+
+    def __init__(self, n, strips, names=None):
+        self.n = n
+        sizes = [n * 2 * 8, n * 8, n * 4, strips * 2 * n * 4, strips * 2 * 8] * 2 + [4 * 8]
+        create = names is None
+        if create:
+            self.blocks = [shared_memory.SharedMemory(create=True, size=max(size, 1))
+                           for size in sizes]
+        else:
+            self.blocks = [shared_memory.SharedMemory(name=name) for name in names]
+        self.names = [block.name for block in self.blocks]
+
+        self.positions, self.directions, self.owner, self.bands, self.counts = [], [], [], [], []
+        for k in range(2):
+            p, d, o, b, c = self.blocks[5 * k:5 * k + 5]
+            self.positions.append(np.ndarray((n, 2), dtype=np.float64, buffer=p.buf))
+            self.directions.append(np.ndarray((n,), dtype=np.float64, buffer=d.buf))
+            self.owner.append(np.ndarray((n,), dtype=np.int32, buffer=o.buf))
+            self.bands.append(np.ndarray((strips, 2, n), dtype=np.int32, buffer=b.buf))
+            self.counts.append(np.ndarray((strips, 2), dtype=np.int64, buffer=c.buf))
+        # sun x, sun y, steps to run, stop flag
+        self.control = np.ndarray((4,), dtype=np.float64, buffer=self.blocks[10].buf)
+
+    def publish(self, parity, strip, ids, left, right):
+        """Record which of a strip's vehicles are in its left and right bands."""
+        for side, mask in enumerate((left, right)):
+            members = ids[mask]
+            self.bands[parity][strip, side, :len(members)] = members
+            self.counts[parity][strip, side] = len(members)
+
+    def band(self, parity, strip, side):
+        return self.bands[parity][strip, side, :self.counts[parity][strip, side]]
+
+    def close(self):
+        # Drop the array views before closing the mappings they point into
+        self.positions = self.directions = self.owner = self.bands = self.counts = None
+        self.control = None
+        for block in self.blocks:
+            block.close()
+
+    def unlink(self):
+        for block in self.blocks:
+            block.unlink()
+
+
+def _worker(rank, strips, n, names, barrier, options):
+    state = SharedState(n, strips, names)
+    width, height = options["width"], options["height"]
+    lo, hi = rank * width / strips, (rank + 1) * width / strips
+    halo_width = options.get("mutual_cutoff", 150) if options.get("mutual") else 0
+    left, right = (rank - 1) % strips, (rank + 1) % strips
+    parity = 0
+
+    try:
+        swarm = Swarm(np.empty((0, 2)), np.empty(0), **options)
+        band = band_width(options)
+        # The only full scan; from here on vehicles arrive through the bands
+        mine = np.flatnonzero(state.owner[parity] == rank)
+        while True:
+            barrier.wait()
+            sun_x, sun_y, steps, stop = state.control
+            if stop:
+                break
+            for _ in range(int(steps)):
+                positions = state.positions[parity]
+                owner = state.owner[parity]
+
+                halo = None
+                if strips > 1:
+                    # Only the neighbours' bands facing this strip can hold
+                    # vehicles that just crossed over or are within the cutoff
+                    near = np.unique(np.concatenate((state.band(parity, left, 1),
+                                                     state.band(parity, right, 0))))
+                    arrived = owner[near] == rank
+                    mine = np.concatenate((mine, near[arrived]))
+                    if halo_width:
+                        x = positions[near, 0]
+                        close = ((x - lo) % width >= width - halo_width) | \
+                            ((x - hi) % width < halo_width)
+                        halo = positions[near[close & ~arrived]]
+
+                swarm.positions = positions[mine]
+                swarm.directions = state.directions[parity][mine]
+                swarm.ids = mine  # Global ids keep friction noise independent of the split
+                swarm.step((sun_x, sun_y), halo)
+
+                # Write this strip's rows and bands of the next buffer; vehicles
+                # that left the strip migrate by changing owner
+                nxt = 1 - parity
+                x = swarm.positions[:, 0]
+                strip = strip_of(x, width, strips)
+                state.positions[nxt][mine] = swarm.positions
+                state.directions[nxt][mine] = swarm.directions
+                state.owner[nxt][mine] = strip
+                state.publish(nxt, rank, mine, *edge_bands(x, lo, hi, width, band))
+                mine = mine[strip == rank]
+                barrier.wait()
+                parity = nxt
+    except BaseException:
+        # Break the barrier so the parent and the other workers stop waiting
+        barrier.abort()
+        raise
+    finally:
+        state.close()
+
+
+class DecomposedWorld:
+    """A Swarm world split into vertical strips, one worker process per strip.
+
+    Vehicle state lives in shared memory. Each step, every worker steps the
+    vehicles in its strip, sensing (in mutual mode) a halo of neighbouring
+    vehicles within `mutual_cutoff` of its edges, and hands vehicles that
+    crossed an edge to the neighbouring strip. All workers advance in
+    lockstep. Use as a context manager, or call close() when done.
+
+    Each worker keeps the list of its own vehicles and reads only the
+    neighbouring strips' edge bands, so a step costs the vehicles in the
+    strip plus those near its edges rather than all n. Strips must be at
+    least one band wide (see band_width), which limits the worker count.
+
+    If a worker fails, or a step takes longer than `timeout` seconds, step()
+    shuts the workers down, frees the shared memory and raises RuntimeError.
+    """
+
+    def __init__(self, positions, directions, workers=None, timeout=60.0, **options):
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        self.n = len(positions)
+        self.timeout = timeout
+        self.options = dict(dict(width=800, height=600), **options)
+        width = self.options["width"]
+        band = band_width(self.options)
+        # By default one worker per CPU, but no more than the strips allow
+        self.workers = workers or max(1, min(os.cpu_count() or 1, int(width // band)))
+        if self.workers > 1 and width / self.workers < band:
+            raise ValueError(f"strips of {width / self.workers:g} are narrower than the "
+                             f"{band:g} edge band; use at most {int(width // band)} workers")
+
+        self.state = SharedState(self.n, self.workers)
+        self.state.positions[0][:] = positions
+        self.state.directions[0][:] = np.asarray(directions, dtype=float).reshape(-1)
+        owner = strip_of(positions[:, 0], width, self.workers)
+        self.state.owner[0][:] = owner
+        ids = np.arange(self.n)
+        for rank in range(self.workers):
+            lo, hi = rank * width / self.workers, (rank + 1) * width / self.workers
+            mine = owner == rank
+            self.state.publish(0, rank, ids[mine], *edge_bands(positions[mine, 0], lo, hi, width, band))
+        self.parity = 0
+
+        self.barrier = multiprocessing.Barrier(self.workers + 1)
+        self.processes = [
+            multiprocessing.Process(
+                target=_worker, daemon=True,
+                args=(rank, self.workers, self.n, self.state.names, self.barrier, self.options))
+            for rank in range(self.workers)
+        ]
+        for process in self.processes:
+            process.start()
+
+    @property
+    def positions(self):
+        return self.state.positions[self.parity]
+
+    @property
+    def directions(self):
+        return self.state.directions[self.parity]
+
+    @property
+    def owner(self):
+        return self.state.owner[self.parity]
+
+    def wait(self):
+        try:
+            self.barrier.wait(self.timeout)
+        except threading.BrokenBarrierError:
+            self.terminate()
+            raise RuntimeError(f"a worker failed or took longer than {self.timeout}s; exit codes "
+                               f"{[p.exitcode for p in self.processes]}") from None
+
+    def step(self, sun_position, steps=1):
+        if self.state is None:
+            raise RuntimeError("world is closed")
+        self.state.control[:] = (sun_position[0], sun_position[1], steps, 0)
+        self.wait()
+        for _ in range(steps):
+            self.wait()
+        self.parity = (self.parity + steps) % 2
+
+    def terminate(self):
+        """Stop the workers without waiting for them and free the shared memory."""
+        if self.state is None:
+            return
+        self.barrier.abort()
+        for process in self.processes:
+            process.join(1)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self.state.close()
+        self.state.unlink()
+        self.state = None
+
+    def close(self):
+        if self.state is None:
+            return
+        self.state.control[3] = 1
+        self.wait()
+        for process in self.processes:
+            process.join()
+        self.state.close()
+        self.state.unlink()
+        self.state = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    # python domain.py [vehicles] [steps]
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    width, height = 20000, 20000
+    rng = np.random.default_rng(0)
+    with DecomposedWorld(rng.uniform((0, 0), (width, height), size=(n, 2)),
+                         rng.uniform(0, 360, size=n), width=width, height=height) as world:
+        world.step((width / 2, height / 2))
+        start = time.perf_counter()
+        world.step((width / 2, height / 2), steps)
+        elapsed = time.perf_counter() - start
+    print(f"{n} vehicles on {world.workers} workers: {steps / elapsed:.1f} steps/s")
@@ -0,0 +1,197 @@
+import numpy as np
+import pygame
+
+Vector2 = pygame.math.Vector2
+
+FLOAT = np.float32
+DOUBLE = np.float64  # For values that need full precision, e.g. timestamps
+INT = np.int64
+
+# Every entity class's store, for memory_report()
+stores = []
+
+
+class EntityStore:
+    """Rows of one entity type in float32, float64 and int64 blocks.
+
+    Rows are handed out by allocate() and recycled through a free list, so
+    entities keep a row index rather than a view and the blocks can grow by
+    doubling. column() gives every allocated row of one field at once for
+    vectorized work (released rows read as zeros).
+    """
+
+    def __init__(self, kind, fields, capacity=16):
+        self.kind = kind
+        self.layout = {}  # field -> (dtype, first column, width)
+        widths = {FLOAT: 0, DOUBLE: 0, INT: 0}
+        for name, (dtype, width) in fields.items():
+            self.layout[name] = (dtype, widths[dtype], width)
+            widths[dtype] += width
+        self.blocks = {dtype: np.zeros((capacity, width), dtype) for dtype, width in widths.items()}
+        self.capacity = capacity
+        self.size = 0
+        self.free = []
+
+    def __len__(self):
+        return self.size - len(self.free)
+
+    def allocate(self):
+        if self.free:
+            return self.free.pop()
+        if self.size == self.capacity:
+            self.capacity *= 2
+            for dtype, block in self.blocks.items():
+                grown = np.zeros((self.capacity, block.shape[1]), dtype)
+                grown[:self.size] = block
+                self.blocks[dtype] = grown
+        self.size += 1
+        return self.size - 1
+
+    def release(self, row):
+        for block in self.blocks.values():
+            block[row] = 0
+        self.free.append(row)
+
+    def column(self, name):
+        dtype, first, width = self.layout[name]
+        values = self.blocks[dtype][:self.size, first:first + width]
+        return values[:, 0] if width == 1 else values
+
+    def nbytes(self):
+        return sum(block.nbytes for block in self.blocks.values())
+
+
+class Field:
+    """An attribute kept in its class's EntityStore instead of the instance.
+
+    Scalars read back as `kind` (int and bool are stored as int64, anything
+    else as float32 unless `dtype` is DOUBLE, e.g. for timestamps); wider fields read as a Vector2 when kind is Vector2 and
+    as a tuple otherwise. Reads are copies, so change a vector by assigning
+    it (`v.position += step` works, `v.position.x = 0` does not). With `wrap`
+    a scalar is stored modulo wrap (e.g. 360 for a heading), so it keeps its
+    float32 precision however long it grows.
+
+    Every access goes through the store, so only use fields for state that
+    changes; constants belong in class attributes or slots.
+    """
+
+    def __init__(self, width=1, kind=float, wrap=None, dtype=None):
+        self.width = width
+        self.kind = kind
+        self.wrap = wrap
+        self.dtype = dtype or (INT if kind in (int, bool) else FLOAT)
+        self.first = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, entity, owner=None):
+        if entity is None:
+            return self
+        # Element access with item() avoids making numpy scalars and slices
+        block, row, first = type(entity).store.blocks[self.dtype], entity._row, self.first
+        if self.width == 1:
+            return self.kind(block.item(row, first))
+        if self.width == 2:
+            values = (block.item(row, first), block.item(row, first + 1))
+        else:
+            values = block[row, first:first + self.width].tolist()
+        if self.kind is Vector2:
+            return Vector2(values)
+        return tuple(self.kind(v) for v in values)
+
+    def __set__(self, entity, value):
+        block, row = type(entity).store.blocks[self.dtype], entity._row
+        if self.width == 1:
+            block[row, self.first] = value % self.wrap if self.wrap is not None else value
+            return
+        if self.width == 2:
+            x, y = value
+            block[row, self.first] = x
+            block[row, self.first + 1] = y
+        else:
+            block[row, self.first:self.first + self.width] = tuple(value)
+
+
+class Entity:
+    """Base for slotted entities whose numeric state lives in shared arrays.
+
+    Subclasses declare Field attributes for numbers and vectors and
+    __slots__ for everything else (colors, names, lists), and get their own
+    EntityStore. A row is taken when an instance is created and given back
+    when it is collected.
+    """
+
+    __slots__ = ("_row",)
+    store = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        fields = {}
+        for klass in reversed(cls.__mro__):
+            fields.update((name, value) for name, value in vars(klass).items()
+                          if isinstance(value, Field))
+        cls.store = EntityStore(cls, {name: (f.dtype, f.width) for name, f in fields.items()})
+        # Inherited fields come first, so their columns are the same in every subclass
+        for name, field in fields.items():
+            field.first = cls.store.layout[name][1]
+        stores.append(cls.store)
+
+    def __new__(cls, *args, **kwargs):
+        entity = super().__new__(cls)
+        entity._row = cls.store.allocate()
+        return entity
+
+    def __del__(self):
+        type(self).store.release(self._row)
+
+
+def memory_report():
+    """Live count and bytes per entity type: the rows it uses in the shared
+    blocks plus the slotted objects themselves. Objects that slots refer to
+    (trail lists, strings, shared colors) are not counted."""
+    report = {}
+    for store in stores:
+        count = len(store)
+        if not count:
+            continue
+        row_bytes = store.nbytes() // store.capacity
+        object_bytes = store.kind.__basicsize__
+        report[store.kind.__name__] = {
+            "count": count, "bytes_each": row_bytes + object_bytes,
+            "array_bytes": store.nbytes(), "object_bytes": object_bytes * count}
+    return report
+
+
+if __name__ == "__main__":
+    import tracemalloc
+
+    class PlainVehicle:
+        def __init__(self, position, direction):
+            self.position = Vector2(position)
+            self.direction = direction
+            self.speed = 0.0
+            self.activations = [0.0, 0.0]
+
+    class CompactVehicle(Entity):
+        __slots__ = ()
+        position = Field(2, Vector2)
+        direction = Field(wrap=360)
+        speed = Field()
+        activations = Field(2)
+
+        def __init__(self, position, direction):
+            self.position = position
+            self.direction = direction
+            self.speed = 0.0
+            self.activations = (0.0, 0.0)
+
+    n = 100_000
+    for kind in (PlainVehicle, CompactVehicle):
+        tracemalloc.start()
+        vehicles = [kind((k % 800, k % 600), k % 360) for k in range(n)]
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"{kind.__name__}: {used / n:.0f} bytes per vehicle "
+              f"(the list of {n} references included)")
+    print(memory_report())
@@ -0,0 +1,119 @@
+import numpy as np
+
+
+class FieldTexture:
+    """A stimulus field baked into a grid once and read by bilinear lookup.
+
+    `field(x, y)` receives grid coordinate arrays and returns one value per
+    point, or a tuple/list of arrays for several channels (for example one per
+    stimulus type). The texture covers the world plus `margin` on each side so
+    sensors poking past the screen edge still read sensible values; queries
+    further out are clamped to the border.
+
+    Fields that already exist as data (a NumPy array or an image) are loaded
+    with from_array() / from_image() instead. Spatial gradients are computed
+    once per bake and read with sample_gradient().
+    """
+
+    def __init__(self, field, width, height, cell_size=4, margin=100):
+        self.field = field
+        self.cell_size = cell_size
+        self.cell_width = self.cell_height = cell_size
+        self.origin = np.array([-margin, -margin], dtype=float)
+        self.nx = int(np.ceil((width + 2 * margin) / cell_size)) + 1
+        self.ny = int(np.ceil((height + 2 * margin) / cell_size)) + 1
+        self.grid = None
+        self.gradient = None
+        self.key = None
+
+    @classmethod
+    def from_array(cls, values, width, height):
+        """A texture whose grid points are `values` (ny, nx[, channels]),
+        stretched so the corner samples sit on the corners of the world."""
+        values = np.asarray(values, dtype=float)
+        ny, nx = values.shape[:2]
+        texture = cls(None, width, height, margin=0)
+        texture.nx, texture.ny = nx, ny
+        texture.cell_width = width / max(nx - 1, 1)
+        texture.cell_height = height / max(ny - 1, 1)
+        texture.grid = values.reshape(ny, nx, -1)
+        return texture
+
+    @classmethod
+    def from_image(cls, path, width, height, channels=False):
+        """Brightness of an image (0 to 1), or its RGB channels as three fields."""
+        import pygame
+
+        pixels = pygame.surfarray.array3d(pygame.image.load(path)).transpose(1, 0, 2) / 255
+        return cls.from_array(pixels if channels else pixels.mean(axis=-1), width, height)
+
+    @classmethod
+    def load(cls, path, width, height):
+        """A field from a .npy array or any image pygame can read."""
+        if path.endswith(".npy"):
+            return cls.from_array(np.load(path), width, height)
+        return cls.from_image(path, width, height)
+
+    @property
+    def valid(self):
+        return self.grid is not None
+
+    def invalidate(self):
+        if self.field is not None:
+            self.grid = None
+        self.gradient = None
+
+    def update(self, key):
+        """Rebake when `key` (e.g. the source positions) differs from the last bake."""
+        if key != self.key:
+            self.invalidate()
+            self.key = key
+        if self.grid is None:
+            self.bake()
+
+    def bake(self):
+        xs = self.origin[0] + np.arange(self.nx) * self.cell_width
+        ys = self.origin[1] + np.arange(self.ny) * self.cell_height
+        x, y = np.meshgrid(xs, ys)
+        values = self.field(x.ravel(), y.ravel())
+        if isinstance(values, (tuple, list)):
+            values = np.stack(values, axis=-1)
+        values = np.asarray(values, dtype=float).reshape(self.ny, self.nx, -1)
+        self.grid = values
+        self.gradient = None
+
+    def bilinear(self, grid, points):
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        gx = np.clip((points[:, 0] - self.origin[0]) / self.cell_width, 0, self.nx - 1)
+        gy = np.clip((points[:, 1] - self.origin[1]) / self.cell_height, 0, self.ny - 1)
+        x0 = np.minimum(gx.astype(np.int64), max(self.nx - 2, 0))
+        y0 = np.minimum(gy.astype(np.int64), max(self.ny - 2, 0))
+        x1 = np.minimum(x0 + 1, self.nx - 1)
+        y1 = np.minimum(y0 + 1, self.ny - 1)
+        fx = (gx - x0)[:, None]
+        fy = (gy - y0)[:, None]
+
+        top = grid[y0, x0] * (1 - fx) + grid[y0, x1] * fx
+        bottom = grid[y1, x0] * (1 - fx) + grid[y1, x1] * fx
+        return top * (1 - fy) + bottom * fy
+
+    def sample(self, points):
+        """Bilinear lookup of every channel at points (n, 2) -> (n, channels)."""
+        if self.grid is None:
+            self.bake()
+        return self.bilinear(self.grid, points)
+
+    def sample_gradient(self, points):
+        """Bilinear lookup of the spatial gradient -> (n, channels, 2) as (d/dx, d/dy)."""
+        if self.grid is None:
+            self.bake()
+        if self.gradient is None:
+            channels = self.grid.shape[2]
+            if min(self.nx, self.ny) < 2:
+                self.gradient = np.zeros((self.ny, self.nx, 2 * channels))
+            else:
+                dy, dx = np.gradient(self.grid, self.cell_height, self.cell_width, axis=(0, 1))
+                self.gradient = np.concatenate((dx, dy), axis=2)
+        values = self.bilinear(self.gradient, points)
+        channels = self.grid.shape[2]
+        return np.stack((values[:, :channels], values[:, channels:]), axis=-1)
@@ -0,0 +1,65 @@
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class FrameGovernor:
+    """Holds a target frame rate by trading quality for time.
+
+    Each knob is a name and its settings from best to cheapest; knobs are
+    listed in the order they should be given up. Frame times (the work, not
+    the sleep in clock.tick) are smoothed; after `patience` frames over
+    budget the first knob that can still go down steps down, after
+    `patience` frames under `headroom` of the budget the last knob that was
+    lowered steps back up. Every change is logged and kept in `changes`.
+    """
+
+    def __init__(self, knobs, target_fps=60, smoothing=0.1, patience=30, headroom=0.7):
+        self.knobs = {name: list(settings) for name, settings in knobs}
+        self.levels = {name: 0 for name in self.knobs}
+        self.budget = 1.0 / target_fps
+        self.smoothing = smoothing
+        self.patience = patience
+        self.headroom = headroom
+        self.frame_time = None
+        self.over = 0
+        self.under = 0
+        self.frames = 0
+        self.changes = []
+
+    def __getitem__(self, name):
+        return self.knobs[name][self.levels[name]]
+
+    def update(self, seconds):
+        """Record one frame's work time; returns the knob changed, if any."""
+        self.frames += 1
+        if self.frame_time is None:
+            self.frame_time = seconds
+        self.frame_time += self.smoothing * (seconds - self.frame_time)
+        self.over = self.over + 1 if self.frame_time > self.budget else 0
+        self.under = self.under + 1 if self.frame_time < self.headroom * self.budget else 0
+
+        if self.over >= self.patience:
+            for name in self.knobs:
+                if self.levels[name] < len(self.knobs[name]) - 1:
+                    return self.change(name, 1)
+        elif self.under >= self.patience:
+            for name in reversed(list(self.knobs)):
+                if self.levels[name] > 0:
+                    return self.change(name, -1)
+        return None
+
+    def change(self, name, step):
+        before = self[name]
+        self.levels[name] += step
+        self.over = self.under = 0
+        self.changes.append((self.frames, name, before, self[name], self.frame_time))
+        log.info("frame %d: %.1f ms against %.1f ms, %s %s -> %s", self.frames,
+                 self.frame_time * 1000, self.budget * 1000, name, before, self[name])
+        return name
+
+    def report(self):
+        return {"frame_ms": round((self.frame_time or 0.0) * 1000, 2),
+                "budget_ms": round(self.budget * 1000, 2),
+                "settings": {name: self[name] for name in self.knobs},
+                "changes": len(self.changes)}
@@ -0,0 +1,89 @@
+import numpy as np
+import pygame
+
+
+class Heatmap:
+    """Where vehicles spend their time, binned on a world grid.
+
+    add() bins a whole population's positions with one bincount per step.
+    With `decay` below 1 older visits fade geometrically; with `window` set
+    only the last `window` steps count, kept as a ring of per-step grids.
+    Memory is fixed by the grid (and window) size however long or large the
+    run. Positions outside the world are dropped, or wrapped with `wrap=True`.
+    """
+
+    def __init__(self, width, height, cell_size=10, decay=1.0, window=None, wrap=False):
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.nx = int(np.ceil(width / cell_size))
+        self.ny = int(np.ceil(height / cell_size))
+        self.decay = decay
+        self.wrap = wrap
+        self.counts = np.zeros((self.ny, self.nx))
+        self.ring = np.zeros((window, self.nx * self.ny)) if window else None
+        self.steps = 0
+
+    def add(self, positions, weights=None):
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        col = np.floor(positions[:, 0] / self.cell_size).astype(np.int64)
+        row = np.floor(positions[:, 1] / self.cell_size).astype(np.int64)
+        if self.wrap:
+            col %= self.nx
+            row %= self.ny
+        else:
+            keep = (col >= 0) & (col < self.nx) & (row >= 0) & (row < self.ny)
+            col, row = col[keep], row[keep]
+            if weights is not None:
+                weights = np.asarray(weights, dtype=float)[keep]
+        visits = np.bincount(row * self.nx + col, weights, minlength=self.nx * self.ny)
+
+        flat = self.counts.reshape(-1)
+        if self.decay != 1:
+            flat *= self.decay
+        if self.ring is not None:
+            # Drop the step leaving the window, decayed as much as the rest
+            slot = self.ring[self.steps % len(self.ring)]
+            flat -= slot * self.decay ** len(self.ring)
+            np.maximum(flat, 0, out=flat)
+            slot[:] = visits
+        flat += visits
+        self.steps += 1
+
+    def clear(self):
+        self.counts[:] = 0
+        if self.ring is not None:
+            self.ring[:] = 0
+        self.steps = 0
+
+    def array(self, normalize=False):
+        """A copy of the grid, rows along y; normalized to sum to 1 if asked."""
+        counts = self.counts.copy()
+        if normalize and counts.sum() > 0:
+            counts /= counts.sum()
+        return counts
+
+    def save(self, path):
+        np.save(path, self.counts)
+
+    def overlay(self, counts=None, alpha=180, scaled=True):
+        """Render counts (default: the current grid) as a translucent surface
+        the size of the world, log-scaled from transparent through red to white.
+        With scaled=False the surface has one pixel per cell."""
+        counts = self.counts if counts is None else counts
+        peak = counts.max()
+        level = np.log1p(counts) / np.log1p(peak) if peak > 0 else np.zeros_like(counts)
+
+        rgb = np.stack([np.clip(3 * level, 0, 1), np.clip(3 * level - 1, 0, 1),
+                        np.clip(3 * level - 2, 0, 1)], axis=-1)
+        surface = pygame.Surface((self.nx, self.ny), pygame.SRCALPHA)
+        pixels = pygame.surfarray.pixels3d(surface)
+        pixels[:] = (rgb * 255).astype(np.uint8).transpose(1, 0, 2)
+        del pixels
+        opacity = pygame.surfarray.pixels_alpha(surface)
+        opacity[:] = (np.clip(4 * level, 0, 1) * alpha).astype(np.uint8).T
+        del opacity
+        if not scaled:
+            return surface
+        return pygame.transform.smoothscale(
+            surface, (self.nx * self.cell_size, self.ny * self.cell_size))
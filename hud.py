@@ -0,0 +1,71 @@
+from collections import OrderedDict
+
+WHITE = (255, 255, 255)
+
+
+class TextCache:
+    """Rendered text surfaces keyed by font, text and color.
+
+    Values printed at fixed precision repeat a lot from frame to frame, so
+    most lookups are hits; the least recently used surface is dropped once
+    `capacity` is reached.
+    """
+
+    def __init__(self, capacity=512):
+        self.capacity = capacity
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color=WHITE, antialias=True):
+        key = (font, text, tuple(color), antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.capacity:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def blit(self, surface, font, text, position, color=WHITE):
+        surface.blit(self.render(font, text, color), position)
+
+
+# Shared by every HUD and label unless one is given its own
+cache = TextCache()
+
+
+class Hud:
+    """Retained block of text lines.
+
+    The simulation only stores the strings with set(); draw() blits them and
+    looks up a surface only for lines whose text changed since the last draw.
+    A line is a string, or a (text, color) pair.
+    """
+
+    def __init__(self, font, position=(10, 10), spacing=25, color=WHITE, text_cache=None):
+        self.font = font
+        self.position = position
+        self.spacing = spacing
+        self.color = color
+        self.cache = text_cache or cache
+        self.lines = ()
+        self.drawn = []
+
+    def set(self, lines):
+        self.lines = tuple(lines)
+
+    def draw(self, surface):
+        del self.drawn[len(self.lines):]
+        x, y = self.position
+        for k, line in enumerate(self.lines):
+            text, color = (line, self.color) if isinstance(line, str) else line
+            if k == len(self.drawn):
+                self.drawn.append((None, None))
+            if self.drawn[k][0] != (text, color):
+                self.drawn[k] = ((text, color), self.cache.render(self.font, text, color))
+            surface.blit(self.drawn[k][1], (x, y + k * self.spacing))
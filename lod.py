@@ -0,0 +1,74 @@
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pygame
+
+FULL, SIMPLE, PIXEL = "full", "simple", "pixel"
+
+
+class LevelOfDetail:
+    """Chooses how much of each vehicle to draw and measures what it costs.
+
+    FULL draws everything (trail, sensors, labels); SIMPLE blits one cached
+    body sprite per vehicle in a single blits() call; PIXEL writes one pixel
+    per vehicle straight into the surface. FULL is used for at most
+    `full_below` vehicles on screen, PIXEL above `pixels_above` or when a
+    body would be smaller than `min_radius` pixels (`scale` is the zoom).
+    draw cost per vehicle, in microseconds, is smoothed per level in `cost`.
+    """
+
+    def __init__(self, full_below=50, pixels_above=2000, min_radius=2, smoothing=0.1):
+        self.full_below = full_below
+        self.pixels_above = pixels_above
+        self.min_radius = min_radius
+        self.smoothing = smoothing
+        self.cost = {}
+        self.current = FULL
+        self.sprites = {}
+
+    def level(self, count, radius=20, scale=1.0):
+        if count > self.pixels_above or radius * scale < self.min_radius:
+            self.current = PIXEL
+        elif count > self.full_below:
+            self.current = SIMPLE
+        else:
+            self.current = FULL
+        return self.current
+
+    @contextmanager
+    def measure(self, level, count):
+        start = time.perf_counter()
+        yield
+        if count:
+            micros = (time.perf_counter() - start) * 1e6 / count
+            previous = self.cost.get(level, micros)
+            self.cost[level] = previous + self.smoothing * (micros - previous)
+
+    def report(self):
+        return {"level": self.current,
+                "us_per_vehicle": {level: round(us, 2) for level, us in self.cost.items()}}
+
+    def sprite(self, radius, color):
+        key = (int(round(radius)), tuple(color))
+        if key not in self.sprites:
+            r = max(key[0], 1)
+            sprite = pygame.Surface((2 * r + 1, 2 * r + 1), pygame.SRCALPHA)
+            pygame.draw.circle(sprite, color, (r, r), r)
+            self.sprites[key] = sprite
+        return self.sprites[key]
+
+    def draw_simple(self, surface, positions, radius, color):
+        sprite = self.sprite(radius, color)
+        r = sprite.get_width() // 2
+        corners = (np.asarray(positions, dtype=float).reshape(-1, 2) - r).astype(int).tolist()
+        surface.blits([(sprite, corner) for corner in corners], doreturn=False)
+
+    def draw_pixels(self, surface, positions, color):
+        points = np.asarray(positions, dtype=float).reshape(-1, 2).astype(int)
+        width, height = surface.get_size()
+        inside = (points[:, 0] >= 0) & (points[:, 0] < width) & \
+            (points[:, 1] >= 0) & (points[:, 1] < height)
+        pixels = pygame.surfarray.pixels3d(surface)
+        pixels[points[inside, 0], points[inside, 1]] = color[:3]
+        del pixels
@@ -0,0 +1,102 @@
+import numpy as np
+
+
+class CellList:
+    """Uniform-grid neighbour search over a WIDTH x HEIGHT world.
+
+    The world wraps unless `periodic=False`, in which case points outside it
+    are binned into the border cells and distances are not wrapped.
+    """
+
+    def __init__(self, cutoff, width, height, periodic=True):
+        self.cutoff = float(cutoff)
+        self.width = float(width)
+        self.height = float(height)
+        self.periodic = periodic
+
+        # Cells are at least `cutoff` wide, so every neighbour closer than the
+        # cutoff lives in the same cell or one of the 8 surrounding cells
+        self.nx = max(1, int(self.width // self.cutoff))
+        self.ny = max(1, int(self.height // self.cutoff))
+        self.cell_width = self.width / self.nx
+        self.cell_height = self.height / self.ny
+
+        # With fewer than 3 cells along an axis the wrapped -1/0/+1 offsets overlap
+        if periodic:
+            self.x_offsets = sorted({o % self.nx for o in (-1, 0, 1)})
+            self.y_offsets = sorted({o % self.ny for o in (-1, 0, 1)})
+        else:
+            self.x_offsets = self.y_offsets = [-1, 0, 1]
+
+        self.positions = np.empty((0, 2))
+        self.cell_x = np.empty(0, dtype=np.int64)
+        self.cell_y = np.empty(0, dtype=np.int64)
+        self.order = np.empty(0, dtype=np.int64)
+        self.starts = np.zeros(self.nx * self.ny, dtype=np.int64)
+        self.counts = np.zeros(self.nx * self.ny, dtype=np.int64)
+
+    def build(self, positions):
+        """Bin positions (n, 2) into cells; call once per step before pairs()."""
+        self.positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        self.cell_x = (self.positions[:, 0] // self.cell_width).astype(np.int64)
+        self.cell_y = (self.positions[:, 1] // self.cell_height).astype(np.int64)
+        if self.periodic:
+            self.cell_x %= self.nx
+            self.cell_y %= self.ny
+        else:
+            np.clip(self.cell_x, 0, self.nx - 1, out=self.cell_x)
+            np.clip(self.cell_y, 0, self.ny - 1, out=self.cell_y)
+        cells = self.cell_y * self.nx + self.cell_x
+
+        self.order = np.argsort(cells, kind="stable")
+        self.counts = np.bincount(cells, minlength=self.nx * self.ny)
+        self.starts = np.cumsum(self.counts) - self.counts
+        return self
+
+    def candidates(self):
+        """All (i, j) index pairs sharing a cell neighbourhood, i != j."""
+        n = len(self.positions)
+        rows = np.arange(n)
+        all_i, all_j = [], []
+        for ox in self.x_offsets:
+            for oy in self.y_offsets:
+                x, y = self.cell_x + ox, self.cell_y + oy
+                if self.periodic:
+                    cells = (y % self.ny) * self.nx + x % self.nx
+                    counts = self.counts[cells]
+                else:
+                    inside = (x >= 0) & (x < self.nx) & (y >= 0) & (y < self.ny)
+                    cells = np.where(inside, y * self.nx + x, 0)
+                    counts = np.where(inside, self.counts[cells], 0)
+                total = counts.sum()
+                if total == 0:
+                    continue
+                # Expand each row's [start, start + count) slice of the sorted order
+                i = np.repeat(rows, counts)
+                first = np.repeat(np.cumsum(counts) - counts, counts)
+                slots = np.arange(total) - first + np.repeat(self.starts[cells], counts)
+                all_i.append(i)
+                all_j.append(self.order[slots])
+
+        if not all_i:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        i = np.concatenate(all_i)
+        j = np.concatenate(all_j)
+        keep = i != j
+        return i[keep], j[keep]
+
+    def pairs(self):
+        """Ordered pairs closer than the cutoff.
+
+        Returns (i, j, offset, distance) where offset[k] is the shortest
+        (wrapped, if periodic) vector from positions[i[k]] to positions[j[k]].
+        """
+        i, j = self.candidates()
+        offset = self.positions[j] - self.positions[i]
+        if self.periodic:
+            offset[:, 0] -= self.width * np.round(offset[:, 0] / self.width)
+            offset[:, 1] -= self.height * np.round(offset[:, 1] / self.height)
+        distance = np.hypot(offset[:, 0], offset[:, 1])
+        close = distance < self.cutoff
+        return i[close], j[close], offset[close], distance[close]
@@ -0,0 +1,237 @@
+import numpy as np
+
+
+def _cross(a, b):
+    return a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0]
+
+
+def _closest_on_segments(points, a, b):
+    """Closest point to each point on the matching segment a -> b."""
+    ab = b - a
+    length = np.einsum("ij,ij->i", ab, ab)
+    t = np.einsum("ij,ij->i", points - a, ab) / np.where(length > 0, length, 1)
+    return a + np.clip(t, 0, 1)[:, None] * ab
+
+
+class Obstacles:
+    """Static walls, polygons and circles that block movement and sight.
+
+    Every obstacle is registered in the cells of a uniform grid it touches.
+    visible() walks each sight line through the grid (a vectorized DDA over
+    all lines at once) and tests only the obstacles in the cells it crosses;
+    push_out() tests only obstacles in the cells around each vehicle. Call
+    build() after adding obstacles (add_* calls invalidate the index).
+    """
+
+    def __init__(self, width, height, cell_size=50):
+        self.width = width
+        self.height = height
+        self.cell_size = float(cell_size)
+        self.nx = max(1, int(np.ceil(width / cell_size)))
+        self.ny = max(1, int(np.ceil(height / cell_size)))
+        self.segments = np.empty((0, 4))
+        self.circles = np.empty((0, 3))
+        self.starts = None
+        self.counts = None
+        self.items = None
+
+    def __len__(self):
+        return len(self.segments) + len(self.circles)
+
+    def add_segment(self, a, b):
+        self.segments = np.vstack((self.segments, [(*a, *b)]))
+        self.starts = None
+
+    def add_polygon(self, points):
+        points = [tuple(p) for p in points]
+        for a, b in zip(points, points[1:] + points[:1]):
+            self.add_segment(a, b)
+
+    def add_rect(self, x, y, width, height):
+        self.add_polygon([(x, y), (x + width, y), (x + width, y + height), (x, y + height)])
+
+    def add_circle(self, center, radius):
+        self.circles = np.vstack((self.circles, [(*center, radius)]))
+        self.starts = None
+
+    def cells_of(self, x, y):
+        cx = np.clip(np.floor(x / self.cell_size), 0, self.nx - 1).astype(np.int64)
+        cy = np.clip(np.floor(y / self.cell_size), 0, self.ny - 1).astype(np.int64)
+        return cy * self.nx + cx
+
+    def traverse(self, a, b):
+        """(line, cell) pairs for every grid cell the segments a -> b pass through."""
+        a = np.asarray(a, dtype=float).reshape(-1, 2) / self.cell_size
+        b = np.asarray(b, dtype=float).reshape(-1, 2) / self.cell_size
+        cell = np.floor(a)
+        end = np.floor(b)
+        delta = b - a
+        step = np.sign(delta)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t_delta = np.where(delta != 0, np.abs(1 / delta), np.inf)
+            t_max = np.where(delta != 0, (cell + (step > 0) - a) / delta, np.inf)
+        remaining = np.abs(end - cell).sum(axis=1).astype(np.int64)
+        lines = np.arange(len(a))
+
+        all_lines, all_cells = [], []
+        while len(lines):
+            cx = np.clip(cell[:, 0], 0, self.nx - 1).astype(np.int64)
+            cy = np.clip(cell[:, 1], 0, self.ny - 1).astype(np.int64)
+            all_lines.append(lines)
+            all_cells.append(cy * self.nx + cx)
+
+            # Lines that have reached their end cell drop out
+            going = remaining > 0
+            lines, cell, end, step = lines[going], cell[going], end[going], step[going]
+            t_max, t_delta, remaining = t_max[going], t_delta[going], remaining[going] - 1
+
+            # Advance along whichever axis reaches its next cell boundary first
+            along_x = ((t_max[:, 0] < t_max[:, 1]) & (cell[:, 0] != end[:, 0])) | \
+                (cell[:, 1] == end[:, 1])
+            rows = np.arange(len(lines))
+            axis = np.where(along_x, 0, 1)
+            cell[rows, axis] += step[rows, axis]
+            t_max[rows, axis] += t_delta[rows, axis]
+        if not all_lines:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        return np.concatenate(all_lines), np.concatenate(all_cells)
+
+    def build(self):
+        n_segments = len(self.segments)
+        items, cells = [], []
+        if n_segments:
+            lines, line_cells = self.traverse(self.segments[:, :2], self.segments[:, 2:])
+            items.append(lines)
+            cells.append(line_cells)
+        for k, (x, y, r) in enumerate(self.circles):
+            lo = np.floor(np.array([x - r, y - r]) / self.cell_size).astype(np.int64)
+            hi = np.floor(np.array([x + r, y + r]) / self.cell_size).astype(np.int64)
+            cx, cy = np.meshgrid(np.arange(lo[0], hi[0] + 1), np.arange(lo[1], hi[1] + 1))
+            circle_cells = np.unique(self.cells_of(cx.ravel() * self.cell_size,
+                                                   cy.ravel() * self.cell_size))
+            items.append(np.full(len(circle_cells), n_segments + k))
+            cells.append(circle_cells)
+
+        items = np.concatenate(items) if items else np.empty(0, dtype=np.int64)
+        cells = np.concatenate(cells) if cells else np.empty(0, dtype=np.int64)
+        order = np.lexsort((items, cells))
+        self.items = items[order]
+        self.counts = np.bincount(cells, minlength=self.nx * self.ny)
+        self.starts = np.cumsum(self.counts) - self.counts
+        return self
+
+    def candidates(self, owners, cells, unique=True):
+        """(owner, obstacle) pairs for obstacles registered in the given cells;
+        an obstacle spanning several cells repeats unless `unique`."""
+        if self.starts is None:
+            self.build()
+        counts = self.counts[cells]
+        total = counts.sum()
+        if total == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        slots = np.arange(total) - first + np.repeat(self.starts[cells], counts)
+        owner = np.repeat(owners, counts)
+        item = self.items[slots]
+        if not unique:
+            return owner, item
+        pairs = np.unique(owner * len(self) + item)
+        return pairs // len(self), pairs % len(self)
+
+    def visible(self, a, b):
+        """True where the straight line a -> b crosses no obstacle."""
+        a = np.asarray(a, dtype=float).reshape(-1, 2)
+        b = np.asarray(b, dtype=float).reshape(-1, 2)
+        clear = np.ones(len(a), dtype=bool)
+        if len(self) == 0 or len(a) == 0:
+            return clear
+        # Repeated pairs only repeat a test, which is cheaper than removing them
+        line, item = self.candidates(*self.traverse(a, b), unique=False)
+        n_segments = len(self.segments)
+
+        seg = item < n_segments
+        l, s = line[seg], self.segments[item[seg]]
+        p, r = a[l], b[l] - a[l]
+        q, edge = s[:, :2], s[:, 2:] - s[:, :2]
+        denom = _cross(r, edge)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = _cross(q - p, edge) / denom
+            u = _cross(q - p, r) / denom
+        hit = (denom != 0) & (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+        clear[l[hit]] = False
+
+        l, c = line[~seg], self.circles[item[~seg] - n_segments]
+        closest = _closest_on_segments(c[:, :2], a[l], b[l])
+        hit = np.hypot(*(closest - c[:, :2]).T) < c[:, 2]
+        clear[l[hit]] = False
+        return clear
+
+    def push_out(self, positions, radius):
+        """Move circles of `radius` (one for all or one per circle, each <=
+        cell_size) out of any obstacle they overlap.
+
+        Returns the new positions and a mask of the circles that were touching.
+        """
+        positions = np.array(positions, dtype=float).reshape(-1, 2)
+        n = len(positions)
+        touching = np.zeros(n, dtype=bool)
+        if len(self) == 0 or n == 0:
+            return positions, touching
+        radius = np.broadcast_to(np.asarray(radius, dtype=float), (n,))
+        owners, cells = [], []
+        rows = np.arange(n)
+        for ox in (-1, 0, 1):
+            for oy in (-1, 0, 1):
+                owners.append(rows)
+                cells.append(self.cells_of(positions[:, 0] + ox * self.cell_size,
+                                           positions[:, 1] + oy * self.cell_size))
+        vehicle, item = self.candidates(np.concatenate(owners), np.concatenate(cells))
+        n_segments = len(self.segments)
+
+        seg = item < n_segments
+        v, s = vehicle[seg], self.segments[item[seg]]
+        contact = _closest_on_segments(positions[v], s[:, :2], s[:, 2:])
+        away = positions[v] - contact
+        depth = radius[v] - np.hypot(away[:, 0], away[:, 1])
+
+        v2, c = vehicle[~seg], self.circles[item[~seg] - n_segments]
+        away2 = positions[v2] - c[:, :2]
+        depth2 = radius[v2] + c[:, 2] - np.hypot(away2[:, 0], away2[:, 1])
+
+        v = np.concatenate((v, v2))
+        away = np.concatenate((away, away2))
+        depth = np.concatenate((depth, depth2))
+        inside = depth > 0
+        v, away, depth = v[inside], away[inside], depth[inside]
+        length = np.hypot(away[:, 0], away[:, 1])
+        away[length > 0] /= length[length > 0, None]
+        away[length == 0] = (0.0, -1.0)
+        push = away * depth[:, None]
+        positions[:, 0] += np.bincount(v, push[:, 0], minlength=n)
+        positions[:, 1] += np.bincount(v, push[:, 1], minlength=n)
+        touching[v] = True
+        return positions, touching
+
+    def draw(self, surface, color=(120, 120, 120), width=4, camera=None):
+        """Draw in world coordinates, or through `camera` skipping what it can't see."""
+        import pygame
+
+        segments, circles = self.segments, self.circles
+        scale = 1.0
+        if camera is not None:
+            left, top, right, bottom = camera.viewport()
+            shown = (np.minimum(segments[:, 0], segments[:, 2]) <= right) & \
+                (np.maximum(segments[:, 0], segments[:, 2]) >= left) & \
+                (np.minimum(segments[:, 1], segments[:, 3]) <= bottom) & \
+                (np.maximum(segments[:, 1], segments[:, 3]) >= top)
+            segments = camera.to_screen(segments[shown].reshape(-1, 2)).reshape(-1, 4)
+            circles = circles[camera.visible(circles[:, :2], margin=circles[:, 2])]
+            circles = np.column_stack((camera.to_screen(circles[:, :2]), circles[:, 2] * camera.zoom))
+            scale = camera.zoom
+        width = max(1, int(round(width * scale)))
+        for x1, y1, x2, y2 in segments.tolist():
+            pygame.draw.line(surface, color, (x1, y1), (x2, y2), width)
+        for x, y, r in circles.tolist():
+            pygame.draw.circle(surface, color, (x, y), r)
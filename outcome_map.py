@@ -0,0 +1,145 @@
+import inspect
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+import pygame
+
+from analytics import RunningStats
+from swarm import Swarm
+
+# Outcome codes and their colors on the map
+CAPTURED, COLLISION, ESCAPE, WANDER = range(4)
+OUTCOMES = ("captured orbit", "collision with sun", "escape", "chaotic wander")
+COLORS = np.array([(60, 200, 90), (230, 60, 40), (50, 90, 220), (200, 200, 200)], dtype=np.uint8)
+
+# Named wirings; any Swarm option or attribute (e.g. optimal_distance) may be added
+PRESETS = {
+    "3a": dict(vehicle_type="3", cross=False, inhibition=True),   # Love
+    "3b": dict(vehicle_type="3", cross=True, inhibition=True),    # Explorer
+    "4a": dict(vehicle_type="4a", cross=True, inhibition=False),
+}
+SWARM_OPTIONS = set(inspect.signature(Swarm).parameters)  # Anything else is set as an attribute
+SUN_RADIUS = 30  # As drawn in test5; closer than this plus the vehicle radius is a collision
+
+
+def initial_states(width, height, columns, rows, headings):
+    """A grid of start states: every cell centre with every heading.
+
+    Returns positions (n, 2) and directions (n,), ordered heading-major so
+    the outcomes reshape to (headings, rows, columns).
+    """
+    x = (np.arange(columns) + 0.5) * width / columns
+    y = (np.arange(rows) + 0.5) * height / rows
+    heading = np.arange(headings) * 360 / headings
+    h, yy, xx = np.meshgrid(heading, y, x, indexing="ij")
+    return np.column_stack((xx.ravel(), yy.ravel())), h.ravel()
+
+
+def classify(positions, directions, sun, steps=1200, settle=0.5, orbit_tolerance=0.15, **options):
+    """Run one chunk of start states headless and classify each outcome.
+
+    The first `settle` fraction of the steps is a transient; over the rest
+    the distance to the sun is summarized online. Coming within the sun's
+    radius at any time is a collision; never coming within sensing range
+    after the transient is an escape; a distance whose spread is below
+    `orbit_tolerance` of its mean is a captured orbit (which includes
+    parking at a fixed distance); anything else is chaotic wander.
+    """
+    attributes = {name: options.pop(name) for name in list(options) if name not in SWARM_OPTIONS}
+    swarm = Swarm(positions, directions, **options)
+    for name, value in attributes.items():
+        setattr(swarm, name, value)
+
+    n = len(swarm)
+    collided = np.zeros(n, dtype=bool)
+    stats = RunningStats(n)
+    nearest = np.full(n, np.inf)
+    for step in range(steps):
+        swarm.step(sun)
+        distance = np.hypot(swarm.positions[:, 0] - sun[0], swarm.positions[:, 1] - sun[1])
+        collided |= distance < SUN_RADIUS + swarm.radius
+        if step >= steps * settle:
+            stats.add(distance)
+            np.minimum(nearest, distance, out=nearest)
+
+    outcome = np.full(n, WANDER, dtype=np.int8)
+    outcome[stats.std < orbit_tolerance * stats.mean] = CAPTURED
+    outcome[nearest >= swarm.max_distance] = ESCAPE
+    outcome[collided] = COLLISION
+    return outcome
+
+
+def _classify_chunk(args):
+    positions, directions, sun, options = args
+    return classify(positions, directions, sun, **options)
+
+
+def outcome_map(width=800, height=600, sun=None, columns=80, rows=60, headings=4, chunk=4096,
+                workers=None, **options):
+    """Outcomes over a grid of start states, shape (headings, rows, columns).
+
+    The states are split into chunks of `chunk` vehicles, each run as one
+    vectorized Swarm, and the chunks are shared out over `workers`
+    processes (all CPUs by default; 1 runs them here). `options` go to
+    classify() and on to Swarm.
+    """
+    sun = tuple(sun) if sun is not None else (width / 2, height / 2)
+    positions, directions = initial_states(width, height, columns, rows, headings)
+    options = dict(options, width=width, height=height)
+    chunks = [(positions[k:k + chunk], directions[k:k + chunk], sun, options)
+              for k in range(0, len(positions), chunk)]
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+    if workers > 1:
+        with multiprocessing.Pool(workers) as pool:
+            outcomes = pool.map(_classify_chunk, chunks)
+    else:
+        outcomes = [_classify_chunk(args) for args in chunks]
+    return np.concatenate(outcomes).reshape(headings, rows, columns)
+
+
+def render(outcomes, path, width=800, height=600, sun=None, scale=4, gap=8):
+    """Save the map as an image: one panel per start heading, left to right,
+    with the sun marked and a heading arrow in each panel's corner."""
+    headings, rows, columns = outcomes.shape
+    sun = tuple(sun) if sun is not None else (width / 2, height / 2)
+    panel_w, panel_h = columns * scale, rows * scale
+    image = pygame.Surface((headings * (panel_w + gap) - gap, panel_h))
+    image.fill((0, 0, 0))
+    for k, panel in enumerate(outcomes):
+        pixels = COLORS[panel].repeat(scale, axis=0).repeat(scale, axis=1).transpose(1, 0, 2)
+        left = k * (panel_w + gap)
+        image.blit(pygame.surfarray.make_surface(pixels), (left, 0))
+        pygame.draw.circle(image, (255, 255, 0),
+                           (left + sun[0] * panel_w / width, sun[1] * panel_h / height),
+                           max(2, SUN_RADIUS * panel_w / width))
+        tail = pygame.math.Vector2(left + 16, 16)
+        tip = tail + pygame.math.Vector2(0, -12).rotate(k * 360 / headings)
+        pygame.draw.line(image, (0, 0, 0), tail, tip, 2)
+        pygame.draw.circle(image, (0, 0, 0), tip, 3)
+    pygame.image.save(image, path)
+    return image
+
+
+def fractions(outcomes):
+    counts = np.bincount(outcomes.ravel(), minlength=len(OUTCOMES))
+    return {name: count / outcomes.size for name, count in zip(OUTCOMES, counts)}
+
+
+if __name__ == "__main__":
+    # python outcome_map.py [preset] [output.png] [columns] [steps] [optimal_distance]
+    preset = sys.argv[1] if len(sys.argv) > 1 else "3b"
+    output = sys.argv[2] if len(sys.argv) > 2 else f"outcomes_{preset}.png"
+    columns = int(sys.argv[3]) if len(sys.argv) > 3 else 80
+    steps = int(sys.argv[4]) if len(sys.argv) > 4 else 1200
+    options = dict(PRESETS[preset])
+    if len(sys.argv) > 5:
+        options["optimal_distance"] = float(sys.argv[5])
+    start = time.perf_counter()
+    outcomes = outcome_map(columns=columns, rows=columns * 3 // 4, steps=steps, **options)
+    render(outcomes, output)
+    print(f"{outcomes.size} start states in {time.perf_counter() - start:.1f}s -> {output}")
+    for name, share in fractions(outcomes).items():
+        print(f"{name}: {share:.1%}")
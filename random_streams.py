@@ -0,0 +1,47 @@
+import numpy as np
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MUL1 = np.uint64(0xBF58476D1CE4E5B9)
+_MUL2 = np.uint64(0x94D049BB133111EB)
+
+
+def _mix(x):
+    # splitmix64 finaliser: a bijective avalanche on 64-bit words
+    x = x ^ (x >> np.uint64(30))
+    x = x * _MUL1
+    x = x ^ (x >> np.uint64(27))
+    x = x * _MUL2
+    return x ^ (x >> np.uint64(31))
+
+
+class RandomStreams:
+    """Counter-based random numbers, one independent stream per vehicle.
+
+    Every value is a pure hash of (seed, stream id, counter, channel), so a
+    vehicle's noise depends only on its own id and the step number, never on
+    how many other draws happened first or how the population is split
+    between batches or worker processes. Whole populations are drawn at once
+    by passing an array of ids. Use `channel` to separate independent draws
+    taken for the same vehicle in the same step.
+    """
+
+    def __init__(self, seed=0):
+        with np.errstate(over="ignore"):
+            self.key = _mix(np.uint64(seed) * _GOLDEN + _GOLDEN)
+
+    def bits(self, ids, counter, channel=0):
+        ids = np.asarray(ids).astype(np.uint64)
+        with np.errstate(over="ignore"):
+            x = _mix(self.key ^ (ids * _GOLDEN))
+            x = _mix(x ^ (np.uint64(counter) * _MUL1))
+            return _mix(x ^ (np.uint64(channel) * _MUL2 + _GOLDEN))
+
+    def uniform(self, ids, counter, low=0.0, high=1.0, channel=0):
+        """Floats in [low, high), one per id."""
+        fraction = (self.bits(ids, counter, channel) >> np.uint64(11)) * (1.0 / (1 << 53))
+        return low + (high - low) * fraction
+
+    def integers(self, ids, counter, low, high, channel=0):
+        """Integers in [low, high), one per id."""
+        fraction = self.uniform(ids, counter, channel=channel)
+        return low + (fraction * (high - low)).astype(np.int64)
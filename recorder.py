@@ -0,0 +1,200 @@
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+
+import numpy as np
+import pygame
+
+from swarm import Swarm
+
+
+class PngSequence:
+    """Numbered PNG files in a directory; frames may be written in any order."""
+
+    ordered = False
+
+    def __init__(self, path, size, fps):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.size = size
+
+    def write(self, index, data):
+        frame = pygame.image.frombytes(data, self.size, "RGB")
+        pygame.image.save(frame, os.path.join(self.path, f"frame_{index:06d}.png"))
+
+    def close(self):
+        pass
+
+
+class FfmpegPipe:
+    """Raw RGB frames piped to a local ffmpeg process, which picks the codec
+    from the file extension."""
+
+    ordered = True
+
+    def __init__(self, path, size, fps):
+        ffmpeg = shutil.which("ffmpeg")
+        if ffmpeg is None:
+            raise RuntimeError("ffmpeg not found; record to a directory for a PNG sequence")
+        self.process = subprocess.Popen(
+            [ffmpeg, "-loglevel", "error", "-y", "-f", "rawvideo", "-pix_fmt", "rgb24",
+             "-s", f"{size[0]}x{size[1]}", "-r", str(fps), "-i", "-",
+             "-pix_fmt", "yuv420p", path],
+            stdin=subprocess.PIPE)
+
+    def write(self, index, data):
+        self.process.stdin.write(data)
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        finally:
+            code = self.process.wait()
+        if code:
+            raise RuntimeError(f"ffmpeg exited with status {code}")
+
+
+ENCODERS = {"": PngSequence, ".mp4": FfmpegPipe, ".mkv": FfmpegPipe,
+            ".webm": FfmpegPipe, ".mov": FfmpegPipe, ".gif": FfmpegPipe}
+
+
+class Recorder:
+    """Captures surfaces and encodes them on background threads.
+
+    The encoder follows the path: a directory (no extension) gets a PNG
+    sequence written by a pool of `workers` threads; a video extension pipes
+    frames to ffmpeg from a single thread, keeping them in order. capture()
+    only copies the pixels. At most `max_pending` frames wait for encoding;
+    beyond that frames are dropped and counted in `dropped` (or the caller
+    blocks, with `block=True`). `every` keeps one frame in N.
+
+    If the encoder fails (e.g. ffmpeg exits), the threads keep draining (and
+    counting as dropped) later frames so the caller never stalls; the next
+    capture() and close() raise the error.
+    """
+
+    def __init__(self, path, fps=60, workers=2, max_pending=32, block=False, every=1):
+        self.path = path
+        self.fps = fps
+        self.workers = workers
+        self.block = block
+        self.every = every
+        self.encoder = None
+        self.frames = queue.Queue(maxsize=max_pending)
+        self.threads = []
+        self.lock = threading.Lock()
+        self.seen = 0
+        self.index = 0
+        self.written = 0
+        self.dropped = 0
+        self.error = None
+
+    def start(self, size):
+        self.encoder = ENCODERS[os.path.splitext(self.path)[1]](self.path, size, self.fps)
+        count = 1 if self.encoder.ordered else self.workers
+        self.threads = [threading.Thread(target=self.run, daemon=True) for _ in range(count)]
+        for thread in self.threads:
+            thread.start()
+
+    def capture(self, surface):
+        if self.error is not None:
+            raise self.error
+        self.seen += 1
+        if (self.seen - 1) % self.every:
+            return
+        if self.encoder is None:
+            self.start(surface.get_size())
+        try:
+            self.frames.put((self.index, pygame.image.tobytes(surface, "RGB")), block=self.block)
+            self.index += 1
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+
+    def run(self):
+        while True:
+            frame = self.frames.get()
+            if frame is None:
+                break
+            try:
+                if self.error is None:
+                    self.encoder.write(*frame)
+                    with self.lock:
+                        self.written += 1
+                    continue
+            except Exception as error:
+                self.error = error
+            with self.lock:
+                self.dropped += 1
+
+    def close(self, timeout=10.0):
+        if self.encoder is None:
+            return
+        try:
+            for _ in self.threads:
+                self.frames.put(None, timeout=timeout)
+            for thread in self.threads:
+                thread.join(timeout)
+        except queue.Full:
+            pass
+        if any(thread.is_alive() for thread in self.threads) and self.error is None:
+            self.error = RuntimeError(f"recorder did not finish encoding within {timeout}s")
+        try:
+            self.encoder.close()
+        except Exception as error:
+            if self.error is None:
+                self.error = error
+        self.encoder = None
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def draw_panel(surface, swarm, sun_position, label, font):
+    surface.fill((0, 0, 0))
+    pygame.draw.circle(surface, (255, 255, 0), sun_position, 20)
+    radians = np.radians(swarm.directions)
+    heading = np.stack((np.sin(radians), -np.cos(radians)), axis=1) * swarm.radius
+    for position, tip in zip(swarm.positions, swarm.positions + heading):
+        pygame.draw.circle(surface, (255, 0, 0), position, swarm.radius / 2)
+        pygame.draw.line(surface, (0, 255, 0), position, tip, 2)
+    surface.blit(font.render(label, True, (255, 255, 255)), (8, 8))
+
+
+def record_response_types(path, steps=600, vehicles=20, panel=(320, 320), seed=0):
+    """Headless run of the five Vehicle 4b response types side by side."""
+    pygame.font.init()
+    font = pygame.font.SysFont("Arial", 16)
+    width, height = panel
+    sun_position = (width / 2, height / 2)
+    rng = np.random.default_rng(seed)
+    positions = rng.uniform((0, 0), panel, size=(vehicles, 2))
+    directions = rng.uniform(0, 360, size=vehicles)
+    swarms = [Swarm(positions, directions, width=width, height=height, vehicle_type="4b",
+                    response_type=str(k), seed=seed) for k in range(1, 6)]
+
+    frame = pygame.Surface((width * len(swarms), height))
+    panels = [frame.subsurface((k * width, 0, width, height)) for k in range(len(swarms))]
+    with Recorder(path, block=True) as recorder:
+        for _ in range(steps):
+            for k, (swarm, surface) in enumerate(zip(swarms, panels)):
+                swarm.step(sun_position)
+                draw_panel(surface, swarm, sun_position, f"4b response {k + 1}", font)
+            recorder.capture(frame)
+    return recorder
+
+
+if __name__ == "__main__":
+    # python recorder.py [output: directory for PNGs, or .mp4/.webm/...] [steps]
+    output = sys.argv[1] if len(sys.argv) > 1 else "response_types"
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 600
+    recorder = record_response_types(output, steps)
+    print(f"{recorder.written} frames written to {output}")
@@ -0,0 +1,163 @@
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from domain import DecomposedWorld
+from random_streams import RandomStreams
+from swarm import Swarm
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+INLINE_LIMIT = 64  # save() writes larger arrays to .npy files
+
+
+class Scenario:
+    """A world description: size, sun, vehicles, wiring, stimuli and targets.
+
+    Scenarios are JSON or TOML files. Vehicle states are given inline, as
+    `.npy` files next to the scenario (memory-mapped, so loading a million
+    vehicles only costs reading the file), or as a count to draw from a
+    seeded RandomStreams. For example:
+
+        {"world": {"width": 20000, "height": 20000},
+         "sun": [10000, 10000],
+         "vehicles": {"positions": "positions.npy", "directions": "directions.npy"},
+         "wiring": {"vehicle_type": "4a", "cross": true},
+         "stimuli": [{"type": "light", "position": [200, 200]},
+                     {"type": "heat", "positions": "heat.npy"}],
+         "targets": [{"position": [150, 400], "color": [128, 128, 0],
+                      "frequency": 2.5, "speed": 2.0, "label": "FRIEND"}]}
+
+    `wiring` and `options` are passed to Swarm as keyword arguments.
+    """
+
+    def __init__(self, width=800, height=600, sun=None, positions=None, directions=None,
+                 wiring=None, options=None, stimuli=(), targets=()):
+        self.width = width
+        self.height = height
+        self.sun = tuple(sun) if sun is not None else (width / 2, height / 2)
+        self.positions = np.empty((0, 2)) if positions is None else positions
+        self.directions = np.zeros(len(self.positions)) if directions is None else directions
+        self.wiring = dict(wiring or {})
+        self.options = dict(options or {})
+        self.stimuli = list(stimuli)
+        self.targets = [dict(target) for target in targets]
+
+    @classmethod
+    def load(cls, path):
+        if os.path.splitext(path)[1] == ".toml":
+            if tomllib is None:
+                raise RuntimeError("TOML scenarios need Python 3.11 or newer")
+            with open(path, "rb") as f:
+                data = tomllib.load(f)
+        else:
+            with open(path) as f:
+                data = json.load(f)
+        folder = os.path.dirname(os.path.abspath(path))
+
+        def array(value, shape):
+            if isinstance(value, str):
+                return np.load(os.path.join(folder, value), mmap_mode="r")
+            return np.asarray(value, dtype=float).reshape(shape)
+
+        world = data.get("world", {})
+        width, height = world.get("width", 800), world.get("height", 600)
+        vehicles = data.get("vehicles", {})
+        if "count" in vehicles:
+            ids = np.arange(vehicles["count"])
+            streams = RandomStreams(vehicles.get("seed", 0))
+            positions = np.column_stack((streams.uniform(ids, 0, 0, width, channel=0),
+                                         streams.uniform(ids, 0, 0, height, channel=1)))
+            directions = streams.uniform(ids, 0, 0, 360, channel=2)
+        else:
+            positions = array(vehicles.get("positions", []), (-1, 2))
+            directions = array(vehicles["directions"], -1) if "directions" in vehicles else None
+
+        stimuli = []
+        for stimulus in data.get("stimuli", []):
+            stimulus = dict(stimulus)
+            if "positions" in stimulus:
+                stimulus["positions"] = array(stimulus["positions"], (-1, 2))
+            stimuli.append(stimulus)
+
+        return cls(width, height, data.get("sun"), positions, directions,
+                   data.get("wiring"), data.get("options"), stimuli, data.get("targets", ()))
+
+    def save(self, path):
+        """Write the scenario as JSON, with large arrays in .npy files beside it."""
+        folder = os.path.dirname(os.path.abspath(path))
+        stem = os.path.splitext(os.path.basename(path))[0]
+
+        def array(value, name):
+            value = np.asarray(value, dtype=float)
+            if len(value) <= INLINE_LIMIT:
+                return value.tolist()
+            filename = f"{stem}_{name}.npy"
+            np.save(os.path.join(folder, filename), value)
+            return filename
+
+        stimuli = []
+        for k, stimulus in enumerate(self.stimuli):
+            stimulus = dict(stimulus)
+            if "positions" in stimulus:
+                stimulus["positions"] = array(stimulus["positions"], f"stimuli{k}")
+            stimuli.append(stimulus)
+
+        data = {
+            "world": {"width": self.width, "height": self.height},
+            "sun": list(self.sun),
+            "vehicles": {"positions": array(self.positions, "positions"),
+                         "directions": array(self.directions, "directions")},
+            "wiring": self.wiring,
+            "options": self.options,
+            "stimuli": stimuli,
+            "targets": self.targets,
+        }
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def stimulus_positions(self):
+        """Stimulus positions grouped by type, as (n, 2) arrays."""
+        groups = {}
+        for stimulus in self.stimuli:
+            if "positions" in stimulus:
+                points = np.asarray(stimulus["positions"], dtype=float).reshape(-1, 2)
+            else:
+                points = np.asarray(stimulus["position"], dtype=float).reshape(-1, 2)
+            groups.setdefault(stimulus["type"], []).append(points)
+        return {s_type: np.concatenate(parts) for s_type, parts in groups.items()}
+
+    def swarm(self, **overrides):
+        options = dict(self.options, **self.wiring, **overrides)
+        return Swarm(self.positions, self.directions, width=self.width, height=self.height,
+                     **options)
+
+    def world(self, workers=None, **overrides):
+        """A DecomposedWorld; states are copied from the file straight into shared memory."""
+        options = dict(self.options, **self.wiring, **overrides)
+        return DecomposedWorld(self.positions, self.directions, workers,
+                               width=self.width, height=self.height, **options)
+
+
+if __name__ == "__main__":
+    # python scenario.py <scenario> [steps]
+    path = sys.argv[1]
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    start = time.perf_counter()
+    scenario = Scenario.load(path)
+    swarm = scenario.swarm()
+    loaded = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(steps):
+        swarm.step(scenario.sun)
+    print(f"{len(scenario)} vehicles loaded in {loaded:.2f}s, "
+          f"{steps / (time.perf_counter() - start):.1f} steps/s")
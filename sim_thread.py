@@ -0,0 +1,75 @@
+import logging
+import queue
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class SimulationThread(threading.Thread):
+    """Runs a simulation step function in a background thread.
+
+    `step()` advances the simulation; `snapshot()` returns an immutable copy
+    of whatever the renderer needs. Snapshots are published through two
+    slots: the thread fills the back slot and then flips the front index, so
+    latest() always returns a complete snapshot without locking. Input is
+    sent back with send(); queued commands run on the simulation thread
+    between steps, so they never race with a step. While `paused` is set,
+    commands still run and snapshots are still published but nothing steps.
+    """
+
+    def __init__(self, step, snapshot, rate=60):
+        super().__init__(daemon=True)
+        self.step = step
+        self.snapshot = snapshot
+        self.rate = rate
+        self.commands = queue.Queue()
+        self.buffers = [snapshot(), None]
+        self.front = 0
+        self.steps = 0
+        self.running = threading.Event()
+        self.running.set()
+        self.paused = False
+
+    def latest(self):
+        return self.buffers[self.front]
+
+    def send(self, command, *args):
+        self.commands.put((command, args))
+
+    def stop(self):
+        self.running.clear()
+        self.join()
+
+    def publish(self):
+        back = 1 - self.front
+        self.buffers[back] = self.snapshot()
+        self.front = back
+
+    def run(self):
+        interval = 1 / self.rate if self.rate else 0
+        next_step = time.perf_counter()
+        while self.running.is_set():
+            while True:
+                try:
+                    command, args = self.commands.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    command(*args)
+                except Exception:
+                    # A bad command must not take the simulation down with it
+                    log.exception("command %r failed", command)
+
+            if not self.paused:
+                self.step()
+                self.steps += 1
+            self.publish()
+
+            # Fixed simulation rate, independent of how fast frames are drawn
+            next_step += interval
+            delay = next_step - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_step = time.perf_counter()
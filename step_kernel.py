@@ -0,0 +1,204 @@
+import math
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:  # Optional: Swarm falls back to its NumPy path
+    numba = None
+
+AVAILABLE = numba is not None
+
+
+def response_code(vehicle_type, response_type):
+    """Vehicle 3 -> 0, 4a -> 1, 4b response types 1-5 -> 2-6."""
+    if vehicle_type == "3":
+        return 0
+    if vehicle_type == "4a":
+        return 1
+    return {"1": 2, "2": 3, "3": 4, "4": 5}.get(response_type, 6)
+
+
+def _raw_response(code, d, s, optimal_distance, response_width,
+                  threshold_distance, min_activation):
+    if code == 0:
+        if d < 1:
+            return s
+        return s / d
+    if code == 1:
+        if d < 1:
+            return 0.0
+        return s * math.exp(-((d - optimal_distance) ** 2) / (2 * response_width ** 2))
+
+    t = threshold_distance
+    if d > t:
+        return 0.0
+    if code == 2:
+        return s * max(min_activation, 1 - d / t)
+    if code == 3:
+        return s * 0.8
+    if code == 4:
+        if d > t * 0.7:
+            return s * 0.5
+        if d > t * 0.4:
+            return s * 0.2
+        return s
+    if code == 5:
+        return s * (1 - (d / t) ** 2)
+    if d > t * 0.6:
+        return s * 0.3
+    if d > t * 0.4:
+        return s
+    if d > t * 0.2:
+        return s * 0.5
+    return s
+
+
+def _finish(excitation, s, inhibition):
+    if inhibition:
+        excitation = s - excitation
+    return min(max(excitation, 0.0), s)
+
+
+def _response(code, d, s, optimal_distance, response_width, threshold_distance,
+              min_activation, inhibition):
+    # Single-source response, short-circuiting exactly like test5
+    if code == 0 and d < 1:
+        return s
+    if code == 1 and d < 1:
+        return 0.0
+    if code >= 2 and d > threshold_distance:
+        return 0.0
+    return _finish(_raw_response(code, d, s, optimal_distance, response_width,
+                                 threshold_distance, min_activation), s, inhibition)
+
+
+def _step(positions, directions, sun_x, sun_y, extra_left, extra_right, jitter,
+          code, cross, inhibition, mutual, width, height, fps, max_distance,
+          speed_scaling, rotation_scaling, sensor_offset, sensor_spacing,
+          optimal_distance, response_width, threshold_distance, min_activation,
+          left_distance, right_distance, left_motor, right_motor, speed):
+    s = speed_scaling
+    half = sensor_spacing / 2
+    for k in range(positions.shape[0]):
+        x = positions[k, 0]
+        y = positions[k, 1]
+
+        # Sensor geometry
+        radians = math.radians(directions[k])
+        fx = math.sin(radians)
+        fy = -math.cos(radians)
+        rx = fy
+        ry = -fx
+        ax = x + fx * sensor_offset
+        ay = y + fy * sensor_offset
+        ld = min(math.hypot(ax - rx * half - sun_x, ay - ry * half - sun_y), max_distance)
+        rd = min(math.hypot(ax + rx * half - sun_x, ay + ry * half - sun_y), max_distance)
+
+        # Response evaluation
+        if mutual:
+            ls = _finish(_raw_response(code, ld, s, optimal_distance, response_width,
+                                       threshold_distance, min_activation) + extra_left[k],
+                         s, inhibition)
+            rs = _finish(_raw_response(code, rd, s, optimal_distance, response_width,
+                                       threshold_distance, min_activation) + extra_right[k],
+                         s, inhibition)
+        else:
+            ls = _response(code, ld, s, optimal_distance, response_width,
+                           threshold_distance, min_activation, inhibition)
+            rs = _response(code, rd, s, optimal_distance, response_width,
+                           threshold_distance, min_activation, inhibition)
+
+        # Wiring
+        if cross:
+            lm, rm = rs, ls
+        else:
+            lm, rm = ls, rs
+
+        # Integration and wrapping
+        v = (lm + rm) / 2
+        direction = directions[k] + (rm - lm) * rotation_scaling
+        radians = math.radians(direction)
+        positions[k, 0] = (x + math.sin(radians) * v / fps) % width
+        positions[k, 1] = (y - math.cos(radians) * v / fps) % height
+        directions[k] = direction + jitter[k]
+
+        left_distance[k] = ld
+        right_distance[k] = rd
+        left_motor[k] = lm
+        right_motor[k] = rm
+        speed[k] = v
+
+
+if AVAILABLE:
+    _raw_response = numba.njit(cache=True)(_raw_response)
+    _finish = numba.njit(cache=True)(_finish)
+    _response = numba.njit(cache=True)(_response)
+    _step = numba.njit(cache=True)(_step)
+
+
+def step(swarm, sun_position, extra_left, extra_right, jitter):
+    """Advance a Swarm one step in a single fused loop, updating it in place.
+
+    Only Swarm's test5-style vehicles are covered: Vehicle 3, 4a and the
+    five 4b responses, crossed or uncrossed, with or without inhibition.
+    The lab scripts' own models (vehicle3_lab3, test2 and test4 wiring,
+    test3's 3c) are not ported and keep their Python paths.
+    """
+    n = len(swarm)
+    for name in ("left_distance", "right_distance", "left_motor", "right_motor", "speed"):
+        if getattr(swarm, name).shape != (n,):
+            setattr(swarm, name, np.zeros(n))
+    _step(swarm.positions, swarm.directions, float(sun_position[0]), float(sun_position[1]),
+          extra_left, extra_right, jitter,
+          response_code(swarm.vehicle_type, swarm.response_type),
+          swarm.cross, swarm.inhibition, swarm.mutual,
+          float(swarm.width), float(swarm.height), float(swarm.fps),
+          float(swarm.max_distance), float(swarm.speed_scaling),
+          float(swarm.rotation_scaling), float(swarm.sensor_offset),
+          float(swarm.sensor_spacing), float(swarm.optimal_distance),
+          float(swarm.response_width), float(swarm.threshold_distance),
+          float(swarm.min_activation),
+          swarm.left_distance, swarm.right_distance,
+          swarm.left_motor, swarm.right_motor, swarm.speed)
+
+
+def check_backends(n=200, steps=20, tolerance=1e-6, seed=0):
+    """Run every vehicle/response type and wiring through both backends.
+
+    Raises AssertionError if the fused kernel and the NumPy path disagree by
+    more than `tolerance` anywhere. Without numba the kernel runs as plain
+    Python, which is slow but checks the same logic.
+    """
+    from swarm import Swarm
+
+    rng = np.random.default_rng(seed)
+    positions = rng.uniform((0, 0), (800, 600), size=(n, 2))
+    directions = rng.uniform(0, 360, size=n)
+    configurations = [("3", "1"), ("4a", "1")] + [("4b", str(t)) for t in range(1, 6)]
+    for vehicle_type, response_type in configurations:
+        for cross in (False, True):
+            for inhibition in (False, True):
+                for mutual in (False, True):
+                    options = dict(vehicle_type=vehicle_type, response_type=response_type,
+                                   cross=cross, inhibition=inhibition, mutual=mutual,
+                                   friction=True, seed=seed)
+                    expected = Swarm(positions, directions, **options)
+                    actual = Swarm(positions, directions, backend="jit", **options)
+                    for _ in range(steps):
+                        expected.step((400, 300))
+                        actual.step_jit((400, 300))
+                    for name in ("positions", "directions", "left_motor", "right_motor", "speed"):
+                        error = np.abs(getattr(expected, name) - getattr(actual, name)).max()
+                        assert error <= tolerance, (
+                            f"{name} differs by {error} for {options}")
+
+
+def test_backends_agree():
+    # Collected by 'python -m pytest step_kernel.py'
+    check_backends(n=200 if AVAILABLE else 30, steps=20 if AVAILABLE else 5)
+
+
+if __name__ == "__main__":
+    test_backends_agree()
+    print("numba" if AVAILABLE else "pure Python", "kernel matches the NumPy path")
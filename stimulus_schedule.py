@@ -0,0 +1,126 @@
+import numpy as np
+
+from random_streams import RandomStreams
+
+
+class Schedule:
+    """Positions and intensities of moving stimuli, generated ahead of the clock.
+
+    Sources are added in groups that share a kind of motion (static, orbit,
+    random walk, scripted path), with per-source parameters given as arrays
+    so thousands of sources are one call. Any source may also pulse. The
+    whole schedule is generated for `chunk` steps at a time, vectorized over
+    steps and sources; at(step) is then only an index into the current
+    chunk. Random walks draw their steps from RandomStreams by (source,
+    step), so the motion does not depend on the chunk size, and asking for
+    an earlier step regenerates from the start.
+    """
+
+    def __init__(self, chunk=256, seed=0, width=None, height=None):
+        self.chunk = chunk
+        self.streams = RandomStreams(seed)
+        self.size = None if width is None else np.array([width, height], dtype=float)
+        self.groups = []
+        self.count = 0
+        self.intensity = []  # (ids, base, depth, period, phase) per group
+        self.start = None
+        self.positions = None
+        self.intensities = None
+
+    def __len__(self):
+        return self.count
+
+    def _add(self, kind, count, intensity, pulse_period, pulse_depth, pulse_phase, **params):
+        ids = np.arange(self.count, self.count + count)
+        params = {name: np.broadcast_to(np.asarray(value, dtype=float),
+                                        (count, 2) if name in ("center", "start") else (count,)).copy()
+                  for name, value in params.items()}
+        self.groups.append((kind, ids, params))
+        if pulse_period is None:
+            pulse_period, pulse_depth = np.inf, 0.0
+        self.intensity.append((ids, *(np.broadcast_to(np.asarray(value, dtype=float), (count,))
+                                      for value in (intensity, pulse_depth, pulse_period, pulse_phase))))
+        self.count += count
+        self.start = None
+        return ids
+
+    def add_static(self, positions, intensity=1.0, pulse_period=None, pulse_depth=0.5, pulse_phase=0.0):
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        return self._add("static", len(positions), intensity, pulse_period, pulse_depth, pulse_phase,
+                         start=positions)
+
+    def add_orbit(self, center, radius, period, phase=0.0, intensity=1.0,
+                  pulse_period=None, pulse_depth=0.5, pulse_phase=0.0):
+        """Circles around `center`, `period` steps per turn (negative turns the other way)."""
+        count = np.broadcast(np.asarray(center, dtype=float).reshape(-1, 2)[:, 0],
+                             radius, period, phase).shape[0]
+        return self._add("orbit", count, intensity, pulse_period, pulse_depth, pulse_phase,
+                         center=center, radius=radius, period=period, phase=phase)
+
+    def add_walk(self, start, step=2.0, intensity=1.0, pulse_period=None, pulse_depth=0.5,
+                 pulse_phase=0.0):
+        """Random walks moving up to `step` along each axis per step; they wrap
+        when the schedule has a width and height."""
+        start = np.asarray(start, dtype=float).reshape(-1, 2)
+        return self._add("walk", len(start), intensity, pulse_period, pulse_depth, pulse_phase,
+                         start=start, step=step)
+
+    def add_path(self, waypoints, period, loop=True, intensity=1.0, pulse_period=None,
+                 pulse_depth=0.5, pulse_phase=0.0):
+        """One source moving along straight lines through `waypoints`, taking
+        `period` steps for the whole path."""
+        waypoints = np.asarray(waypoints, dtype=float).reshape(-1, 2)
+        if loop:
+            waypoints = np.vstack((waypoints, waypoints[:1]))
+        ids = self._add("path", 1, intensity, pulse_period, pulse_depth, pulse_phase,
+                        period=period, loop=float(loop))
+        self.groups[-1][2]["waypoints"] = waypoints
+        return ids
+
+    def generate(self, start):
+        """Fill the chunk of steps [start, start + chunk)."""
+        steps = np.arange(start, start + self.chunk)
+        t = steps[:, None].astype(float)
+        positions = np.empty((self.chunk, self.count, 2))
+        for kind, ids, params in self.groups:
+            if kind == "static":
+                positions[:, ids] = params["start"][None]
+            elif kind == "orbit":
+                angle = 2 * np.pi * t / params["period"] + params["phase"]
+                positions[:, ids, 0] = params["center"][:, 0] + params["radius"] * np.cos(angle)
+                positions[:, ids, 1] = params["center"][:, 1] + params["radius"] * np.sin(angle)
+            elif kind == "walk":
+                if start == 0 or "carry" not in params:
+                    params["carry"] = params["start"].copy()
+                low, high = -params["step"][None], params["step"][None]
+                moves = np.stack((self.streams.uniform(ids[None], steps[:, None], low, high, channel=1),
+                                  self.streams.uniform(ids[None], steps[:, None], low, high, channel=2)),
+                                 axis=-1)
+                moves[steps == 0] = 0  # Step 0 is the start
+                track = params["carry"][None] + np.cumsum(moves, axis=0)
+                if self.size is not None:
+                    track %= self.size
+                params["carry"] = track[-1]
+                positions[:, ids] = track
+            else:
+                waypoints = params["waypoints"]
+                lengths = np.hypot(*np.diff(waypoints, axis=0).T)
+                along = np.concatenate(([0], np.cumsum(lengths))) / max(lengths.sum(), 1e-12)
+                fraction = t[:, 0] / params["period"][0]
+                fraction = fraction % 1 if params["loop"][0] else np.clip(fraction, 0, 1)
+                positions[:, ids[0], 0] = np.interp(fraction, along, waypoints[:, 0])
+                positions[:, ids[0], 1] = np.interp(fraction, along, waypoints[:, 1])
+
+        intensities = np.empty((self.chunk, self.count))
+        for ids, base, depth, period, phase in self.intensity:
+            intensities[:, ids] = base * (1 + depth * np.sin(2 * np.pi * t / period + phase))
+        self.start, self.positions, self.intensities = start, positions, intensities
+
+    def at(self, step):
+        """(positions, intensities) of every source at a simulation step."""
+        if self.start is None or step < self.start:
+            self.generate(0)
+        while step >= self.start + self.chunk:
+            self.generate(self.start + self.chunk)
+        k = step - self.start
+        return self.positions[k], self.intensities[k]
@@ -0,0 +1,233 @@
+import numpy as np
+
+import step_kernel
+from field_texture import FieldTexture
+from neighbours import CellList
+from random_streams import RandomStreams
+
+
+class Swarm:
+    """Array-backed population of test5-style two-sensor vehicles.
+
+    Mirrors test5.Vehicle.move for every vehicle at once: sensor geometry,
+    Vehicle 3 / 4a / 4b responses, crossed or uncrossed wiring, inhibition,
+    integration and screen wrapping. With `mutual` enabled every vehicle also
+    emits a stimulus that the others sense through the same wiring, using a
+    cell list so only neighbours within `mutual_cutoff` are evaluated.
+    With `texture` the sun distance field is baked once per sun position and
+    sensors read it by bilinear lookup instead of computing distances.
+    `obstacles` (an obstacles.Obstacles) hide the sun and other vehicles from
+    sensors they block, which then read max_distance, and push vehicles out.
+
+    backend="jit" fuses the whole step into one compiled loop (see
+    step_kernel.py) when numba is installed and otherwise uses the NumPy path.
+    The fused loop computes sun distances directly and ignores `texture`;
+    with obstacles the NumPy path is always used.
+    """
+
+    def __init__(self, positions, directions, width=800, height=600, fps=60,
+                 vehicle_type="4a", response_type="1", cross=True,
+                 inhibition=False, friction=False, max_distance=400,
+                 mutual=False, mutual_cutoff=150, emission=1.0, texture=False,
+                 obstacles=None, backend="numpy", seed=0, ids=None):
+        self.positions = np.array(positions, dtype=float).reshape(-1, 2)
+        self.directions = np.array(directions, dtype=float).reshape(-1)
+        self.width = width
+        self.height = height
+        self.fps = fps
+
+        self.vehicle_type = vehicle_type
+        self.response_type = response_type
+        self.cross = cross
+        self.inhibition = inhibition
+        self.friction = friction
+        self.max_distance = max_distance
+
+        self.radius = 20
+        self.speed_scaling = 100
+        self.rotation_scaling = 5
+        self.sensor_radius = 15
+        self.sensor_spacing = 30
+        self.sensor_offset = self.radius + self.sensor_radius
+
+        # Vehicle 4a parameters
+        self.optimal_distance = 200
+        self.response_width = 150
+
+        # Vehicle 4b parameters
+        self.threshold_distance = 300
+        self.min_activation = 0.3
+
+        # Vehicles as stimuli for one another
+        self.mutual = mutual
+        self.mutual_cutoff = mutual_cutoff
+        self.emission = emission
+        self.cells = CellList(mutual_cutoff, width, height)
+
+        # Baked sun distance field, rebuilt only when the sun moves
+        self.sun_position = (0.0, 0.0)
+        self.sun_field = FieldTexture(self.sun_distance, width, height) if texture else None
+
+        self.obstacles = obstacles
+        self.backend = backend
+
+        # Friction jitter comes from per-vehicle counter-based streams keyed on
+        # (id, step), so runs are reproducible however the swarm is split
+        self.streams = RandomStreams(seed)
+        self.ids = np.arange(len(self.positions)) if ids is None else np.asarray(ids)
+        self.steps = 0
+
+        n = len(self.positions)
+        self.left_distance = np.zeros(n)
+        self.right_distance = np.zeros(n)
+        self.left_motor = np.zeros(n)
+        self.right_motor = np.zeros(n)
+        self.speed = np.zeros(n)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def sensor_positions(self):
+        radians = np.radians(self.directions)
+        forward = np.stack((np.sin(radians), -np.cos(radians)), axis=1)
+        right = np.stack((forward[:, 1], -forward[:, 0]), axis=1)
+        ahead = self.positions + forward * self.sensor_offset
+        half = right * (self.sensor_spacing / 2)
+        return ahead - half, ahead + half
+
+    def sun_distance(self, x, y):
+        sx, sy = self.sun_position
+        return np.minimum(np.hypot(x - sx, y - sy), self.max_distance)
+
+    def raw_response(self, distance):
+        """Excitation before inhibition and clamping, per vehicle type."""
+        s = self.speed_scaling
+        d = np.asarray(distance, dtype=float)
+        if self.vehicle_type == "3":
+            return np.where(d < 1, s, s / np.maximum(d, 1))
+        if self.vehicle_type == "4a":
+            exponent = -((d - self.optimal_distance) ** 2) / (2 * self.response_width ** 2)
+            return np.where(d < 1, 0.0, s * np.exp(exponent))
+
+        t = self.threshold_distance
+        if self.response_type == "1":
+            response = s * np.maximum(self.min_activation, 1 - d / t)
+        elif self.response_type == "2":
+            response = np.full_like(d, s * 0.8)
+        elif self.response_type == "3":
+            response = np.select([d > t * 0.7, d > t * 0.4], [s * 0.5, s * 0.2], s)
+        elif self.response_type == "4":
+            response = s * (1 - (d / t) ** 2)
+        else:
+            response = np.select([d > t * 0.6, d > t * 0.4, d > t * 0.2],
+                                 [s * 0.3, s, s * 0.5], s)
+        return np.where(d > t, 0.0, response)
+
+    def finish_response(self, excitation):
+        if self.inhibition:
+            excitation = self.speed_scaling - excitation
+        return np.clip(excitation, 0, self.speed_scaling)
+
+    def response(self, distance):
+        """Single-source response, identical to test5's calculate_*_response."""
+        d = np.asarray(distance, dtype=float)
+        response = self.finish_response(self.raw_response(d))
+        # Out-of-range readings short-circuit before inhibition in test5
+        if self.vehicle_type == "3":
+            return np.where(d < 1, self.speed_scaling, response)
+        if self.vehicle_type == "4a":
+            return np.where(d < 1, 0.0, response)
+        return np.where(d > self.threshold_distance, 0.0, response)
+
+    def mutual_excitation(self, left_sensor, right_sensor, halo=None):
+        """Summed raw excitation each sensor receives from nearby vehicles.
+
+        `halo` holds positions of extra emitters that are sensed but not
+        stepped, e.g. vehicles owned by a neighbouring worker.
+        """
+        n = len(self)
+        emitters = self.positions if halo is None else np.concatenate((self.positions, halo))
+        if len(emitters) < 2:
+            return np.zeros(n), np.zeros(n)
+
+        i, j, offset, _ = self.cells.build(emitters).pairs()
+        own = i < n
+        i, offset = i[own], offset[own]
+        # Emitter position relative to the sensing vehicle, in wrapped space
+        emitter = self.positions[i] + offset
+        totals = []
+        for sensor in (left_sensor, right_sensor):
+            delta = emitter - sensor[i]
+            distance = np.minimum(np.hypot(delta[:, 0], delta[:, 1]), self.max_distance)
+            excitation = self.emission * self.raw_response(distance)
+            if self.obstacles is not None:
+                excitation *= self.obstacles.visible(sensor[i], emitter)
+            totals.append(np.bincount(i, excitation, minlength=n))
+        return totals[0], totals[1]
+
+    def jitter(self):
+        if not self.friction:
+            return np.zeros(len(self))
+        return self.streams.integers(self.ids, self.steps, -2, 3).astype(float)
+
+    def step_jit(self, sun_position, halo=None):
+        n = len(self)
+        if self.mutual:
+            extra_left, extra_right = self.mutual_excitation(*self.sensor_positions(), halo)
+        else:
+            extra_left = extra_right = np.zeros(n)
+        step_kernel.step(self, sun_position, extra_left, extra_right, self.jitter())
+        self.steps += 1
+
+    def step(self, sun_position, halo=None):
+        if self.backend == "jit" and step_kernel.AVAILABLE and self.obstacles is None:
+            self.step_jit(sun_position, halo)
+            return
+
+        left_sensor, right_sensor = self.sensor_positions()
+        self.sun_position = (float(sun_position[0]), float(sun_position[1]))
+
+        if self.sun_field is not None:
+            self.sun_field.update(self.sun_position)
+            distances = self.sun_field.sample(np.concatenate((left_sensor, right_sensor)))[:, 0]
+            self.left_distance, self.right_distance = np.split(distances, 2)
+        else:
+            self.left_distance = self.sun_distance(*left_sensor.T)
+            self.right_distance = self.sun_distance(*right_sensor.T)
+        if self.obstacles is not None:
+            sun = np.broadcast_to(self.sun_position, left_sensor.shape)
+            self.left_distance = np.where(self.obstacles.visible(left_sensor, sun),
+                                          self.left_distance, self.max_distance)
+            self.right_distance = np.where(self.obstacles.visible(right_sensor, sun),
+                                           self.right_distance, self.max_distance)
+
+        if self.mutual:
+            extra_left, extra_right = self.mutual_excitation(left_sensor, right_sensor, halo)
+            left_speed = self.finish_response(
+                self.raw_response(self.left_distance) + extra_left)
+            right_speed = self.finish_response(
+                self.raw_response(self.right_distance) + extra_right)
+        else:
+            left_speed = self.response(self.left_distance)
+            right_speed = self.response(self.right_distance)
+
+        if self.cross:
+            self.left_motor, self.right_motor = right_speed, left_speed
+        else:
+            self.left_motor, self.right_motor = left_speed, right_speed
+
+        self.speed = (self.left_motor + self.right_motor) / 2
+        self.directions += (self.right_motor - self.left_motor) * self.rotation_scaling
+
+        radians = np.radians(self.directions)
+        self.positions[:, 0] += np.sin(radians) * self.speed / self.fps
+        self.positions[:, 1] -= np.cos(radians) * self.speed / self.fps
+
+        # Screen Wrapping
+        self.positions[:, 0] %= self.width
+        self.positions[:, 1] %= self.height
+        if self.obstacles is not None:
+            self.positions, _ = self.obstacles.push_out(self.positions, self.radius)
+
+        self.directions += self.jitter()
+        self.steps += 1
@@ -0,0 +1,212 @@
+import csv
+import json
+import os
+import queue
+import random
+import threading
+
+import numpy as np
+
+
+def to_columns(records):
+    """Merge records into equal-length columns.
+
+    A record maps names to scalars or 1-d arrays; scalars are repeated along
+    the record's arrays, so a whole population can be logged as one record.
+    Names missing from some records are filled with None there (an object
+    column, written as empty in CSV and null in JSON lines).
+    """
+    names = list(dict.fromkeys(name for record in records for name in record))
+    columns = {name: [] for name in names}
+    for record in records:
+        length = max((np.size(v) for v in record.values() if np.ndim(v)), default=1)
+        for name in names:
+            if name in record:
+                columns[name].append(np.broadcast_to(np.asarray(record[name]), (length,)))
+            else:
+                columns[name].append(np.full(length, None, dtype=object))
+    return {name: np.concatenate(parts) for name, parts in columns.items()}
+
+
+class CsvSink:
+    """The header is the first batch's names. Later names missing from a batch
+    are written empty; names that were not in the header raise ValueError."""
+
+    def __init__(self, path):
+        self.file = open(path, "w", newline="")
+        self.writer = csv.writer(self.file)
+        self.names = None
+
+    def write(self, columns):
+        if self.names is None:
+            self.names = list(columns)
+            self.writer.writerow(self.names)
+        extra = set(columns) - set(self.names)
+        if extra:
+            raise ValueError(f"columns {sorted(extra)} are not in the CSV header {self.names}")
+        length = len(next(iter(columns.values())))
+        self.writer.writerows(zip(*(columns[name].tolist() if name in columns else [None] * length
+                                    for name in self.names)))
+
+    def close(self):
+        self.file.close()
+
+
+class JsonLinesSink:
+    def __init__(self, path):
+        self.file = open(path, "w")
+
+    def write(self, columns):
+        names = list(columns)
+        for row in zip(*(columns[name].tolist() for name in names)):
+            self.file.write(json.dumps(dict(zip(names, row))) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+class ColumnSink:
+    """One raw binary file per column plus a JSON header, readable with np.fromfile."""
+
+    def __init__(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.files = {}
+        self.dtypes = {}
+
+    def write(self, columns):
+        if self.files and set(columns) != set(self.files):
+            # Every column file must stay the same length
+            raise ValueError(f"columns changed from {sorted(self.files)} to {sorted(columns)}")
+        for name, values in columns.items():
+            if name not in self.files:
+                if values.dtype.kind not in "biuf":
+                    raise ValueError(f"column {name!r} is not numeric")
+                self.dtypes[name] = values.dtype.str
+                self.files[name] = open(os.path.join(self.path, f"{name}.bin"), "wb")
+            values.astype(self.dtypes[name]).tofile(self.files[name])
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        with open(os.path.join(self.path, "columns.json"), "w") as f:
+            json.dump(self.dtypes, f)
+
+
+SINKS = {".csv": CsvSink, ".jsonl": JsonLinesSink, "": ColumnSink}
+
+
+def read_columns(path):
+    """Load a ColumnSink directory back as a dict of arrays."""
+    with open(os.path.join(path, "columns.json")) as f:
+        dtypes = json.load(f)
+    return {name: np.fromfile(os.path.join(path, f"{name}.bin"), dtype=dtype)
+            for name, dtype in dtypes.items()}
+
+
+class TelemetryWriter:
+    """Buffers per-step records in batches and writes them on a background thread.
+
+    The format follows the path: .csv, .jsonl, or a directory (no extension)
+    of columnar binary files. `every` keeps one step in N and `sample` keeps
+    each remaining record with that probability. At most `max_batches` full
+    batches wait for the writer; beyond that, records are dropped and
+    counted in `dropped` (or the caller blocks, with `block=True`).
+
+    If the sink fails, the writer keeps draining (and counting as dropped)
+    later batches so the caller never stalls, and close() raises the error.
+    """
+
+    def __init__(self, path, batch_size=256, max_batches=8, every=1, sample=1.0,
+                 block=False, seed=None):
+        self.sink = SINKS[os.path.splitext(path)[1]](path)
+        self.batch_size = batch_size
+        self.every = every
+        self.sample = sample
+        self.block = block
+        self.random = random.Random(seed)
+        self.batch = []
+        self.seen = 0
+        self.written = 0
+        self.dropped = 0
+        self.error = None
+        self.batches = queue.Queue(maxsize=max_batches)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def write(self, record):
+        self.seen += 1
+        if (self.seen - 1) % self.every:
+            return
+        if self.sample < 1 and self.random.random() >= self.sample:
+            return
+        self.batch.append(record)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def consume(self, records):
+        """Write every record a generator yields."""
+        for record in records:
+            self.write(record)
+
+    def flush(self):
+        if not self.batch:
+            return
+        batch, self.batch = self.batch, []
+        try:
+            self.batches.put(batch, block=self.block)
+        except queue.Full:
+            self.dropped += len(batch)
+
+    def run(self):
+        while True:
+            batch = self.batches.get()
+            if batch is None:
+                break
+            if self.error is not None:
+                self.dropped += len(batch)
+                continue
+            try:
+                self.sink.write(to_columns(batch))
+                self.written += len(batch)
+            except Exception as error:
+                self.error = error
+                self.dropped += len(batch)
+
+    def close(self, timeout=10.0):
+        self.flush()
+        try:
+            self.batches.put(None, timeout=timeout)
+            self.thread.join(timeout)
+        except queue.Full:
+            pass
+        if self.thread.is_alive() and self.error is None:
+            self.error = RuntimeError(f"telemetry writer did not finish within {timeout}s")
+        self.sink.close()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def swarm_records(swarm, sun_position, steps):
+    """Step a Swarm and yield one record per step covering every vehicle."""
+    vehicle = np.arange(len(swarm))
+    for step in range(steps):
+        swarm.step(sun_position)
+        yield {
+            "step": step,
+            "vehicle": vehicle,
+            "x": swarm.positions[:, 0].copy(),
+            "y": swarm.positions[:, 1].copy(),
+            "direction": swarm.directions.copy(),
+            "left_distance": swarm.left_distance.copy(),
+            "right_distance": swarm.right_distance.copy(),
+            "left_motor": swarm.left_motor.copy(),
+            "right_motor": swarm.right_motor.copy(),
+            "speed": swarm.speed.copy(),
+        }
@@ -1,6 +1,8 @@
-import random
 import pygame
 
+from heatmap import Heatmap
+from random_streams import RandomStreams
+
 pygame.init()
 
 WIDTH, HEIGHT = 800, 600
@@ -18,6 +20,10 @@ YELLOW = (255, 255, 0)
 RED = (255, 0, 0)
 GREEN = (0, 255, 0)
 
+HEATMAP = True  # Overlay where the vehicle has spent its time (H to toggle, E to export)
+HEATMAP_PATH = "test_heatmap.npy"
+SEED = 0  # Wander jitter is drawn from per-vehicle streams of this seed
+
 
 class Circle:
     def __init__(self, position, radius=30, color=RED):
@@ -30,9 +36,10 @@ class Circle:
 
 
 class Vehicle:
-    def __init__(self, position, direction, radius=50, color=RED):
+    def __init__(self, position, direction, radius=50, color=RED, stream=0):
         self.position = pygame.math.Vector2(position)
         self.direction = direction  # Direction in degrees
+        self.stream = stream  # Id of this vehicle's random stream
         self.radius = radius
         self.color = color
         self.speed_scalling = 100
@@ -51,10 +58,8 @@ class Vehicle:
         # Update sensor positions initially
         self.update_sensor_positions()
 
-    def update_direction(self, amount=0):
-        """Update vehicle direction with optional random component"""
-        if amount == 0:
-            amount = random.randint(-5, 5)
+    def update_direction(self, amount):
+        """Turn the vehicle by amount degrees"""
         self.direction += amount
         self.normalize_direction()
 
@@ -101,7 +106,7 @@ class Vehicle:
         self.position.y = max(self.radius, min(
             HEIGHT - self.radius, self.position.y))
 
-    def move(self, sun_position):
+    def move(self, sun_position, jitter=0):
         # Calculate distances from sensors to the sun
         left_distance = max(
             1.0, self.left_sensor_position.distance_to(sun_position))
@@ -128,7 +133,7 @@ class Vehicle:
 
         # Add small random movement (Braitenberg vehicles often have this)
         # Remove this if you want more predictable movement
-        self.direction += random.randint(-2, 2)
+        self.direction += jitter
 
         # Keep vehicle in bounds and normalize direction
         self.keep_in_bounds()
@@ -145,7 +150,10 @@ class Vehicle:
 
 # Create sun and vehicle
 sun = Circle((WIDTH//2, HEIGHT//2), radius=30, color=YELLOW)
+streams = RandomStreams(SEED)
 vehicle = Vehicle((300, 500), 45)
+heatmap = Heatmap(WIDTH, HEIGHT)
+step = 0
 
 running = True
 while running:
@@ -157,11 +165,22 @@ while running:
         if event.type == pygame.MOUSEBUTTONDOWN:
             sun.position = pygame.math.Vector2(event.pos)
 
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_h:
+                HEATMAP = not HEATMAP
+            elif event.key == pygame.K_e:
+                heatmap.save(HEATMAP_PATH)
+
     screen.fill((0, 0, 0))  # Fill with black background
+    if HEATMAP:
+        screen.blit(heatmap.overlay(), (0, 0))
 
     # Draw sun and update vehicle
     sun.draw(screen)
-    vehicle.move(sun.position)
+    # Wander jitter for the step, keyed on (stream, step)
+    vehicle.move(sun.position, int(streams.integers(vehicle.stream, step, -2, 3)))
+    step += 1
+    heatmap.add([(vehicle.position.x, vehicle.position.y)])
     vehicle.draw(screen)
 
     pygame.display.flip()
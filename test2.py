@@ -1,6 +1,7 @@
-import random
 import pygame
 
+from random_streams import RandomStreams
+
 pygame.init()
 
 WIDTH, HEIGHT = 800, 600
@@ -20,6 +21,7 @@ GREEN = (0, 255, 0)
 BLUE = (0, 0, 255)
 
 FRICTION = False
+SEED = 0  # Friction jitter is drawn from per-vehicle streams of this seed
 INHIBITION = True
 CROSS = True  # Switch between 3a (False) and 3b (True)
 
@@ -35,9 +37,10 @@ class Circle:
 
 
 class Vehicle:
-    def __init__(self, position, direction, radius=20, color=RED):
+    def __init__(self, position, direction, radius=20, color=RED, stream=0):
         self.position = pygame.math.Vector2(position)
         self.direction = direction
+        self.stream = stream  # Id of this vehicle's random stream
         self.radius = radius
         self.color = color
         self.speed_scaling = 100  # Renamed for clarity
@@ -64,8 +67,8 @@ class Vehicle:
         self.right_sensor_position = self.position + forward_direction * \
             self.sensor_offset + right_direction * (self.sensor_spacing/2)
 
-    def update_direction(self):
-        self.direction += random.randint(-5, 5)
+    def update_direction(self, jitter):
+        self.direction += jitter
 
     def draw(self, surface):
         # Draw vehicle body
@@ -86,7 +89,7 @@ class Vehicle:
         pygame.draw.circle(surface, sensor_color,
                           self.right_sensor_position, self.sensor_radius)
 
-    def move(self, sun_position):
+    def move(self, sun_position, jitter=0):
         # Calculate sensor distances
         left_distance = self.left_sensor_position.distance_to(sun_position)
         right_distance = self.right_sensor_position.distance_to(sun_position)
@@ -132,7 +135,7 @@ class Vehicle:
         
         # Apply random friction if enabled
         if FRICTION:
-            self.update_direction()
+            self.update_direction(jitter)
             
         # Display info
         behavior = "Permanent Love (3a)" if not CROSS else "Explorer (3b)"
@@ -153,7 +156,9 @@ class Vehicle:
 
 # Create objects
 sun = Circle((WIDTH//2, HEIGHT//2), radius=30, color=YELLOW)
+streams = RandomStreams(SEED)
 vehicle = Vehicle((300, 500), 45)
+step = 0
 
 # Main game loop
 running = True
@@ -185,7 +190,9 @@ while running:
     
     # Draw objects
     sun.draw(screen)
-    vehicle.move(sun.position)
+    # Friction jitter for the step, keyed on (stream, step)
+    vehicle.move(sun.position, int(streams.integers(vehicle.stream, step, -5, 6)) if FRICTION else 0)
+    step += 1
     vehicle.draw(screen)
 
     pygame.display.flip()
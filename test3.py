@@ -1,5 +1,11 @@
 import pygame
-import math
+import numpy as np
+
+from barnes_hut import QuadTree
+from field_texture import FieldTexture
+from random_streams import RandomStreams
+from scenario import Scenario
+from wiring import Wiring, pair
 
 pygame.init()
 
@@ -26,88 +32,162 @@ stimuli = [
     {"pos": pygame.math.Vector2(200, 500), "color": BLUE, "type": "oxygen"},
     {"pos": pygame.math.Vector2(600, 450), "color": GREEN, "type": "organic"}
 ]
-
-class Vehicle:
-    def __init__(self, pos, angle):
-        self.pos = pygame.math.Vector2(pos)
-        self.angle = angle
+STIMULUS_COLORS = {"light": YELLOW, "heat": RED, "oxygen": BLUE, "organic": GREEN}
+
+SCENARIO = None  # e.g. "scenarios/test3.json" for the stimuli and the vehicle's start
+scenario = Scenario.load(SCENARIO) if SCENARIO else None
+if scenario:
+    stimuli = [{"pos": pygame.math.Vector2(float(x), float(y)), "color": STIMULUS_COLORS[s_type],
+                "type": s_type}
+               for s_type, points in scenario.stimulus_positions().items() for x, y in points]
+
+# Summed 1/d fields: "exact" loops over every stimulus, "barnes-hut" groups
+# far-away stimuli of each type in a quadtree, "texture" bakes the per-type
+# fields into a grid once (B to cycle, D adds 10,000 stimuli)
+FIELD_MODE = "exact"
+FIELD_MODES = ["exact", "barnes-hut", "texture"]
+THETA = {"light": 0.5, "heat": 0.5, "oxygen": 0.5, "organic": 0.5}  # Opening angle per type
+DENSE_STIMULI = 2500  # Stimuli of each type added by D
+
+
+def build_fields(stimuli):
+    # One quadtree per stimulus type
+    positions = {s_type: [] for s_type in STIMULUS_COLORS}
+    for stim in stimuli:
+        positions[stim["type"]].append((stim["pos"].x, stim["pos"].y))
+    return {s_type: QuadTree(points) for s_type, points in positions.items()}
+
+
+def stimulus_channels(x, y):
+    # Per-type summed 1/d field at the texture grid points
+    points = np.column_stack((x, y))
+    return [tree.evaluate(points, THETA[s_type])[0] for s_type, tree in build_fields(stimuli).items()]
+
+
+texture = FieldTexture(stimulus_channels, WIDTH, HEIGHT)
+
+
+def add_dense_stimuli(stimuli, count):
+    # Drawn from the seeded streams by stimulus index, so runs repeat from SEED
+    for s_type, color in STIMULUS_COLORS.items():
+        ids = np.arange(len(stimuli), len(stimuli) + count)
+        xs = streams.uniform(ids, 0, 0, WIDTH, channel=3)
+        ys = streams.uniform(ids, 0, 0, HEIGHT, channel=4)
+        for x, y in zip(xs.tolist(), ys.tolist()):
+            stimuli.append({"pos": pygame.math.Vector2(x, y), "color": color, "type": s_type,
+                            "dense": True})
+
+
+# Sensor -> motor wiring, one 2x2 pattern per stimulus type (in the order
+# of STIMULUS_COLORS); any sensor layout and weight matrix can be used here
+WIRING = Wiring.two_sensor(offset=35, spacing=40, patterns=[
+    pair(crossed=False),                   # light: uncrossed excitatory
+    pair(crossed=True),                    # heat: crossed excitatory
+    pair(crossed=True, inhibitory=True),   # oxygen: crossed inhibitory
+    pair(crossed=False, inhibitory=True),  # organic: uncrossed inhibitory
+])
+COUNT = 1  # Vehicles, all sensed and driven together
+SEED = 0  # Seeds vehicle starts and added stimuli
+streams = RandomStreams(SEED)
+
+
+def stimulus_arrays(stimuli):
+    # Positions of each stimulus type, for the exact field
+    return {s_type: np.array([(s["pos"].x, s["pos"].y) for s in stimuli
+                              if s["type"] == s_type], dtype=float).reshape(-1, 2)
+            for s_type in STIMULUS_COLORS}
+
+
+def exact_signals(points, arrays):
+    # Summed 1/d of every stimulus of each type, one column per type
+    columns = []
+    for positions in arrays.values():
+        distance = np.hypot(points[:, None, 0] - positions[None, :, 0],
+                            points[:, None, 1] - positions[None, :, 1])
+        columns.append((1 / np.maximum(1, distance)).sum(axis=1))
+    return np.column_stack(columns)
+
+
+class Vehicles:
+    """A population of Vehicle 3c's.
+
+    Every sensor of every vehicle is read in one lookup and the motors are
+    the wiring matrix applied to all of them at once.
+    """
+
+    def __init__(self, positions, angles, wiring=WIRING):
+        self.pos = np.array(positions, dtype=float).reshape(-1, 2)
+        self.angle = np.array(angles, dtype=float).reshape(-1)
+        self.wiring = wiring
         self.radius = 25
-        self.sensor_offset = 35
-        self.sensor_spacing = 40
         self.speed_scale = 300
         self.rotation_scale = 0.003
-
-    def get_sensor_positions(self):
-        forward = pygame.math.Vector2(0, -1).rotate(self.angle)
-        right = forward.rotate(90)
-        left_sensor = self.pos + forward * self.sensor_offset - right * (self.sensor_spacing / 2)
-        right_sensor = self.pos + forward * self.sensor_offset + right * (self.sensor_spacing / 2)
-        return left_sensor, right_sensor
-
-    def move(self, stimuli):
-        speed_l = 0
-        speed_r = 0
-
-        # Get sensor positions
-        left_sensor, right_sensor = self.get_sensor_positions()
-
-        for stim in stimuli:
-            s_pos = stim["pos"]
-            s_type = stim["type"]
-
-            l_dist = max(1, left_sensor.distance_to(s_pos))
-            r_dist = max(1, right_sensor.distance_to(s_pos))
-
-            # Influence drops with distance (1/d)
-            l_signal = 1 / l_dist
-            r_signal = 1 / r_dist
-
-            # Apply different connection schemes
-            if s_type == "light":
-                # Uncrossed excitatory
-                speed_l += l_signal
-                speed_r += r_signal
-            elif s_type == "heat":
-                # Crossed excitatory
-                speed_l += r_signal
-                speed_r += l_signal
-            elif s_type == "oxygen":
-                # Crossed inhibitory
-                speed_l -= r_signal
-                speed_r -= l_signal
-            elif s_type == "organic":
-                # Uncrossed inhibitory
-                speed_l -= l_signal
-                speed_r -= r_signal
+        self.error_bound = 0.0
+
+    def sensor_positions(self):
+        return self.wiring.sensor_positions(self.pos, self.angle)
+
+    def sense(self, points, arrays, fields=None, texture=None):
+        # (points, types) signals, with the worst case Barnes-Hut error
+        self.error_bound = 0.0
+        if texture is not None:
+            return texture.sample(points)
+        if fields is not None:
+            columns = []
+            for s_type, tree in fields.items():
+                values, bound = tree.evaluate(points, THETA[s_type])
+                columns.append(values)
+                self.error_bound = max(self.error_bound, bound.max())
+            return np.column_stack(columns)
+        return exact_signals(points, arrays)
+
+    def move(self, arrays, fields=None, texture=None):
+        sensors = self.sensor_positions()
+        n, count = sensors.shape[:2]
+        signals = self.sense(sensors.reshape(-1, 2), arrays, fields, texture)
+        inputs = signals.reshape(n, count, -1).transpose(0, 2, 1)
 
         # Clip speed
-        speed_l = max(0, speed_l)
-        speed_r = max(0, speed_r)
+        motors = np.maximum(0, self.wiring.motors(inputs))
+        speed_l, speed_r = motors[:, 0], motors[:, 1]
 
         # Compute movement
         speed = (speed_l + speed_r) / 2 * self.speed_scale / 100
         rotation = (speed_r - speed_l) * self.rotation_scale * self.speed_scale
 
-        self.angle += math.degrees(rotation)
-        direction = pygame.math.Vector2(0, -1).rotate(self.angle)
-        self.pos += direction * speed
+        self.angle += np.degrees(rotation)
+        radians = np.radians(self.angle)
+        self.pos[:, 0] += np.sin(radians) * speed
+        self.pos[:, 1] -= np.cos(radians) * speed
 
         # Wrap screen
-        self.pos.x %= WIDTH
-        self.pos.y %= HEIGHT
+        self.pos[:, 0] %= WIDTH
+        self.pos[:, 1] %= HEIGHT
 
     def draw(self, surface):
-        pygame.draw.circle(surface, PURPLE, self.pos, self.radius)
-        left_sensor, right_sensor = self.get_sensor_positions()
-        pygame.draw.circle(surface, CYAN, left_sensor, 5)
-        pygame.draw.circle(surface, CYAN, right_sensor, 5)
+        for (x, y), sensors in zip(self.pos.tolist(), self.sensor_positions().tolist()):
+            pygame.draw.circle(surface, PURPLE, (x, y), self.radius)
+            for sensor in sensors:
+                pygame.draw.circle(surface, CYAN, sensor, 5)
 
         label = font.render("Vehicle 3c", True, WHITE)
         surface.blit(label, (10, 10))
+        mode = f"Field: {FIELD_MODE} | Error bound: {self.error_bound:.4f} | B: mode, D: add stimuli"
+        surface.blit(font.render(mode, True, WHITE), (10, 35))
 
 
 # Main loop
-vehicle = Vehicle((400, 300), 0)
+if scenario and len(scenario):
+    vehicles = Vehicles(scenario.positions, scenario.directions)
+else:
+    # The first vehicle starts in the middle, any others at seeded random spots
+    others = np.arange(1, COUNT)
+    positions = np.column_stack((streams.uniform(others, 0, 0, WIDTH, channel=1),
+                                 streams.uniform(others, 0, 0, HEIGHT, channel=2)))
+    vehicles = Vehicles(np.vstack(([(400, 300)], positions)),
+                        np.concatenate(([0], streams.uniform(others, 0, 0, 360))))
+fields = None
+arrays = stimulus_arrays(stimuli)
 running = True
 
 while running:
@@ -116,14 +196,29 @@ while running:
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             running = False
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_b:
+                FIELD_MODE = FIELD_MODES[(FIELD_MODES.index(FIELD_MODE) + 1) % len(FIELD_MODES)]
+            elif event.key == pygame.K_d:
+                add_dense_stimuli(stimuli, DENSE_STIMULI)
+                fields = None
+                arrays = stimulus_arrays(stimuli)
+
+    # Stimuli are static, so the trees are only rebuilt when stimuli are added
+    if FIELD_MODE == "barnes-hut" and fields is None:
+        fields = build_fields(stimuli)
+    elif FIELD_MODE == "texture":
+        texture.update(len(stimuli))
 
     # Draw stimuli
     for s in stimuli:
-        pygame.draw.circle(screen, s["color"], (int(s["pos"].x), int(s["pos"].y)), 20)
+        radius = 1 if s.get("dense") else 20
+        pygame.draw.circle(screen, s["color"], (int(s["pos"].x), int(s["pos"].y)), radius)
 
-    # Update vehicle
-    vehicle.move(stimuli)
-    vehicle.draw(screen)
+    # Update vehicles
+    vehicles.move(arrays, fields if FIELD_MODE == "barnes-hut" else None,
+                  texture if FIELD_MODE == "texture" else None)
+    vehicles.draw(screen)
 
     pygame.display.flip()
     clock.tick(60)
@@ -1,5 +1,8 @@
-import random
 import pygame
+
+from hud import Hud
+from random_streams import RandomStreams
+from trail_layer import TrailLayer
 import math
 
 pygame.init()
@@ -22,10 +25,13 @@ BLUE = (0, 0, 255)
 
 # Vehicle behavior settings
 FRICTION = False
+SEED = 0  # Friction jitter is drawn from per-vehicle streams of this seed
 INHIBITION = False
 CROSS = True
 VEHICLE_TYPE = "4a"  # Options: "3", "4a", "4b"
 MAX_DISTANCE = 400  # Maximum effective distance for sensor calculations
+TRAIL_LAYER = False  # Paint trails once onto a fading background instead of redrawing them
+TRAIL_FADE = 0.98  # Trail brightness kept per frame in TRAIL_LAYER mode
 
 
 class Circle:
@@ -52,9 +58,10 @@ class Circle:
 
 
 class Vehicle:
-    def __init__(self, position, direction, radius=20, color=RED):
+    def __init__(self, position, direction, radius=20, color=RED, stream=0):
         self.position = pygame.math.Vector2(position)
         self.direction = direction
+        self.stream = stream  # Id of this vehicle's random stream
         self.radius = radius
         self.color = color
         self.speed_scaling = 100
@@ -75,6 +82,7 @@ class Vehicle:
 
         self.update_sensor_positions()
         self.sensor_color = GREEN
+        self.hud = ()  # Status lines, drawn by the main loop
         
         # Trajectory tracking
         self.max_trail_length = 200
@@ -89,12 +97,12 @@ class Vehicle:
         self.right_sensor_position = self.position + forward_direction * \
             self.sensor_offset + right_direction * (self.sensor_spacing/2)
 
-    def update_direction(self):
-        self.direction += random.randint(-2, 2)
+    def update_direction(self, jitter):
+        self.direction += jitter
 
     def draw(self, surface):
         # Draw trail
-        if len(self.trail) >= 2:
+        if not TRAIL_LAYER and len(self.trail) >= 2:
             pygame.draw.lines(surface, (100, 100, 100), False, self.trail, 1)
         
         # Draw vehicle body
@@ -149,7 +157,7 @@ class Vehicle:
             
         return max(0, min(response, self.speed_scaling))  # Clamp to [0, speed_scaling]
 
-    def move(self, sun_position):
+    def move(self, sun_position, jitter=0):
         # Update sensor positions
         self.update_sensor_positions()
 
@@ -198,7 +206,7 @@ class Vehicle:
 
         # Apply random direction changes if friction is enabled
         if FRICTION:
-            self.update_direction()
+            self.update_direction(jitter)
 
         # Update display info
         vehicle_types = {
@@ -208,24 +216,20 @@ class Vehicle:
         }
         behavior = "Explorer" if CROSS else "Love"
         
-        text1 = font.render(
+        self.hud = (
             f"Type: {vehicle_types[VEHICLE_TYPE]} | Behavior: {behavior} | Cross: {CROSS} | Inhibition: {INHIBITION}",
-            True, WHITE)
-        text2 = font.render(
             f"Left Distance: {left_distance:.0f} Right Distance: {right_distance:.0f} | Speed: {speed:.1f}",
-            True, WHITE)
-        text3 = font.render(
             f"Left Motor: {left_motor:.1f} Right Motor: {right_motor:.1f} | Press T to change vehicle type",
-            True, WHITE)
-
-        screen.blit(text1, (10, 10))
-        screen.blit(text2, (10, 35))
-        screen.blit(text3, (10, 60))
+        )
 
 
 # Create objects
 sun = Circle((WIDTH//2, HEIGHT//2), radius=30, color=YELLOW)
+streams = RandomStreams(SEED)
 vehicle = Vehicle((WIDTH//2 + 200, HEIGHT//2), 0)
+hud = Hud(font)
+trails = TrailLayer((WIDTH, HEIGHT), fade=TRAIL_FADE) if TRAIL_LAYER else None
+step = 0
 
 # Main loop
 running = True
@@ -257,12 +261,22 @@ while running:
         # Handle sun dragging
         sun.handle_event(event)
 
-    screen.fill((0, 0, 0))  # Fill with black background
-    
     # Update and draw objects
+    previous = (vehicle.position.x, vehicle.position.y)
+    # Friction jitter for the step, keyed on (stream, step)
+    vehicle.move(sun.position, int(streams.integers(vehicle.stream, step, -2, 3)) if FRICTION else 0)
+    step += 1
+    if trails:
+        # Only the newest segment is drawn; the layer is the background
+        trails.fade()
+        trails.add(previous, (vehicle.position.x, vehicle.position.y))
+        trails.draw(screen)
+    else:
+        screen.fill((0, 0, 0))  # Fill with black background
     sun.draw(screen)
-    vehicle.move(sun.position)
     vehicle.draw(screen)
+    hud.set(vehicle.hud)
+    hud.draw(screen)
 
     pygame.display.flip()
     clock.tick(fps)
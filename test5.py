@@ -1,14 +1,42 @@
 import pygame
+import functools
+import json
+import logging
 import math
+import time
+import numpy as np
+from collections import namedtuple
+
+from analytics import TrajectoryAnalytics
+from camera import Camera
+from control_server import ControlServer, Metrics
+from entities import Entity, Field, Vector2, memory_report
+from field_texture import FieldTexture
+from frame_governor import FrameGovernor
+from heatmap import Heatmap
+from hud import Hud, cache
+from lod import FULL, PIXEL, LevelOfDetail
+from neighbours import CellList
+from obstacles import Obstacles
+from random_streams import RandomStreams
+from recorder import Recorder
+from sim_thread import SimulationThread
+from stimulus_schedule import Schedule
+from telemetry import TelemetryWriter
+from trail_layer import TrailLayer
 
 pygame.init()
 
 WIDTH, HEIGHT = 800, 600
+# The world can be far larger than the window; wheel zooms, right drag or the
+# arrow keys pan and Home shows the whole world
+WORLD_WIDTH, WORLD_HEIGHT = WIDTH, HEIGHT
 screen = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption("Braitenberg Vehicle 4 Simulation")
 
 pygame.font.init()
 font = pygame.font.SysFont("Arial", 20)
+label_font = pygame.font.SysFont("Arial", 16)
 
 clock = pygame.time.Clock()
 fps = 60
@@ -21,16 +49,50 @@ BLUE = (0, 0, 255)
 
 # Vehicle behavior settings
 FRICTION = False
+SEED = 0  # Friction jitter is drawn from per-vehicle streams of this seed
 INHIBITION = False
 CROSS = True
 VEHICLE_TYPE = "4a"  # Options: "3", "4a", "4b"
 RESPONSE_TYPE = "1"  # For 4b: different response functions (1-4)
 MAX_DISTANCE = 400  # Maximum effective distance for sensor calculations
+MUTUAL = False  # Vehicles also sense each other as stimuli (M to toggle, N to add)
+MUTUAL_CUTOFF = 150  # Vehicles further apart than this ignore each other
+EMISSION = 1.0  # Stimulus strength of a vehicle relative to the sun
+TEXTURE = False  # Read sun distances from a baked field, rebaked when the sun is dragged (X)
+OBSTACLES = False  # Walls that block vehicles and hide the sun behind them (O to toggle)
+LOD_FULL_BELOW = 50  # Other vehicles drawn in full detail up to this many (K adds a crowd)
+LOD_PIXELS_ABOVE = 2000  # Beyond this many they are drawn as single pixels
+CROWD = 500  # Vehicles added by K
+THREADED = False  # Step the simulation on its own thread; the window draws the latest snapshot
+TELEMETRY_PATH = None  # e.g. "test5.csv", "test5.jsonl" or "test5_columns" to log every step
+TELEMETRY_EVERY = 1  # Log one step in N
+CONTROL_PORT = None  # e.g. 8765 to serve /metrics and /command on localhost
+HEATMAP = False  # Overlay where vehicles have spent their time (H to toggle, E to export)
+HEATMAP_DECAY = 1.0  # Below 1, older visits fade each step
+HEATMAP_WINDOW = None  # e.g. 600 to count only the last 600 steps
+HEATMAP_PATH = "test5_heatmap.npy"
+RECORD_PATH = None  # e.g. "test5_frames" for a PNG sequence or "test5.mp4" via ffmpeg
+STEPS_PER_FRAME = 1  # Simulation steps per drawn frame when not threaded
+SUN_MOTION = None  # "orbit", "walk" or "path" to move the sun on a precomputed schedule
+TRAIL_LAYER = False  # Paint trails once onto a fading background instead of redrawing them
+TRAIL_FADE = 0.98  # Trail brightness kept per frame in TRAIL_LAYER mode
+GOVERNOR = False  # Shed labels, trail length, LOD detail and steps per frame to hold fps
+ANALYTICS = False  # Keep running behaviour metrics, served on /metrics and printed on exit
+
+# Immutable copies of what the renderer needs, published by the simulation
+VehicleState = namedtuple(
+    "VehicleState", "position direction radius color trail left_sensor right_sensor "
+                    "sensor_radius activations")
+WorldState = namedtuple("WorldState", "sun vehicles hud heat")
+
+
+class Circle(Entity):
+    __slots__ = ("color", "radius")
+    position = Field(2, Vector2)
+    dragging = Field(kind=bool)
 
-
-class Circle:
     def __init__(self, position, radius=30, color=YELLOW):
-        self.position = pygame.math.Vector2(position)
+        self.position = position
         self.radius = radius
         self.color = color
         self.dragging = False
@@ -51,177 +113,206 @@ class Circle:
             self.position = pygame.math.Vector2(event.pos)
 
 
-class Vehicle:
-    def __init__(self, position, direction, radius=20, color=RED):
-        self.position = pygame.math.Vector2(position)
+class Vehicle(Entity):
+    # State that changes every step lives in shared arrays (see entities.py);
+    # per-vehicle constants in slots and shared constants on the class
+    __slots__ = ("color", "sensor_color", "trail", "hud", "readings", "stream", "radius",
+                 "show_hud", "sensor_offset")
+    position = Field(2, Vector2)
+    direction = Field(wrap=360)
+    sensor_activations = Field(2)
+    left_sensor_position = Field(2, Vector2)
+    right_sensor_position = Field(2, Vector2)
+
+    speed_scaling = 100
+    rotation_scaling = 5
+    sensor_radius = 15
+    sensor_spacing = 30
+
+    # Vehicle 4a parameters
+    optimal_distance = 200  # Distance where motor response is maximum
+    response_width = 150    # Width of the gaussian-like response curve
+
+    # Vehicle 4b parameters
+    threshold_distance = 300  # Threshold distance for motor activation
+    min_activation = 0.3      # Minimum activation once threshold is passed
+
+    max_trail_length = 200
+
+    def __init__(self, position, direction, radius=20, color=RED, show_hud=True, stream=0):
+        self.position = position
         self.direction = direction
+        self.stream = stream  # Id of this vehicle's random stream
         self.radius = radius
         self.color = color
-        self.speed_scaling = 100
-        self.rotation_scaling = 5
+        self.show_hud = show_hud
 
         # sensor
-        self.sensor_radius = 15
-        self.sensor_spacing = 30
         self.sensor_offset = self.radius + self.sensor_radius
 
-        # Vehicle 4a parameters
-        self.optimal_distance = 200  # Distance where motor response is maximum
-        self.response_width = 150    # Width of the gaussian-like response curve
-        
-        # Vehicle 4b parameters
-        self.threshold_distance = 300  # Threshold distance for motor activation
-        self.min_activation = 0.3      # Minimum activation once threshold is passed
-        
         # For visualization
-        self.sensor_activations = [0, 0]  # Left, right sensor activation levels
+        self.sensor_activations = (0, 0)  # Left, right sensor activation levels
 
         self.update_sensor_positions()
         self.sensor_color = GREEN
         
         # Trajectory tracking
-        self.max_trail_length = 200
         self.trail = []
 
+        # Status lines for the HUD, drawn by the render loop
+        self.hud = ()
+        # Latest sensor and motor values, for telemetry
+        self.readings = {}
+
     def update_sensor_positions(self):
         forward_direction = pygame.math.Vector2(0, -1).rotate(self.direction)
         right_direction = forward_direction.rotate(-90)
 
-        self.left_sensor_position = self.position + forward_direction * \
-            self.sensor_offset - right_direction * (self.sensor_spacing/2)
-        self.right_sensor_position = self.position + forward_direction * \
-            self.sensor_offset + right_direction * (self.sensor_spacing/2)
+        ahead = self.position + forward_direction * self.sensor_offset
+        self.left_sensor_position = ahead - right_direction * (self.sensor_spacing/2)
+        self.right_sensor_position = ahead + right_direction * (self.sensor_spacing/2)
 
-    def update_direction(self):
-        self.direction += random.randint(-2, 2)
+    def update_direction(self, jitter):
+        self.direction += jitter
+
+    def snapshot(self):
+        return VehicleState(
+            tuple(self.position), self.direction, self.radius, self.color, tuple(self.trail),
+            tuple(self.left_sensor_position), tuple(self.right_sensor_position),
+            self.sensor_radius, self.sensor_activations)
 
     def draw(self, surface):
-        # Draw trail
-        if len(self.trail) >= 2:
-            pygame.draw.lines(surface, (100, 100, 100), False, self.trail, 1)
-        
-        # Draw vehicle body
-        pygame.draw.circle(surface, self.color, self.position, self.radius)
-        
-        # Draw direction indicator
-        forward_direction = pygame.math.Vector2(0, -1).rotate(self.direction)
-        nose_position = self.position + forward_direction * self.radius
-        pygame.draw.line(surface, BLUE, self.position, nose_position, 3)
+        draw_vehicle(surface, self.snapshot())
 
-        # Draw sensors with intensity-based coloring
-        l_color = tuple(min(255, int(g + 180 * self.sensor_activations[0])) for g in GREEN)
-        r_color = tuple(min(255, int(g + 180 * self.sensor_activations[1])) for g in GREEN)
-        
-        pygame.draw.circle(surface, l_color, self.left_sensor_position, self.sensor_radius)
-        pygame.draw.circle(surface, r_color, self.right_sensor_position, self.sensor_radius)
-        
         # Draw the response curve if 4b is selected
         if VEHICLE_TYPE == "4b":
             self.draw_response_curve(surface)
 
-    def calculate_standard_response(self, distance):
-        # Standard Vehicle 3 response (inverse proportional)
+    def raw_standard_response(self, distance):
+        # Standard Vehicle 3 excitation (inverse proportional)
         if distance < 1:  # Avoid division by zero
             return self.speed_scaling
-        response = self.speed_scaling * (1 / distance)
-        if INHIBITION:
-            response = self.speed_scaling - response
-        return max(0, min(response, self.speed_scaling))  # Clamp to [0, speed_scaling]
-    
-    def calculate_4a_response(self, distance):
-        # Vehicle 4a: Non-monotonic response with peak at optimal_distance
+        return self.speed_scaling * (1 / distance)
+
+    def raw_4a_response(self, distance):
+        # Vehicle 4a: Non-monotonic excitation with peak at optimal_distance
         # Using a Gaussian-inspired response curve
         if distance < 1:  # Avoid division by zero
             return 0  # Too close, minimal response
-            
+
         # Calculate normalized response using Gaussian-like formula
         exponent = -((distance - self.optimal_distance) ** 2) / (2 * (self.response_width ** 2))
-        response = self.speed_scaling * math.exp(exponent)
-        
-        if INHIBITION:
-            response = self.speed_scaling - response
-            
-        return max(0, min(response, self.speed_scaling))  # Clamp to [0, speed_scaling]
-    
-    def calculate_4b_response(self, distance):
-        # Vehicle 4b: Threshold-based response - different types based on Figure 8
+        return self.speed_scaling * math.exp(exponent)
+
+    def raw_4b_response(self, distance):
+        # Vehicle 4b: Threshold-based excitation - different types based on Figure 8
+        if distance > self.threshold_distance:
+            return 0  # No response beyond threshold
+
         normalized_distance = distance / self.threshold_distance
-        
+
         if RESPONSE_TYPE == "1":
             # Type 1: Simple threshold with minimum activation
-            if distance > self.threshold_distance:
-                return 0  # No response beyond threshold
-            
             # Linear response with minimum activation once threshold is passed
-            response = self.speed_scaling * max(self.min_activation, 1 - normalized_distance)
-            
+            return self.speed_scaling * max(self.min_activation, 1 - normalized_distance)
+
         elif RESPONSE_TYPE == "2":
             # Type 2: Step function (abrupt change at threshold)
-            if distance > self.threshold_distance:
-                return 0
-            else:
-                response = self.speed_scaling * 0.8  # Constant high response below threshold
-                
+            return self.speed_scaling * 0.8  # Constant high response below threshold
+
         elif RESPONSE_TYPE == "3":
             # Type 3: Multiple thresholds (as shown in top-right of Figure 8)
-            if distance > self.threshold_distance:
-                return 0
-            elif distance > self.threshold_distance * 0.7:
-                response = self.speed_scaling * 0.5  # Medium response
+            if distance > self.threshold_distance * 0.7:
+                return self.speed_scaling * 0.5  # Medium response
             elif distance > self.threshold_distance * 0.4:
-                response = self.speed_scaling * 0.2  # Low response
-            else:
-                response = self.speed_scaling  # Full response when very close
-                
+                return self.speed_scaling * 0.2  # Low response
+            return self.speed_scaling  # Full response when very close
+
         elif RESPONSE_TYPE == "4":
             # Type 4: Smooth increase after threshold (similar to bottom left in Figure 8)
-            if distance > self.threshold_distance:
-                return 0
-            
             # Exponential growth as distance gets smaller
-            response_factor = 1 - (distance / self.threshold_distance)**2
-            response = self.speed_scaling * response_factor
-            
-        else:  # Type 5: Complex step function (bottom right in Figure 8)
-            if distance > self.threshold_distance:
-                return 0
-            elif distance > self.threshold_distance * 0.6:
-                response = self.speed_scaling * 0.3  # Low response
-            elif distance > self.threshold_distance * 0.4:
-                response = self.speed_scaling  # Full response
-            elif distance > self.threshold_distance * 0.2:
-                response = self.speed_scaling * 0.5  # Medium response
-            else:
-                response = self.speed_scaling  # Full response when very close
-        
+            response_factor = 1 - normalized_distance**2
+            return self.speed_scaling * response_factor
+
+        # Type 5: Complex step function (bottom right in Figure 8)
+        if distance > self.threshold_distance * 0.6:
+            return self.speed_scaling * 0.3  # Low response
+        elif distance > self.threshold_distance * 0.4:
+            return self.speed_scaling  # Full response
+        elif distance > self.threshold_distance * 0.2:
+            return self.speed_scaling * 0.5  # Medium response
+        return self.speed_scaling  # Full response when very close
+
+    def raw_response(self, distance):
+        if VEHICLE_TYPE == "3":
+            return self.raw_standard_response(distance)
+        elif VEHICLE_TYPE == "4a":
+            return self.raw_4a_response(distance)
+        return self.raw_4b_response(distance)
+
+    def finish_response(self, response):
         if INHIBITION:
             response = self.speed_scaling - response
-            
         return max(0, min(response, self.speed_scaling))  # Clamp to [0, speed_scaling]
 
-    def move(self, sun_position):
-        # Update sensor positions
-        self.update_sensor_positions()
+    def calculate_standard_response(self, distance):
+        # Standard Vehicle 3 response (inverse proportional)
+        if distance < 1:  # Avoid division by zero
+            return self.speed_scaling
+        return self.finish_response(self.raw_standard_response(distance))
 
-        # Calculate distances
-        left_distance = self.left_sensor_position.distance_to(sun_position)
-        right_distance = self.right_sensor_position.distance_to(sun_position)
-        
-        # Apply maximum effective distance
-        left_distance = min(left_distance, MAX_DISTANCE)
-        right_distance = min(right_distance, MAX_DISTANCE)
+    def calculate_4a_response(self, distance):
+        # Vehicle 4a: Non-monotonic response with peak at optimal_distance
+        if distance < 1:  # Avoid division by zero
+            return 0  # Too close, minimal response
+        return self.finish_response(self.raw_4a_response(distance))
+
+    def calculate_4b_response(self, distance):
+        # Vehicle 4b: Threshold-based response
+        if distance > self.threshold_distance:
+            return 0  # No response beyond threshold
+        return self.finish_response(self.raw_4b_response(distance))
 
-        # Calculate motor responses based on vehicle type
+    def calculate_response(self, distance):
         if VEHICLE_TYPE == "3":
-            left_speed = self.calculate_standard_response(left_distance)
-            right_speed = self.calculate_standard_response(right_distance)
+            return self.calculate_standard_response(distance)
         elif VEHICLE_TYPE == "4a":
-            left_speed = self.calculate_4a_response(left_distance)
-            right_speed = self.calculate_4a_response(right_distance)
-        elif VEHICLE_TYPE == "4b":
-            left_speed = self.calculate_4b_response(left_distance)
-            right_speed = self.calculate_4b_response(right_distance)
-        
+            return self.calculate_4a_response(distance)
+        return self.calculate_4b_response(distance)
+
+    def sense(self, sensor_position, sun_position, emitters, hidden=False):
+        # Sun-only readings keep the exact single-source response; other
+        # vehicles add their excitation before inhibition and clamping.
+        # A sun hidden behind an obstacle reads as far away
+        if hidden:
+            distance = MAX_DISTANCE
+        elif TEXTURE:
+            distance = sun_field.sample([sensor_position])[0, 0]
+        else:
+            distance = min(sensor_position.distance_to(sun_position), MAX_DISTANCE)
+        if not emitters:
+            return distance, self.calculate_response(distance)
+
+        excitation = self.raw_response(distance)
+        for emitter in emitters:
+            emitter_distance = min(sensor_position.distance_to(emitter), MAX_DISTANCE)
+            excitation += EMISSION * self.raw_response(emitter_distance)
+        return distance, self.finish_response(excitation)
+
+    def move(self, sun_position, emitters=(), jitter=0, sight=None):
+        # Update sensor positions
+        self.update_sensor_positions()
+
+        # What each sensor sees past the obstacles, from sight_lines()
+        (left_hidden, left_emitters), (right_hidden, right_emitters) = \
+            sight or ((False, emitters), (False, emitters))
+
+        # Calculate distances and motor responses based on vehicle type
+        left_distance, left_speed = self.sense(
+            self.left_sensor_position, sun_position, left_emitters, left_hidden)
+        right_distance, right_speed = self.sense(
+            self.right_sensor_position, sun_position, right_emitters, right_hidden)
+
         # Apply cross-wiring if enabled
         if CROSS:
             left_motor, right_motor = right_speed, left_speed
@@ -232,23 +323,31 @@ class Vehicle:
         speed = (left_motor + right_motor) / 2  # Average speed
         rotation = (right_motor - left_motor) * self.rotation_scaling
 
-        # Update direction and position
-        self.direction += rotation
-        direction_vector = pygame.math.Vector2(0, -1).rotate(self.direction)
-        self.position += direction_vector * speed / fps  # Scale by framerate for consistent speed
+        # Update direction and position, reading and writing the stored state once
+        direction = self.direction + rotation
+        self.direction = direction
+        direction_vector = pygame.math.Vector2(0, -1).rotate(direction)
+        position = self.position + direction_vector * speed / fps  # Scale by framerate for consistent speed
 
         # Add current position to trail
-        self.trail.append((int(self.position.x), int(self.position.y)))
+        self.trail.append((int(position.x), int(position.y)))
         if len(self.trail) > self.max_trail_length:
             self.trail.pop(0)
 
         # Screen Wrapping
-        self.position.x %= WIDTH
-        self.position.y %= HEIGHT
+        self.position = (position.x % WORLD_WIDTH, position.y % WORLD_HEIGHT)
 
         # Apply random direction changes if friction is enabled
         if FRICTION:
-            self.update_direction()
+            self.update_direction(jitter)
+
+        self.readings = {
+            "left_distance": left_distance, "right_distance": right_distance,
+            "left_motor": left_motor, "right_motor": right_motor, "speed": speed,
+        }
+
+        if not self.show_hud:
+            return
 
         # Update display info
         vehicle_types = {
@@ -267,22 +366,14 @@ class Vehicle:
         
         behavior = "Explorer" if CROSS else "Love"
         
-        text1 = font.render(
-            f"Type: {vehicle_types[VEHICLE_TYPE]}" + 
+        self.hud = (
+            f"Type: {vehicle_types[VEHICLE_TYPE]}" +
             (f" - {response_types[RESPONSE_TYPE]}" if VEHICLE_TYPE == "4b" else ""),
-            True, WHITE)
-        text2 = font.render(
             f"Behavior: {behavior} | Cross: {CROSS} | Inhibition: {INHIBITION} | L: {left_distance:.0f} R: {right_distance:.0f}",
-            True, WHITE)
-        text3 = font.render(
             f"Speed: {speed:.1f} | Motors: L: {left_motor:.1f} R: {right_motor:.1f} | T: type, R: response type",
-            True, WHITE)
-
-        screen.blit(text1, (10, 10))
-        screen.blit(text2, (10, 35))
-        screen.blit(text3, (10, 60))
+        )
 
-    def draw_response_curve(self, surface):
+    def draw_response_curve(self, surface, labels=True):
         # Draw the response curve for the current 4b response type
         curve_width = 200
         curve_height = 100
@@ -299,11 +390,9 @@ class Vehicle:
                         (curve_x + 10, curve_y + curve_height), 1)  # Y-axis
         
         # Draw axis labels
-        label_font = pygame.font.SysFont("Arial", 16)
-        x_label = label_font.render("I (stimulus)", True, WHITE)
-        y_label = label_font.render("V (response)", True, WHITE)
-        surface.blit(x_label, (curve_x + curve_width - 70, curve_y + curve_height - 20))
-        surface.blit(y_label, (curve_x + 15, curve_y + 5))
+        if labels:
+            cache.blit(surface, label_font, "I (stimulus)", (curve_x + curve_width - 70, curve_y + curve_height - 20))
+            cache.blit(surface, label_font, "V (response)", (curve_x + 15, curve_y + 5))
         
         # Plot the response curve
         points = []
@@ -324,62 +413,496 @@ class Vehicle:
             pygame.draw.lines(surface, RED, False, points, 2)
         
         # Draw title
-        title = label_font.render(f"Response Type {RESPONSE_TYPE}", True, WHITE)
-        surface.blit(title, (curve_x + curve_width // 2 - 50, curve_y - 25))    
+        if labels:
+            cache.blit(surface, label_font, f"Response Type {RESPONSE_TYPE}",
+                       (curve_x + curve_width // 2 - 50, curve_y - 25))
+
+
+def draw_vehicle(surface, state):
+    # Everything is drawn through the camera; the caller has already checked
+    # the vehicle or its trail is in view
+    zoom = camera.zoom
+
+    # Draw trail, possibly shortened by the frame governor
+    trail = () if trails else \
+        state.trail[max(0, len(state.trail) - quality("trail", len(state.trail))):]
+    if len(trail) >= 2:
+        pygame.draw.lines(surface, (100, 100, 100), False, camera.to_screen(trail).tolist(), 1)
+
+    # Draw vehicle body
+    position = camera.to_screen_point(state.position)
+    pygame.draw.circle(surface, state.color, position, state.radius * zoom)
+
+    # Draw direction indicator
+    forward_direction = pygame.math.Vector2(0, -1).rotate(state.direction)
+    nose_position = pygame.math.Vector2(position) + forward_direction * state.radius * zoom
+    pygame.draw.line(surface, BLUE, position, nose_position, max(1, round(3 * zoom)))
+
+    # Draw sensors with intensity-based coloring
+    l_color = tuple(min(255, int(g + 180 * state.activations[0])) for g in GREEN)
+    r_color = tuple(min(255, int(g + 180 * state.activations[1])) for g in GREEN)
+
+    pygame.draw.circle(surface, l_color, camera.to_screen_point(state.left_sensor),
+                       state.sensor_radius * zoom)
+    pygame.draw.circle(surface, r_color, camera.to_screen_point(state.right_sensor),
+                       state.sensor_radius * zoom)
+
+
+def in_view(state):
+    # A vehicle is drawn when its body and sensors or any of its trail can be seen
+    margin = state.radius + 2 * state.sensor_radius
+    if camera.visible(state.position, margin)[0]:
+        return True
+    return len(state.trail) >= 2 and camera.visible(state.trail).any()
+
+
+def quality(name, default):
+    # Current setting of a frame governor knob, or the full-quality default
+    return governor[name] if governor else default
+
+
+def draw_hud(surface, lines):
+    hud.set(lines)
+    hud.draw(surface)
+
+
+def find_emitters(vehicles):
+    # Positions of the other vehicles each vehicle can sense, found with a
+    # cell list so the cost grows with the neighbour count, not n squared
+    emitters = [[] for _ in vehicles]
+    if not MUTUAL or len(vehicles) < 2:
+        return emitters
+    cells = CellList(MUTUAL_CUTOFF, WORLD_WIDTH, WORLD_HEIGHT)
+    cells.build([(v.position.x, v.position.y) for v in vehicles])
+    i, j, offset, _ = cells.pairs()
+    for a, (dx, dy) in zip(i, offset):
+        # Use the wrapped image of the neighbour closest to this vehicle
+        emitters[a].append(vehicles[a].position + pygame.math.Vector2(dx, dy))
+    return emitters
+
+
+def sight_lines(vehicles, emitters, sun_position):
+    # Per vehicle, ((sun hidden, visible emitters) for the left sensor, and
+    # the same for the right), with the sight lines of every sensor walked
+    # through the obstacle grid in one call. Out of range the sun reads as
+    # far away anyway, so its long sight lines are not walked
+    for v in vehicles:
+        v.update_sensor_positions()
+    sensors = np.array([(s.x, s.y) for v in vehicles
+                        for s in (v.left_sensor_position, v.right_sensor_position)]).reshape(-1, 2)
+    sun_xy = np.array([sun_position[0], sun_position[1]], dtype=float)
+    near = np.flatnonzero(np.hypot(*(sensors - sun_xy).T) < MAX_DISTANCE)
+    owner = np.repeat(np.arange(len(vehicles)), [len(e) for e in emitters])
+    ends = np.array([(e.x, e.y) for es in emitters for e in es]).reshape(-1, 2)
+    visible = obstacles.visible(
+        np.concatenate((sensors[near], sensors[2 * owner], sensors[2 * owner + 1])),
+        np.concatenate((np.broadcast_to(sun_xy, (len(near), 2)), ends, ends)))
+
+    hidden = np.zeros(len(sensors), dtype=bool)
+    hidden[near] = ~visible[:len(near)]
+    hidden = hidden.reshape(-1, 2).tolist()
+    seen_left, seen_right = visible[len(near):].reshape(2, -1).tolist()
+    sight, first = [], 0
+    for es, (left_hidden, right_hidden) in zip(emitters, hidden):
+        last = first + len(es)
+        sight.append(((left_hidden, [e for e, seen in zip(es, seen_left[first:last]) if seen]),
+                      (right_hidden, [e for e, seen in zip(es, seen_right[first:last]) if seen])))
+        first = last
+    return sight
+
+
+def push_out(vehicles):
+    # Move every vehicle overlapping an obstacle back out, in one grid query
+    positions, touching = obstacles.push_out(
+        [(v.position.x, v.position.y) for v in vehicles], [v.radius for v in vehicles])
+    for k in np.flatnonzero(touching).tolist():
+        vehicles[k].position = positions[k].tolist()
+
+
+def sun_distance(x, y):
+    return np.minimum(np.hypot(x - sun.position.x, y - sun.position.y), MAX_DISTANCE)
+
+
+def handle_key(key, mouse_pos):
+    global CROSS, INHIBITION, FRICTION, VEHICLE_TYPE, RESPONSE_TYPE, TEXTURE, MUTUAL, HEATMAP, \
+        OBSTACLES, vehicles
+    if key == pygame.K_c:
+        CROSS = not CROSS
+    elif key == pygame.K_i:
+        INHIBITION = not INHIBITION
+    elif key == pygame.K_f:
+        FRICTION = not FRICTION
+    elif key == pygame.K_t:
+        # Toggle vehicle type
+        if VEHICLE_TYPE == "3":
+            VEHICLE_TYPE = "4a"
+        elif VEHICLE_TYPE == "4a":
+            VEHICLE_TYPE = "4b"
+        else:
+            VEHICLE_TYPE = "3"
+    elif key == pygame.K_r:
+        # Toggle response type for Vehicle 4b
+        if VEHICLE_TYPE == "4b":
+            RESPONSE_TYPE = str((int(RESPONSE_TYPE) % 5) + 1)
+        else:
+            # Reset vehicle position for other vehicle types
+            vehicle.position = pygame.math.Vector2(WORLD_WIDTH//2 + 200, WORLD_HEIGHT//2)
+            vehicle.direction = 0
+            vehicle.trail = []
+    elif key == pygame.K_SPACE:
+        # Reset vehicle position
+        vehicle.position = pygame.math.Vector2(WORLD_WIDTH//2 + 200, WORLD_HEIGHT//2)
+        vehicle.direction = 0
+        vehicle.trail = []
+    elif key == pygame.K_x:
+        TEXTURE = not TEXTURE
+    elif key == pygame.K_h:
+        HEATMAP = not HEATMAP
+    elif key == pygame.K_o:
+        OBSTACLES = not OBSTACLES
+    elif key == pygame.K_k:
+        add_crowd(CROWD)
+    elif key == pygame.K_e:
+        heatmap.save(HEATMAP_PATH)
+    elif key == pygame.K_m:
+        MUTUAL = not MUTUAL
+        if not MUTUAL:
+            # Drop the vehicles added with N; the main vehicle and any crowd stay
+            added = set(map(id, mutual_vehicles))
+            keep = [k for k, v in enumerate(vehicles) if id(v) not in added]
+            vehicles = [vehicles[k] for k in keep]
+            mutual_vehicles.clear()
+            if analytics:
+                # Analytics rows follow the vehicle list, so drop the same ones
+                analytics.resize(len(keep), keep)
+    elif key == pygame.K_n and MUTUAL:
+        # Add another vehicle at the mouse position
+        stream = next_stream()
+        mutual_vehicles.append(Vehicle(mouse_pos, stream * 37 % 360, show_hud=False, stream=stream))
+        vehicles.append(mutual_vehicles[-1])
+
+
+def next_stream():
+    # Vehicles can be removed, so new ids continue from the largest in use
+    return max(v.stream for v in vehicles) + 1
+
+
+def add_crowd(count: int = CROWD):
+    first = next_stream()
+    ids = np.arange(first, first + count)
+    xs = streams.uniform(ids, 0, 0, WORLD_WIDTH, channel=2)
+    ys = streams.uniform(ids, 0, 0, WORLD_HEIGHT, channel=3)
+    directions = streams.uniform(ids, 0, 0, 360, channel=1)
+    for stream, x, y, direction in zip(ids.tolist(), xs.tolist(), ys.tolist(), directions.tolist()):
+        vehicles.append(Vehicle((x, y), direction, show_hud=False, stream=stream))
+    metrics.note(memory=memory_report())
+
+
+def draw_crowd(surface, states):
+    # Vehicles other than the main one that are in view, at a detail level set
+    # by how many there are and how large they appear
+    positions = np.array([s.position for s in states], dtype=float)
+    shown = camera.visible(positions, states[0].radius + 2 * states[0].sensor_radius)
+    detail = quality("lod", 1.0)
+    lod.full_below = LOD_FULL_BELOW * detail
+    lod.pixels_above = LOD_PIXELS_ABOVE * detail
+    level = lod.level(int(shown.sum()), states[0].radius, camera.zoom)
+    if level == FULL:
+        # Trails can reach into view from vehicles that are not
+        shown = [in_view(vehicle_state) for vehicle_state in states]
+    states = [vehicle_state for vehicle_state, keep in zip(states, shown) if keep]
+    with lod.measure(level, len(states)):
+        if level == FULL:
+            for vehicle_state in states:
+                draw_vehicle(surface, vehicle_state)
+            return level, len(states)
+        by_color = {}
+        for vehicle_state in states:
+            by_color.setdefault(vehicle_state.color, []).append(vehicle_state.position)
+        for color, positions in by_color.items():
+            positions = camera.to_screen(positions)
+            if level == PIXEL:
+                lod.draw_pixels(surface, positions, color)
+            else:
+                lod.draw_simple(surface, positions, states[0].radius * camera.zoom, color)
+    return level, len(states)
+
+
+def simulate():
+    global steps
+    if paused:
+        return
+    with metrics.phase("simulate"):
+        if sun_schedule and not sun.dragging:
+            sun.position = sun_schedule.at(steps)[0][0]
+        if TEXTURE:
+            # Keyed on the sun position, so dragging the sun rebakes the field
+            sun_field.update((sun.position.x, sun.position.y))
+        # Friction jitter for every vehicle in one draw, keyed on (stream, step)
+        jitter = [0] * len(vehicles)
+        if FRICTION:
+            jitter = streams.integers([v.stream for v in vehicles], steps, -2, 3).tolist()
+        emitters = find_emitters(vehicles)
+        sight = sight_lines(vehicles, emitters, sun.position) if OBSTACLES else [None] * len(vehicles)
+        for v, seen, nearby, turn in zip(vehicles, sight, emitters, jitter):
+            v.move(sun.position, nearby, turn, seen)
+        if OBSTACLES:
+            push_out(vehicles)
+        heatmap.add([(v.position.x, v.position.y) for v in vehicles])
+    if analytics:
+        analytics.update([(v.position.x, v.position.y) for v in vehicles],
+                         [v.direction for v in vehicles], sun.position)
+        if steps % 60 == 0:
+            metrics.note(analytics=analytics.report())
+    if telemetry:
+        telemetry.write({"step": steps, "x": vehicle.position.x, "y": vehicle.position.y,
+                         "direction": vehicle.direction, **vehicle.readings})
+    steps += 1
+    metrics.tick(population=len(vehicles))
+
+
+def world_state():
+    return WorldState((sun.position.x, sun.position.y),
+                      tuple(v.snapshot() for v in vehicles), vehicle.hud,
+                      heatmap.array() if HEATMAP else None)
+
+
+def set_flag(name, value=None):
+    # Toggle a behaviour flag, or set it when a value is given
+    if value is None:
+        globals()[name] = not globals()[name]
+    else:
+        globals()[name] = str(value).lower() in ("1", "true", "yes", "on")
+
+
+def set_vehicle_type(value):
+    global VEHICLE_TYPE
+    if str(value) in ("3", "4a", "4b"):
+        VEHICLE_TYPE = str(value)
+
+
+def set_response_type(value):
+    global RESPONSE_TYPE
+    if str(value) in ("1", "2", "3", "4", "5"):
+        RESPONSE_TYPE = str(value)
+
+
+def move_sun(x: float, y: float):
+    sun.position = pygame.math.Vector2(float(x), float(y))
+
+
+def toggle_pause():
+    # Threaded, the thread stops stepping but still publishes and runs commands
+    global paused
+    paused = not paused
+    if simulation:
+        simulation.paused = paused
+
+
+def save_snapshot(path="test5_snapshot"):
+    # Screenshot plus the latest world state as JSON
+    pygame.image.save(screen, f"{path}.png")
+    state = simulation.latest() if simulation else world_state()
+    with open(f"{path}.json", "w") as f:
+        json.dump({"sun": state.sun, "vehicles": [v._asdict() for v in state.vehicles],
+                   "hud": state.hud}, f)
+
+
+def on_simulation(command):
+    # Commands that change simulation state run on the simulation thread
+    @functools.wraps(command)
+    def run(**args):
+        if simulation:
+            simulation.send(lambda: command(**args))
+        else:
+            command(**args)
+    return run
+
+
+CONTROL_COMMANDS = {
+    "cross": on_simulation(lambda value=None: set_flag("CROSS", value)),
+    "inhibition": on_simulation(lambda value=None: set_flag("INHIBITION", value)),
+    "friction": on_simulation(lambda value=None: set_flag("FRICTION", value)),
+    "mutual": on_simulation(lambda value=None: set_flag("MUTUAL", value)),
+    "texture": on_simulation(lambda value=None: set_flag("TEXTURE", value)),
+    "heatmap": on_simulation(lambda value=None: set_flag("HEATMAP", value)),
+    "obstacles": on_simulation(lambda value=None: set_flag("OBSTACLES", value)),
+    "crowd": on_simulation(add_crowd),
+    "export_heatmap": on_simulation(lambda path=HEATMAP_PATH: heatmap.save(path)),
+    "vehicle_type": on_simulation(set_vehicle_type),
+    "response_type": on_simulation(set_response_type),
+    "sun": on_simulation(move_sun),
+    "pause": on_simulation(toggle_pause),
+    "snapshot": save_snapshot,
+}
+
+
+def draw_trails(surface, state):
+    # The newest segment of every vehicle in view goes onto the fading layer,
+    # which is then the frame's background. The layer is in screen space, so
+    # moving the camera starts it afresh
+    global trail_view, trail_previous
+    view = (*camera.center.tolist(), camera.zoom)
+    if view != trail_view:
+        trails.clear()
+        trail_view, trail_previous = view, None
+    current = np.array([v.position for v in state.vehicles], dtype=float)
+    trails.fade()
+    if trail_previous is not None and quality("trail", 1):
+        n = min(len(current), len(trail_previous))
+        shown = camera.visible(current[:n])
+        trails.add(camera.to_screen(trail_previous[:n][shown]), camera.to_screen(current[:n][shown]))
+    trail_previous = current
+    trails.draw(surface)
+
+
+def draw_world(surface, state):
+    if trails:
+        draw_trails(surface, state)
+    else:
+        surface.fill((0, 0, 0))  # Fill with black background
+    if state.heat is not None:
+        grid = heatmap.overlay(state.heat, scaled=False)
+        camera.blit_image(surface, grid, (0, 0, heatmap.nx * heatmap.cell_size,
+                                          heatmap.ny * heatmap.cell_size), smooth=True)
+    if camera.visible(state.sun, sun.radius)[0]:
+        pygame.draw.circle(surface, sun.color, camera.to_screen_point(state.sun),
+                           sun.radius * camera.zoom)
+    if OBSTACLES:
+        obstacles.draw(surface, camera=camera)
+    if in_view(state.vehicles[0]):
+        draw_vehicle(surface, state.vehicles[0])
+    others = state.vehicles[1:]
+    hud_lines = state.hud
+    if others:
+        level, drawn = draw_crowd(surface, others)
+        cost = lod.cost.get(level, 0.0)
+        hud_lines += (f"LOD: {level} | {drawn} of {len(others)} other vehicles in view | "
+                      f"{cost:.1f} us each",)
+        metrics.note(lod=lod.report())
+    draw_hud(surface, hud_lines)
+
+    # Draw the response curve if 4b is selected
+    if VEHICLE_TYPE == "4b":
+        vehicle.draw_response_curve(surface, labels=quality("labels", True))
 
 
 # Create objects
-sun = Circle((WIDTH//2, HEIGHT//2), radius=30, color=YELLOW)
-vehicle = Vehicle((WIDTH//2 + 200, HEIGHT//2), 0)
+sun = Circle((WORLD_WIDTH//2, WORLD_HEIGHT//2), radius=30, color=YELLOW)
+# Baked grids coarsen on large worlds so they stay around a million cells
+world_cells = math.sqrt(WORLD_WIDTH * WORLD_HEIGHT / 1e6)
+sun_field = FieldTexture(sun_distance, WORLD_WIDTH, WORLD_HEIGHT, cell_size=max(4, world_cells))
+cx, cy = WORLD_WIDTH // 2, WORLD_HEIGHT // 2
+obstacles = Obstacles(WORLD_WIDTH, WORLD_HEIGHT)
+obstacles.add_segment((cx + 80, cy - 180), (cx + 80, cy + 80))
+obstacles.add_rect(cx - 280, cy + 80, 140, 60)
+obstacles.add_circle((cx - 150, cy - 140), 35)
+hud = Hud(font)
+lod = LevelOfDetail(LOD_FULL_BELOW, LOD_PIXELS_ABOVE)
+heatmap = Heatmap(WORLD_WIDTH, WORLD_HEIGHT, cell_size=max(10, int(2 * world_cells)), decay=HEATMAP_DECAY, window=HEATMAP_WINDOW, wrap=True)
+streams = RandomStreams(SEED)
+vehicle = Vehicle((WORLD_WIDTH//2 + 200, WORLD_HEIGHT//2), 0)
+camera = Camera((WIDTH, HEIGHT), (WORLD_WIDTH, WORLD_HEIGHT))
+trails = TrailLayer((WIDTH, HEIGHT), fade=TRAIL_FADE) if TRAIL_LAYER else None
+trail_view, trail_previous = None, None
+vehicles = [vehicle]
+mutual_vehicles = []  # Added with N, removed when mutual mode is turned off
+steps = 0
+sun_schedule = None
+if SUN_MOTION:
+    # Dragging the sun holds it; it rejoins the schedule when released
+    sun_schedule = Schedule(seed=SEED, width=WORLD_WIDTH, height=WORLD_HEIGHT)
+    if SUN_MOTION == "orbit":
+        sun_schedule.add_orbit((cx, cy), radius=min(cx, cy) * 0.6, period=900)
+    elif SUN_MOTION == "walk":
+        sun_schedule.add_walk([(cx, cy)], step=3)
+    else:
+        sun_schedule.add_path([(cx - 250, cy - 150), (cx + 250, cy - 150), (cx + 250, cy + 150),
+                               (cx - 250, cy + 150)], period=1800)
+paused = False
+metrics = Metrics()
+metrics.note(memory=memory_report())
+
+telemetry = TelemetryWriter(TELEMETRY_PATH, every=TELEMETRY_EVERY) if TELEMETRY_PATH else None
+analytics = TrajectoryAnalytics(width=WORLD_WIDTH, height=WORLD_HEIGHT) if ANALYTICS else None
+
+# In threaded mode input is queued to the simulation thread, which applies
+# it between steps, and the window only ever reads published snapshots
+simulation = SimulationThread(simulate, world_state, rate=fps) if THREADED else None
+if simulation:
+    simulation.start()
+
+recorder = Recorder(RECORD_PATH, fps=fps) if RECORD_PATH else None
+
+# Knobs in the order they are given up; steps per frame only applies when
+# this loop runs the simulation
+governor = None
+if GOVERNOR:
+    logging.basicConfig(level=logging.INFO, format="%(name)s: %(message)s")
+    knobs = [("labels", (True, False)), ("trail", (200, 100, 50, 0)), ("lod", (1.0, 0.5, 0.2, 0.0))]
+    if not THREADED:
+        knobs.append(("steps", (STEPS_PER_FRAME, STEPS_PER_FRAME / 2, STEPS_PER_FRAME / 4)))
+    governor = FrameGovernor(knobs, target_fps=fps)
+steps_due = 0.0
+
+control = ControlServer(CONTROL_COMMANDS, metrics, port=CONTROL_PORT).start() if CONTROL_PORT else None
 
 # Main loop
 running = True
 while running:
+    frame_start = time.perf_counter()
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             running = False
+        elif camera.handle_event(event) and event.type != pygame.MOUSEMOTION:
+            # The camera belongs to the window, the simulation never sees it
+            continue
         elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_c:
-                CROSS = not CROSS
-            elif event.key == pygame.K_i:
-                INHIBITION = not INHIBITION
-            elif event.key == pygame.K_f:
-                FRICTION = not FRICTION
-            elif event.key == pygame.K_t:
-                # Toggle vehicle type
-                if VEHICLE_TYPE == "3":
-                    VEHICLE_TYPE = "4a"
-                elif VEHICLE_TYPE == "4a":
-                    VEHICLE_TYPE = "4b"
-                else:
-                    VEHICLE_TYPE = "3"
-            elif event.key == pygame.K_r:
-                # Toggle response type for Vehicle 4b
-                if VEHICLE_TYPE == "4b":
-                    RESPONSE_TYPE = str((int(RESPONSE_TYPE) % 5) + 1)
-                else:
-                    # Reset vehicle position for other vehicle types
-                    vehicle.position = pygame.math.Vector2(WIDTH//2 + 200, HEIGHT//2)
-                    vehicle.direction = 0
-                    vehicle.trail = []
-            elif event.key == pygame.K_SPACE:
-                # Reset vehicle position
-                vehicle.position = pygame.math.Vector2(WIDTH//2 + 200, HEIGHT//2)
-                vehicle.direction = 0
-                vehicle.trail = []
-        
-        # Handle sun dragging
-        sun.handle_event(event)
+            mouse_pos = camera.to_world(pygame.mouse.get_pos())
+            if simulation:
+                simulation.send(handle_key, event.key, mouse_pos)
+            else:
+                handle_key(event.key, mouse_pos)
+
+        # Handle sun dragging, in world coordinates
+        event = camera.world_event(event)
+        if simulation:
+            simulation.send(sun.handle_event, event)
+        else:
+            sun.handle_event(event)
+
+    if control:
+        control.apply()
 
-    screen.fill((0, 0, 0))  # Fill with black background
-    
     # Update and draw objects
-    sun.draw(screen)
-    vehicle.move(sun.position)
-    vehicle.draw(screen)
+    if simulation:
+        state = simulation.latest()
+    else:
+        # Fractional rates step on some frames only
+        steps_due += quality("steps", STEPS_PER_FRAME)
+        while steps_due >= 1:
+            simulate()
+            steps_due -= 1
+        state = world_state()
+    with metrics.phase("draw"):
+        draw_world(screen, state)
+    if recorder:
+        recorder.capture(screen)
 
     pygame.display.flip()
+    if governor:
+        governor.update(time.perf_counter() - frame_start)
+        metrics.note(governor=governor.report())
     clock.tick(fps)
-    
 
-pygame.quit()
\ No newline at end of file
+if simulation:
+    simulation.stop()
+if telemetry:
+    telemetry.close()
+if recorder:
+    recorder.close()
+if control:
+    control.stop()
+if analytics:
+    print("\n".join(analytics.report()))
+pygame.quit()
@@ -0,0 +1,49 @@
+import numpy as np
+import pygame
+
+
+class TrailLayer:
+    """Trails painted once onto a persistent surface that fades every frame.
+
+    The layer is an 8-bit surface whose palette runs from the background
+    color (0) to the trail color (255). add() draws only the newest segment
+    of each vehicle at full intensity and fade() dims every pixel through a
+    lookup table on the surfarray, so a segment fades geometrically and the
+    per-frame cost does not depend on trail length. Drawn with draw(), the
+    layer is the frame's background, so it replaces clearing the screen.
+    Segments longer than `max_jump` pixels (screen wrap) are skipped.
+    """
+
+    def __init__(self, size, fade=0.98, color=(100, 100, 100), background=(0, 0, 0), max_jump=50):
+        self.surface = pygame.Surface(size, depth=8)
+        level = np.linspace(0, 1, 256)[:, None]
+        palette = np.array(background) + (np.array(color) - np.array(background)) * level
+        self.surface.set_palette([tuple(c) for c in palette.round().astype(int).tolist()])
+        self.ink = self.surface.get_palette_at(255)
+        self.max_jump = max_jump
+        self.set_fade(fade)
+        self.clear()
+
+    def set_fade(self, fade):
+        # Floor rounding, so even the faintest pixels reach the background
+        self.fade_factor = fade
+        self.lut = (np.arange(256) * fade).astype(np.uint8)
+
+    def clear(self):
+        self.surface.fill(0)
+
+    def add(self, previous, current):
+        previous = np.asarray(previous, dtype=float).reshape(-1, 2)
+        current = np.asarray(current, dtype=float).reshape(-1, 2)
+        step = np.hypot(*(current - previous).T)
+        keep = step <= self.max_jump
+        for a, b in zip(previous[keep].tolist(), current[keep].tolist()):
+            pygame.draw.line(self.surface, self.ink, a, b)
+
+    def fade(self):
+        pixels = pygame.surfarray.pixels2d(self.surface)
+        np.take(self.lut, pixels, out=pixels)
+        del pixels
+
+    def draw(self, surface):
+        surface.blit(self.surface, (0, 0))
@@ -1,7 +1,10 @@
 import pygame
 import sys
 import math
-import random
+import numpy as np
+
+from field_texture import FieldTexture
+from random_streams import RandomStreams
 
 pygame.init()
 
@@ -15,52 +18,103 @@ fps = 60
 # Environment: temperature source at center
 CENTER = (WIDTH // 2, HEIGHT // 2)
 
+# Temperature field: "center" (linear falloff from CENTER), "hotspots", or a
+# path to an image (brightness) or a .npy array stretched over the screen
+FIELD = "center"
+COUNT = 1  # Number of vehicles, all stepped together
+SEED = 0
+SEEK = False  # Also turn up the temperature gradient (not part of Vehicle 1)
+
 
-def temperature_at(pos):
-    dx, dy = pos[0] - CENTER[0], pos[1] - CENTER[1]
-    distance = math.sqrt(dx**2 + dy**2)
+def temperature_at(x, y):
+    distance = np.hypot(x - CENTER[0], y - CENTER[1])
     max_dist = math.sqrt((WIDTH//2)**2 + (HEIGHT//2)**2)
-    # Normalized temperature : 1 at center, 0 at corners
-    temp = max(0, 1-distance/max_dist)
-    return temp
+    # Normalized temperature : 1 at center, 0 at corners
+    return np.maximum(0, 1 - distance / max_dist)
+
+
+def hotspots_at(x, y):
+    # A few warm spots of different sizes on a cool background
+    spots = [(200, 150, 80, 1.0), (600, 200, 120, 0.8), (350, 450, 60, 0.9), (650, 480, 90, 0.6)]
+    temp = sum(peak * np.exp(-((x - sx)**2 + (y - sy)**2) / (2 * size**2))
+               for sx, sy, size, peak in spots)
+    return np.minimum(temp, 1)
+
+
+def make_field(source):
+    if source == "center":
+        return FieldTexture(temperature_at, WIDTH, HEIGHT)
+    if source == "hotspots":
+        return FieldTexture(hotspots_at, WIDTH, HEIGHT)
+    return FieldTexture.load(source, WIDTH, HEIGHT)
 
 
-class Vehicle:
-    def __init__(self, x, y):
-        self.pos = pygame.Vector2(x, y)
-        self.angle = random.uniform(0, 2*math.pi)  # Random angle in radians
+def field_surface(field):
+    # Render the temperature once; red intensity = temperature
+    xs, ys = np.meshgrid(np.arange(WIDTH) + 0.5, np.arange(HEIGHT) + 0.5)
+    temp = field.sample(np.column_stack((xs.ravel(), ys.ravel())))[:, 0].reshape(HEIGHT, WIDTH)
+    pixels = np.zeros((WIDTH, HEIGHT, 3), dtype=np.uint8)
+    pixels[..., 0] = (255 * np.clip(temp, 0, 1)).T
+    return pygame.surfarray.make_surface(pixels)
+
+
+class Vehicles:
+    """A population of Vehicle 1s, each one sensor driving one motor.
+
+    Temperatures (and gradients, for SEEK) are read from the field for every
+    vehicle in one lookup.
+    """
+
+    def __init__(self, positions, field):
+        self.pos = np.array(positions, dtype=float).reshape(-1, 2)
+        self.field = field
+        self.streams = RandomStreams(SEED)
+        self.ids = np.arange(len(self.pos))
+        self.ticks = 1
+        self.angle = self.streams.uniform(self.ids, 0, 0, 2*math.pi)  # Random angle in radians
         self.base_speed = 200   # maximum speed per second
+        self.seek_rate = 5      # turn rate towards the gradient, radians per second
         self.radius = 20
 
     def update(self, dt):
-        temp = temperature_at(self.pos)
+        temp = self.field.sample(self.pos)[:, 0]
         # Adjust speed based on temperature
         speed = self.base_speed * temp
 
-        self.angle += random.uniform(-0.1, 0.1)*dt  # Random turn
+        self.angle += self.streams.uniform(self.ids, self.ticks, -0.1, 0.1)*dt  # Random turn
+        self.ticks += 1
 
-        dx = speed * math.cos(self.angle) * dt
-        dy = speed * math.sin(self.angle) * dt
+        if SEEK:
+            gradient = self.field.sample_gradient(self.pos)[:, 0]
+            uphill = np.arctan2(gradient[:, 1], gradient[:, 0])
+            slope = np.hypot(gradient[:, 0], gradient[:, 1]) > 1e-9
+            self.angle += np.sin(uphill - self.angle) * slope * self.seek_rate * dt
 
         # if speed > 10:
-        self.pos.x += dx
-        self.pos.y += dy
+        self.pos[:, 0] += speed * np.cos(self.angle) * dt
+        self.pos[:, 1] += speed * np.sin(self.angle) * dt
 
         # Wrap around the screen/ Keep within bounds
-        self.pos.x = max(self.radius, min(WIDTH - self.radius, self.pos.x))
-        self.pos.y = max(self.radius, min(HEIGHT - self.radius, self.pos.y))
+        np.clip(self.pos[:, 0], self.radius, WIDTH - self.radius, out=self.pos[:, 0])
+        np.clip(self.pos[:, 1], self.radius, HEIGHT - self.radius, out=self.pos[:, 1])
 
     def draw(self, surface):
-        # Draw the vehicle as a circle
-        pygame.draw.circle(surface, (0, 0, 255), (int(
-            self.pos.x), int(self.pos.y)), self.radius)
-        end_x = self.pos.x + self.radius * math.cos(self.angle)
-        end_y = self.pos.y + self.radius * math.sin(self.angle)
-        # Draw the direction vector
-        pygame.draw.line(surface, (255, 255, 255), self.pos, (end_x, end_y), 2)
+        ends = self.pos + self.radius * np.column_stack((np.cos(self.angle), np.sin(self.angle)))
+        for (x, y), end in zip(self.pos.tolist(), ends.tolist()):
+            # Draw the vehicle as a circle
+            pygame.draw.circle(surface, (0, 0, 255), (int(x), int(y)), self.radius)
+            # Draw the direction vector
+            pygame.draw.line(surface, (255, 255, 255), (x, y), end, 2)
 
 
-vehicle = Vehicle(100, 100)
+field = make_field(FIELD)
+background = field_surface(field)
+# The first vehicle starts at (100, 100), any others at seeded random spots
+others = np.arange(1, COUNT)
+streams = RandomStreams(SEED)
+positions = np.column_stack((streams.uniform(others, 0, 0, WIDTH, channel=1),
+                             streams.uniform(others, 0, 0, HEIGHT, channel=2)))
+vehicles = Vehicles(np.vstack(([(100, 100)], positions)), field)
 
 
 while True:
@@ -71,15 +125,10 @@ while True:
             pygame.quit()
             sys.exit()
 
-    vehicle.update(dt)
-
-    for y in range(0, HEIGHT, 5):
-        for x in range(0, WIDTH, 5):
-            t = temperature_at((x, y))
-            color = (int(255 * t), 0, 0)  # red intensity = temperature
-            pygame.draw.rect(screen, color, pygame.Rect(x, y, 5, 5))
+    vehicles.update(dt)
 
-    vehicle.draw(screen)
+    screen.blit(background, (0, 0))
+    vehicles.draw(screen)
 
     pygame.display.flip()
     screen.fill((0, 0, 0))
@@ -1,5 +1,8 @@
+import numpy as np
 import pygame
 
+from field_texture import FieldTexture
+
 pygame.init()
 
 WIDTH, HEIGHT = 1200, 600
@@ -17,6 +20,8 @@ YELLOW = (255, 255, 0)
 RED = (255, 0, 0)
 GREEN = (0, 255, 0)
 
+TEXTURE = False  # Read the sun distance from a baked field (X to toggle)
+
 
 class Circle:
     def __init__(self, position, radius=30, color=RED):
@@ -54,6 +59,8 @@ class Vehicle:
                            self.sensor_position, self.sensor_radius)
 
     def calculate_sensor_position(self, sun_position):
+        if TEXTURE:
+            return sun_field.sample([self.sensor_position])[0, 0]
         return self.sensor_position.distance_to(sun_position)
 
     def move(self, sun_position):
@@ -71,7 +78,12 @@ class Vehicle:
         screen.blit(text, (10, 10))
 
 
+def sun_distance(x, y):
+    return np.hypot(x - sun.position.x, y - sun.position.y)
+
+
 sun = Circle((600, 300), radius=30, color=YELLOW)
+sun_field = FieldTexture(sun_distance, WIDTH, HEIGHT)
 vehicle = Vehicle((300, 500), 45)
 
 running = True
@@ -79,10 +91,14 @@ while running:
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             running = False
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_x:
+            TEXTURE = not TEXTURE
 
     screen.fill((0, 0, 0))  # Fill with black background
     # circle.move()
     sun.draw(screen)
+    if TEXTURE:
+        sun_field.update((sun.position.x, sun.position.y))
     vehicle.move(sun.position)
     vehicle.draw(screen)
 
@@ -1,6 +1,7 @@
-import random
 import pygame
 
+from random_streams import RandomStreams
+
 pygame.init()
 
 WIDTH, HEIGHT = 800, 600
@@ -18,6 +19,8 @@ YELLOW = (255, 255, 0)
 RED = (255, 0, 0)
 GREEN = (0, 255, 0)
 
+SEED = 0  # Wander jitter is drawn from per-vehicle streams of this seed
+
 
 class Circle:
     def __init__(self, position, radius=30, color=RED):
@@ -30,9 +33,10 @@ class Circle:
 
 
 class Vehicle:
-    def __init__(self, position, direction, radius=50, color=RED):
+    def __init__(self, position, direction, radius=50, color=RED, stream=0):
         self.position = pygame.math.Vector2(position)
         self.direction = direction
+        self.stream = stream  # Id of this vehicle's random stream
         self.radius = radius
         self.color = color
         self.speed_scalling = 100
@@ -58,8 +62,8 @@ class Vehicle:
 
         self.sensor_color = GREEN
 
-    def update_direction(self):
-        self.direction += random.randint(-5, 5)
+    def update_direction(self, jitter):
+        self.direction += jitter
 
     def draw(self, surface):
         pygame.draw.circle(surface, self.color, self.position, self.radius)
@@ -73,7 +77,7 @@ class Vehicle:
     def calculate_sensor_position(self, sun_position):
         return self.position.distance_to(sun_position)
 
-    def move(self, sun_position):
+    def move(self, sun_position, jitter=0):
 
         forward_direction = pygame.math.Vector2(0, -1).rotate(self.direction)
         right_direction = forward_direction.rotate(-90)
@@ -114,7 +118,7 @@ class Vehicle:
         self.right_sensor_position = self.position + forward_direction * \
             self.sensor_offset - right_direction * (self.sensor_spacing/2)
 
-        self.update_direction()
+        self.update_direction(jitter)
 
         # debug/print info
         # text = font.render(
@@ -128,7 +132,9 @@ class Vehicle:
 
 
 sun = Circle((WIDTH//2, HEIGHT//2), radius=30, color=YELLOW)
+streams = RandomStreams(SEED)
 vehicle = Vehicle((300, 500), 45)
+step = 0
 
 running = True
 while running:
@@ -142,7 +148,9 @@ while running:
     screen.fill((0, 0, 0))  # Fill with black background
     # circle.move()
     sun.draw(screen)
-    vehicle.move(sun.position)
+    # Wander jitter for the step, keyed on (stream, step)
+    vehicle.move(sun.position, int(streams.integers(vehicle.stream, step, -5, 6)))
+    step += 1
     vehicle.draw(screen)
 
     pygame.display.flip()
@@ -1,6 +1,12 @@
-import random
+import numpy as np
 import pygame
 
+from field_texture import FieldTexture
+from hud import Hud
+from neighbours import CellList
+from random_streams import RandomStreams
+from stimulus_schedule import Schedule
+
 pygame.init()
 
 WIDTH, HEIGHT = 800, 600
@@ -19,8 +25,15 @@ RED = (255, 0, 0)
 GREEN = (0, 255, 0)
 
 FRICTION = False
+SEED = 0  # Friction jitter is drawn from per-vehicle streams of this seed
 INHIBITION = True
 CROSS = True
+MUTUAL = False  # Vehicles also sense each other as stimuli (M to toggle, N to add)
+MUTUAL_CUTOFF = 200  # Vehicles further apart than this ignore each other
+EMISSION = 1.0  # Stimulus strength of a vehicle relative to the sun
+TEXTURE = False  # Read sun distances from a baked field (X to toggle)
+SUN_MOTION = None  # "orbit", "pulse", "walk" or "path" to move the sun on a precomputed schedule
+SOURCES = 0  # Extra random-walking, pulsing stimuli sensed like the sun, e.g. 2000
 
 
 class Circle:
@@ -34,11 +47,14 @@ class Circle:
 
 
 class Vehicle:
-    def __init__(self, position, direction, radius=50, color=RED):
+    def __init__(self, position, direction, radius=50, color=RED, show_hud=True, stream=0):
         self.position = pygame.math.Vector2(position)
         self.direction = direction
+        self.stream = stream  # Id of this vehicle's random stream
         self.radius = radius
         self.color = color
+        self.show_hud = show_hud
+        self.hud = ()  # Status lines, drawn by the main loop
         self.speed_scalling = 100
         self.rotation_scalling = 5
 
@@ -57,8 +73,8 @@ class Vehicle:
 
         self.sensor_color = GREEN
 
-    def update_direction(self):
-        self.direction += random.randint(-5, 5)
+    def update_direction(self, jitter):
+        self.direction += jitter
 
     def draw(self, surface):
         pygame.draw.circle(surface, self.color, self.position, self.radius)
@@ -72,16 +88,31 @@ class Vehicle:
     def calculate_sensor_position(self, sun_position):
         return self.position.distance_to(sun_position)
 
-    def move(self, sun_position):
+    def sense(self, sensor_position, emitters):
+        # Other vehicles add to the sensor reading just like the sun does
+        signal = 0
+        for emitter in emitters:
+            signal += EMISSION / max(1, sensor_position.distance_to(emitter))
+        return signal
+
+    def move(self, sun_position, emitters=(), intensity=1.0, sources=None, jitter=0):
 
         forward_direction = pygame.math.Vector2(0, -1).rotate(self.direction)
         right_direction = forward_direction.rotate(-90)
 
-        left_distance = self.left_sensor_position.distance_to(sun_position)
-        right_distance = self.right_sensor_position.distance_to(sun_position)
+        if TEXTURE:
+            left_distance, right_distance = sun_field.sample(
+                [self.left_sensor_position, self.right_sensor_position])[:, 0]
+        else:
+            left_distance = self.left_sensor_position.distance_to(sun_position)
+            right_distance = self.right_sensor_position.distance_to(sun_position)
 
-        left_speed = self.speed_scalling * (1/left_distance)
-        right_speed = self.speed_scalling * (1/right_distance)
+        left_speed = self.speed_scalling * (
+            intensity/left_distance + self.sense(self.left_sensor_position, emitters)
+            + source_signal(self.left_sensor_position, sources))
+        right_speed = self.speed_scalling * (
+            intensity/right_distance + self.sense(self.right_sensor_position, emitters)
+            + source_signal(self.right_sensor_position, sources))
 
         speed = (left_speed + right_speed) / 2  # Average speed
 
@@ -109,22 +140,78 @@ class Vehicle:
             self.sensor_offset - right_direction * (self.sensor_spacing/2)
 
         if FRICTION:
-            self.update_direction()
+            self.update_direction(jitter)
+
+        if not self.show_hud:
+            return
 
         behavior = "Permanent Love (3a)" if not CROSS else "Explorer (3b)"
-        text1 = font.render(
+        self.hud = (
             f"Behavior: {behavior} | Cross: {CROSS} | Inhibition: {INHIBITION} | Friction: {FRICTION}",
-            True, WHITE)
-        text2 = font.render(
             f"Left Distance: {left_distance:.2f} Right Distance: {right_distance:.2f} Speed: {speed:.2f}",
-            True, WHITE)
-
-        screen.blit(text1, (10, 10))
-        screen.blit(text2, (10, 40))
+        )
+
+
+def find_emitters(vehicles):
+    # Positions of the other vehicles each vehicle can sense, found with a
+    # cell list so the cost grows with the neighbour count, not n squared
+    emitters = [[] for _ in vehicles]
+    if not MUTUAL or len(vehicles) < 2:
+        return emitters
+    cells = CellList(MUTUAL_CUTOFF, WIDTH, HEIGHT)
+    cells.build([(v.position.x, v.position.y) for v in vehicles])
+    i, j, offset, _ = cells.pairs()
+    for a, (dx, dy) in zip(i, offset):
+        emitters[a].append(vehicles[a].position + pygame.math.Vector2(dx, dy))
+    return emitters
+
+
+def source_signal(point, sources):
+    # Summed intensity / distance of the scheduled sources, all at once
+    if sources is None or not len(sources[0]):
+        return 0.0
+    positions, intensities = sources
+    distance = np.hypot(positions[:, 0] - point.x, positions[:, 1] - point.y)
+    return float((intensities / np.maximum(1, distance)).sum())
+
+
+def make_schedule():
+    # Source 0 is the sun, any others follow it
+    schedule = Schedule(seed=SEED, width=WIDTH, height=HEIGHT)
+    center = (WIDTH // 2, HEIGHT // 2)
+    if SUN_MOTION == "orbit":
+        schedule.add_orbit(center, radius=200, period=600)
+    elif SUN_MOTION == "pulse":
+        schedule.add_static([center], pulse_period=120, pulse_depth=0.8)
+    elif SUN_MOTION == "walk":
+        schedule.add_walk([center], step=3)
+    elif SUN_MOTION == "path":
+        schedule.add_path([(150, 150), (650, 150), (650, 450), (150, 450)], period=1200)
+    else:
+        schedule.add_static([center])
+    if SOURCES:
+        ids = np.arange(1, SOURCES + 1)
+        starts = np.column_stack((streams.uniform(ids, 0, 0, WIDTH, channel=3),
+                                  streams.uniform(ids, 0, 0, HEIGHT, channel=4)))
+        schedule.add_walk(starts, step=2, intensity=0.05, pulse_period=streams.uniform(ids, 0, 60, 240),
+                          pulse_phase=streams.uniform(ids, 0, 0, 2 * np.pi, channel=5))
+    return schedule
+
+
+def sun_distance(x, y):
+    return np.hypot(x - sun.position.x, y - sun.position.y)
 
 
 sun = Circle((WIDTH//2, HEIGHT//2), radius=30, color=YELLOW)
+sun_field = FieldTexture(sun_distance, WIDTH, HEIGHT)
+streams = RandomStreams(SEED)
 vehicle = Vehicle((300, 500), 45)
+vehicles = [vehicle]
+mutual_vehicles = []  # Added with N, removed when mutual mode is turned off
+hud = Hud(font, spacing=30)
+schedule = make_schedule() if SUN_MOTION or SOURCES else None
+step = 0
+sun_intensity, sources = 1.0, None
 
 running = True
 while running:
@@ -138,12 +225,45 @@ while running:
                 INHIBITION = not INHIBITION
             elif event.key == pygame.K_f:
                 FRICTION = not FRICTION
+            elif event.key == pygame.K_x:
+                TEXTURE = not TEXTURE
+            elif event.key == pygame.K_m:
+                MUTUAL = not MUTUAL
+                if not MUTUAL:
+                    # Drop the vehicles added with N; any others stay
+                    added = set(map(id, mutual_vehicles))
+                    vehicles = [v for v in vehicles if id(v) not in added]
+                    mutual_vehicles.clear()
+            elif event.key == pygame.K_n and MUTUAL:
+                # Add another vehicle at the mouse position; vehicles can be
+                # removed, so ids continue from the largest in use
+                stream = max(v.stream for v in vehicles) + 1
+                direction = int(streams.integers(stream, 0, 0, 361, channel=1))
+                mutual_vehicles.append(Vehicle(pygame.mouse.get_pos(), direction,
+                                               radius=30, show_hud=False, stream=stream))
+                vehicles.append(mutual_vehicles[-1])
 
     screen.fill((0, 0, 0))  # Fill with black background
+    if schedule:
+        positions, intensities = schedule.at(step)
+        sun.position = pygame.math.Vector2(positions[0].tolist())
+        sun_intensity, sources = intensities[0], (positions[1:], intensities[1:])
+        for x, y in positions[1:].tolist():
+            screen.set_at((int(x), int(y)), WHITE)
     # circle.move()
-    sun.draw(screen)
-    vehicle.move(sun.position)
-    vehicle.draw(screen)
+    pygame.draw.circle(screen, sun.color, sun.position, sun.radius * min(1.5, sun_intensity) ** 0.5)
+    if TEXTURE:
+        sun_field.update((sun.position.x, sun.position.y))
+    # Friction jitter for every vehicle in one draw, keyed on (stream, step)
+    jitter = [0] * len(vehicles)
+    if FRICTION:
+        jitter = streams.integers([v.stream for v in vehicles], step, -5, 6).tolist()
+    for v, emitters, turn in zip(vehicles, find_emitters(vehicles), jitter):
+        v.move(sun.position, emitters, sun_intensity, sources, turn)
+        v.draw(screen)
+    step += 1
+    hud.set(vehicle.hud)
+    hud.draw(screen)
 
     pygame.display.flip()
 
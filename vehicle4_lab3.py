@@ -1,7 +1,8 @@
 import math
-import random
 import pygame
 
+from random_streams import RandomStreams
+
 pygame.init()
 
 WIDTH, HEIGHT = 1200, 800
@@ -20,6 +21,7 @@ RED = (255, 0, 0)
 GREEN = (0, 255, 0)
 
 FRICTION = False
+SEED = 0  # Friction jitter is drawn from per-vehicle streams of this seed
 INHIBITION = True
 CROSS = True
 
@@ -59,9 +61,10 @@ class Circle:
 
 
 class Vehicle:
-    def __init__(self, position, direction, radius=50, color=RED):
+    def __init__(self, position, direction, radius=50, color=RED, stream=0):
         self.position = pygame.math.Vector2(position)
         self.direction = direction
+        self.stream = stream  # Id of this vehicle's random stream
         self.radius = radius
         self.color = color
         self.speed_scalling = 100
@@ -82,8 +85,8 @@ class Vehicle:
 
         self.sensor_color = GREEN
 
-    def update_direction(self):
-        self.direction += random.randint(-5, 5)
+    def update_direction(self, jitter):
+        self.direction += jitter
 
     def draw(self, surface):
         pygame.draw.circle(surface, self.color, self.position, self.radius)
@@ -97,7 +100,7 @@ class Vehicle:
     def calculate_sensor_position(self, sun_position):
         return self.position.distance_to(sun_position)
 
-    def move(self, sun_position):
+    def move(self, sun_position, jitter=0):
 
         forward_direction = pygame.math.Vector2(0, -1).rotate(self.direction)
         right_direction = forward_direction.rotate(-90)
@@ -141,7 +144,7 @@ class Vehicle:
             self.sensor_offset - right_direction * (self.sensor_spacing/2)
 
         if FRICTION:
-            self.update_direction()
+            self.update_direction(jitter)
 
         behavior = f"Vehicle {VEHICLE_TYPE.upper()}"
         text1 = font.render(
@@ -156,7 +159,9 @@ class Vehicle:
 
 
 sun = Circle((WIDTH//2, HEIGHT//2), radius=30, color=YELLOW)
+streams = RandomStreams(SEED)
 vehicle = Vehicle((300, 500), 45)
+step = 0
 
 running = True
 while running:
@@ -176,7 +181,9 @@ while running:
     screen.fill((0, 0, 0))  # Fill with black background
     # circle.move()
     sun.draw(screen)
-    vehicle.move(sun.position)
+    # Friction jitter for the step, keyed on (stream, step)
+    vehicle.move(sun.position, int(streams.integers(vehicle.stream, step, -5, 6)) if FRICTION else 0)
+    step += 1
     vehicle.draw(screen)
 
     pygame.display.flip()
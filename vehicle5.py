@@ -1,8 +1,15 @@
 import math
-import random
 import pygame
 import time
 
+from analytics import TrajectoryAnalytics
+from entities import DOUBLE, Entity, Field, Vector2, memory_report
+from hud import cache
+from lod import FULL, PIXEL, LevelOfDetail
+from random_streams import RandomStreams
+from scenario import Scenario
+from telemetry import TelemetryWriter
+
 pygame.init()
 
 WIDTH, HEIGHT = 1200, 800
@@ -30,8 +37,22 @@ FRIEND_FREQUENCY_MIN = 2.0
 FRIEND_FREQUENCY_MAX = 3.0
 FRIEND_MAX_SPEED = 2.5
 
+TELEMETRY_PATH = None  # e.g. "vehicle5.csv", "vehicle5.jsonl" or "vehicle5_columns"
+TELEMETRY_EVERY = 1  # Log one frame in N
+SEED = 0  # Target headings are drawn from per-vehicle streams of this seed
+SCENARIO = None  # e.g. "scenarios/vehicle5.toml" for the vehicle and targets
+ANALYTICS = False  # Running path and friend_detected statistics, printed on exit
+MEMORY_REPORT = False  # Print the bytes used per entity type on exit
+
+streams = RandomStreams(SEED)
+
 
-class ThresholdDevice:
+class ThresholdDevice(Entity):
+    __slots__ = ("name", "threshold", "delay")
+    input_sum = Field()
+    output = Field()
+    activation_time = Field(dtype=DOUBLE)  # Run time; float32 loses milliseconds on long runs
+    is_calculating = Field(kind=bool)
 
     def __init__(self, threshold=1.0, delay=0.1, name="Unnamed"):
         self.threshold = threshold
@@ -58,75 +79,100 @@ class ThresholdDevice:
         return self.output
 
 
-class TargetVehicle:
+class TargetVehicle(Entity):
     """Represents other vehicles in the environment."""
 
-    def __init__(self, position, color, frequency, speed, label="Target"):
-        self.position = pygame.math.Vector2(position)
-        self.radius = 25
+    __slots__ = ("color", "label", "frequency", "speed")
+    position = Field(2, Vector2)
+    direction = Field(wrap=360)
+    buzz_phase = Field(wrap=2 * math.pi)
+    radius = 25
+
+    def __init__(self, position, color, frequency, speed, label="Target", stream=0):
+        self.position = position
         self.color = color
         self.frequency = frequency
         self.speed = speed
         self.label = label
-        self.direction = random.uniform(0, 360)
+        self.direction = float(streams.uniform(stream, 0, 0, 360))
         self.buzz_phase = 0.0
 
     def update(self, dt):
         direction_vec = pygame.math.Vector2(0, -1).rotate(self.direction)
-        self.position += direction_vec * self.speed * dt * 50
+        # Work on a copy, the stored position is written back once
+        position = self.position + direction_vec * self.speed * dt * 50
         bounced = False
-        if self.position.x <= self.radius:
-            self.position.x = self.radius
+        if position.x <= self.radius:
+            position.x = self.radius
             direction_vec.x *= -1
             bounced = True
-        elif self.position.x >= WIDTH - self.radius:
-            self.position.x = WIDTH - self.radius
+        elif position.x >= WIDTH - self.radius:
+            position.x = WIDTH - self.radius
             direction_vec.x *= -1
             bounced = True
-        if self.position.y <= self.radius:
-            self.position.y = self.radius
+        if position.y <= self.radius:
+            position.y = self.radius
             direction_vec.y *= -1
             bounced = True
-        elif self.position.y >= HEIGHT - self.radius:
-            self.position.y = HEIGHT - self.radius
+        elif position.y >= HEIGHT - self.radius:
+            position.y = HEIGHT - self.radius
             direction_vec.y *= -1
             bounced = True
+        self.position = position
         if bounced:
             self.direction = pygame.math.Vector2(0, -1).angle_to(direction_vec)
         self.buzz_phase += self.frequency * dt * 2 * math.pi
 
     def get_buzz_intensity(self): return (math.sin(self.buzz_phase) + 1) / 2
 
-    def draw(self, surface):
+    def draw(self, surface, level=FULL):
+        if level == PIXEL:
+            surface.set_at((int(self.position.x), int(self.position.y)), self.color)
+            return
         pygame.draw.circle(surface, self.color, self.position, self.radius)
+        if level != FULL:
+            return
         if self.frequency > 0:
             pygame.draw.circle(surface, WHITE, self.position,
                                int(3 + self.get_buzz_intensity() * 8))
-        speed_text = small_font.render(f"Speed: {self.speed:.1f}", True, WHITE)
-        surface.blit(speed_text, (self.position.x - 30,
-                     self.position.y + self.radius + 5))
-        freq_text = small_font.render(
-            f"Freq: {self.frequency:.1f} Hz", True, WHITE)
-        surface.blit(freq_text, (self.position.x - 30,
-                     self.position.y + self.radius + 20))
-        label_text = small_font.render(self.label, True, WHITE)
-        surface.blit(label_text, (self.position.x - 20,
-                     self.position.y - self.radius - 20))
-
-
-class Vehicle5:
+        cache.blit(surface, small_font, f"Speed: {self.speed:.1f}",
+                   (self.position.x - 30, self.position.y + self.radius + 5))
+        cache.blit(surface, small_font, f"Freq: {self.frequency:.1f} Hz",
+                   (self.position.x - 30, self.position.y + self.radius + 20))
+        cache.blit(surface, small_font, self.label,
+                   (self.position.x - 20, self.position.y - self.radius - 20))
+
+
+BRAIN_SIGNALS = ("c_in", "f_in", "s_in", "c_out", "f_out", "s_out", "r_out", "motor_out")
+
+
+class Vehicle5(Entity):
+    __slots__ = ("color", "last_friend", "color_detector", "frequency_detector",
+                 "speed_detector", "recognition_gate", "motor_controller", "initial_position")
+    position = Field(2, Vector2)
+    direction = Field(wrap=360)
+    speed = Field()
+    friend_detected = Field(kind=bool)
+    # Brain signals of the last update, read through brain_state
+    c_in = Field()
+    f_in = Field()
+    s_in = Field()
+    c_out = Field()
+    f_out = Field()
+    s_out = Field()
+    r_out = Field()
+    motor_out = Field()
+    radius = 35
+    detection_range = 300
 
     def __init__(self, position):
-        self.position = pygame.math.Vector2(position)
-        self.initial_position = pygame.math.Vector2(position)
-        self.radius = 35
+        self.position = position
+        self.initial_position = Vector2(position)
         self.color = BLUE
         self.direction = 0.0
         self.speed = 0.0
-        self.detection_range = 300
         self.last_friend = None
         self.friend_detected = False
-        self.brain_state = {}
         # Brain components
         self.color_detector = ThresholdDevice(
             threshold=0.9, delay=0.1, name="Color")
@@ -177,8 +223,13 @@ class Vehicle5:
             self.friend_detected = False
             self.last_friend = None
 
-        self.brain_state = {'c_in': c_in, 'f_in': f_in, 's_in': s_in, 'c_out': c_out,
-                            'f_out': f_out, 's_out': s_out, 'r_out': r_out, 'motor_out': motor_out}
+        self.c_in, self.f_in, self.s_in = c_in, f_in, s_in
+        self.c_out, self.f_out, self.s_out = c_out, f_out, s_out
+        self.r_out, self.motor_out = r_out, motor_out
+
+    @property
+    def brain_state(self):
+        return {name: getattr(self, name) for name in BRAIN_SIGNALS}
 
     def update(self, targets, current_time, dt):
         self.update_brain(targets, current_time)
@@ -209,8 +260,7 @@ class Vehicle5:
                              self.last_friend.position, 2)
 
     def draw_brain_state(self, surface, x=10, y=70):
-        title = font.render("Threshold Device Brain State:", True, WHITE)
-        surface.blit(title, (x, y))
+        cache.blit(surface, font, "Threshold Device Brain State:", (x, y))
         y += 25
         devices = [("Color", self.color_detector, self.brain_state.get('c_out')), ("Frequency", self.frequency_detector,
                                                                                    self.brain_state.get('f_out')), ("Speed", self.speed_detector, self.brain_state.get('s_out'))]
@@ -219,15 +269,17 @@ class Vehicle5:
             text = f"{name}: {device.input_sum:.2f} -> {output:.0f}"
             if device.is_calculating and output == 0:
                 text += " (calculating...)"
-            surface.blit(small_font.render(text, True, color), (x, y))
+            cache.blit(surface, small_font, text, (x, y), color)
             y += 18
         recog_color = GREEN if self.brain_state.get('r_out') > 0 else GRAY
-        surface.blit(small_font.render(
-            f"Recognition: {self.recognition_gate.input_sum:.2f} -> {self.brain_state.get('r_out'):.0f}", True, recog_color), (x, y))
+        cache.blit(surface, small_font,
+                   f"Recognition: {self.recognition_gate.input_sum:.2f} -> {self.brain_state.get('r_out'):.0f}",
+                   (x, y), recog_color)
         y += 18
         motor_color = RED if self.brain_state.get('motor_out') > 0 else GRAY
-        surface.blit(small_font.render(
-            f"Motor Control: {self.motor_controller.input_sum:.2f} -> {self.brain_state.get('motor_out'):.0f}", True, motor_color), (x, y))
+        cache.blit(surface, small_font,
+                   f"Motor Control: {self.motor_controller.input_sum:.2f} -> {self.brain_state.get('motor_out'):.0f}",
+                   (x, y), motor_color)
         y += 18
 
     def reset(self):
@@ -237,20 +289,30 @@ class Vehicle5:
 
 
 def simulation():
+    if SCENARIO:
+        scenario = Scenario.load(SCENARIO)
+        v5 = Vehicle5(tuple(scenario.positions[0]))
+        return v5, [TargetVehicle(target["position"], tuple(target["color"]), target["frequency"],
+                                  target["speed"], target.get("label", "Target"), stream=k)
+                    for k, target in enumerate(scenario.targets)]
+
     v5 = Vehicle5((WIDTH // 2, HEIGHT // 2))
     friend = TargetVehicle(position=(
-        150, HEIGHT // 2), color=FRIEND_COLOR, frequency=2.5, speed=2.0, label="FRIEND")
+        150, HEIGHT // 2), color=FRIEND_COLOR, frequency=2.5, speed=2.0, label="FRIEND", stream=0)
     # friend.direction = -90  # Move directly right
     decoys = [
-        TargetVehicle((WIDTH - 150, 150), RED, 2.5, 1.5, "Wrong Color"),
-        TargetVehicle((150, 150), FRIEND_COLOR, 0.5, 1.8, "Wrong Frequency"),
+        TargetVehicle((WIDTH - 150, 150), RED, 2.5, 1.5, "Wrong Color", stream=1),
+        TargetVehicle((150, 150), FRIEND_COLOR, 0.5, 1.8, "Wrong Frequency", stream=2),
         TargetVehicle((WIDTH - 150, HEIGHT - 150),
-                      FRIEND_COLOR, 2.5, 4.0, "Too Fast"),
+                      FRIEND_COLOR, 2.5, 4.0, "Too Fast", stream=3),
     ]
     return v5, [friend] + decoys
 
 
 vehicle5, targets = simulation()
+lod = LevelOfDetail()  # Labels and buzz rings only while few targets are on screen
+telemetry = TelemetryWriter(TELEMETRY_PATH, every=TELEMETRY_EVERY) if TELEMETRY_PATH else None
+analytics = TrajectoryAnalytics(1) if ANALYTICS else None
 running = True
 start_time = time.time()
 while running:
@@ -262,18 +324,33 @@ while running:
         if event.type == pygame.KEYDOWN and event.key == pygame.K_r:
             vehicle5, targets = simulation()
             start_time = time.time()
+            analytics = TrajectoryAnalytics(1) if ANALYTICS else None
     screen.fill((20, 20, 40))
+    level = lod.level(len(targets), targets[0].radius if targets else 0)
     for target in targets:
         target.update(dt)
-        target.draw(screen)
+    with lod.measure(level, len(targets)):
+        for target in targets:
+            target.draw(screen, level)
     vehicle5.update(targets, current_time, dt)
+    if analytics:
+        analytics.update(vehicle5.position, vehicle5.direction, dt=dt,
+                         friend_detected=vehicle5.friend_detected)
+    if telemetry:
+        telemetry.write({"time": current_time, "x": vehicle5.position.x, "y": vehicle5.position.y,
+                         "speed": vehicle5.speed, "friend_detected": int(vehicle5.friend_detected),
+                         **vehicle5.brain_state})
     vehicle5.draw(screen)
-    title_text = font.render("Braitenberg Vehicle 5", True, WHITE)
-    screen.blit(title_text, (10, 10))
-    control_text = small_font.render(
-        "Press 'R' to reset simulation.", True, WHITE)
-    screen.blit(control_text, (10, 50))
+    cache.blit(screen, font, "Braitenberg Vehicle 5", (10, 10))
+    cache.blit(screen, small_font, "Press 'R' to reset simulation.", (10, 50))
     vehicle5.draw_brain_state(screen)
     pygame.display.flip()
 
+if telemetry:
+    telemetry.close()
+if analytics:
+    print("\n".join(analytics.report()))
+if MEMORY_REPORT:
+    for kind, usage in memory_report().items():
+        print(f"{kind}: {usage['count']} x {usage['bytes_each']} bytes")
 pygame.quit()
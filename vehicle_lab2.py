@@ -1,6 +1,10 @@
-import random
+import numpy as np
 import pygame
 
+from collisions import CollisionResolver
+from random_streams import RandomStreams
+from scenario import Scenario
+
 pygame.init()
 
 WIDTH, HEIGHT = 800, 600
@@ -45,8 +49,8 @@ class Vehicle:
             pygame.math.Vector2(0, -self.sensor_offset).rotate(self.direction)
         self.sensor_color = GREEN
 
-    def update_direction(self):
-        self.direction += random.randint(-5, 5)
+    def update_direction(self, amount):
+        self.direction += amount
 
     def draw(self, surface):
         pygame.draw.circle(surface, self.color, self.position, self.radius)
@@ -78,22 +82,37 @@ class Vehicle:
         self.normalize_direction()  # Add this line
 
 
-def check_collision(vehicle1, vehicle2):
-    distance = vehicle1.position.distance_to(vehicle2.position)
-    return distance < (vehicle1.radius + vehicle2.radius)
-
-
 sun = Circle((WIDTH//2, HEIGHT//2), radius=30, color=YELLOW)
 
 
-vehicles = []
-for _ in range(10):
-    vehicle = Vehicle((random.randint(0, WIDTH), random.randint(0, HEIGHT)),
-                      random.randint(0, 360), radius=30, color=(random.randint(0, 255), random.randint(0, 255), random.randint(0, 255)))
-    vehicles.append(vehicle)
+# Spawning and wandering draw from per-vehicle streams: one vectorized draw
+# per quantity for the whole population, reproducible for a given SEED
+SEED = 0
+COUNT = 10
+SCENARIO = None  # e.g. "scenarios/lab2.json" to load the population instead
+streams = RandomStreams(SEED)
+
+if SCENARIO:
+    scenario = Scenario.load(SCENARIO)
+    COUNT = len(scenario)
+    sun.position = pygame.math.Vector2(scenario.sun)
+    xs, ys = np.asarray(scenario.positions).T
+    directions = scenario.directions
+    ids = np.arange(COUNT)
+else:
+    ids = np.arange(COUNT)
+    xs = streams.integers(ids, 0, 0, WIDTH + 1, channel=0)
+    ys = streams.integers(ids, 0, 0, HEIGHT + 1, channel=1)
+    directions = streams.integers(ids, 0, 0, 361, channel=2)
+colors = np.stack([streams.integers(ids, 0, 0, 256, channel=3 + c) for c in range(3)], axis=1)
+vehicles = [Vehicle((int(x), int(y)), int(direction), radius=30, color=tuple(color.tolist()))
+            for x, y, direction, color in zip(xs, ys, directions, colors)]
+
+collisions = CollisionResolver(WIDTH, HEIGHT, max(v.radius for v in vehicles))
 
 last_update_time = 0
 update_interval = 240
+updates = 0
 
 running = True
 while running:
@@ -106,25 +125,19 @@ while running:
 
     current_time = pygame.time.get_ticks()
     if current_time - last_update_time > update_interval:
-        for vehicle in vehicles:
-            vehicle.update_direction()
+        updates += 1
+        jitter = streams.integers(ids, updates, -5, 6)
+        for vehicle, amount in zip(vehicles, jitter.tolist()):
+            vehicle.update_direction(amount)
         last_update_time = current_time
 
-    for i in range(len(vehicles)):
-        for j in range(i + 1, len(vehicles)):
-            if check_collision(vehicles[i], vehicles[j]):
-                collision_vector = vehicles[i].position - vehicles[j].position
-                collision_vector.normalize_ip()
-
-                direction1 = pygame.math.Vector2(0, -1).rotate(vehicles[i].direction)
-                direction2 = pygame.math.Vector2(0, -1).rotate(vehicles[j].direction)
-
-                reflected1 = (direction1 - 2 * direction1.dot(collision_vector) * collision_vector)
-                reflected2 = (direction2 - 2 * direction2.dot(-collision_vector) * -collision_vector)
-
-                vehicles[i].direction = reflected1.angle_to(pygame.math.Vector2(0, -1))
-                vehicles[j].direction = reflected2.angle_to(pygame.math.Vector2(0, -1))
-
+    # All contacts are resolved together: reflected headings and de-penetration
+    positions, directions, _, _ = collisions.resolve(
+        [(v.position.x, v.position.y) for v in vehicles],
+        [v.direction for v in vehicles], [v.radius for v in vehicles])
+    for vehicle, position, direction in zip(vehicles, positions.tolist(), directions.tolist()):
+        vehicle.position.update(position)
+        vehicle.direction = direction
 
     for vehicle in vehicles:
         vehicle.move(sun.position)
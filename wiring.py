@@ -0,0 +1,60 @@
+import numpy as np
+
+# Two-sensor, two-motor patterns: rows are motors (left, right), columns sensors
+UNCROSSED = np.eye(2)
+CROSSED = np.array([[0.0, 1.0], [1.0, 0.0]])
+
+
+def pair(crossed=False, inhibitory=False, gain=1.0):
+    """Classic Braitenberg connection of a left/right sensor pair to the
+    left/right motors: crossed or uncrossed, excitatory or inhibitory."""
+    return (CROSSED if crossed else UNCROSSED) * (-gain if inhibitory else gain)
+
+
+class Wiring:
+    """Sensor layout and sensor -> motor weights shared by a population.
+
+    `sensors` are (forward, right) offsets from the vehicle centre, with
+    heading 0 pointing up the screen and angles in degrees clockwise (the
+    Vector2(0, -1).rotate(heading) convention of the scripts). Every sensor
+    reads `channels` stimulus channels, so a vehicle's inputs are a
+    (channels, sensors) array. `weights` is (motors, channels, sensors), or
+    (motors, sensors) for one channel; `bias` is added to every motor.
+    motors() evaluates a whole population as one matrix multiply.
+    """
+
+    def __init__(self, sensors, weights, bias=0.0):
+        self.sensors = np.asarray(sensors, dtype=float).reshape(-1, 2)
+        weights = np.asarray(weights, dtype=float)
+        if weights.ndim == 2:
+            weights = weights[:, None, :]
+        motors, self.channels, count = weights.shape
+        if count != len(self.sensors):
+            raise ValueError(f"weights are for {count} sensors, the layout has {len(self.sensors)}")
+        self.weights = weights.reshape(motors, -1)
+        self.bias = np.broadcast_to(np.asarray(bias, dtype=float), (motors,)).copy()
+
+    @classmethod
+    def two_sensor(cls, offset, spacing, patterns, bias=0.0):
+        """Left/right sensors `offset` ahead and `spacing` apart, with one 2x2
+        pattern (see pair()) per channel."""
+        sensors = [(offset, -spacing / 2), (offset, spacing / 2)]
+        return cls(sensors, np.stack([np.asarray(p, dtype=float) for p in patterns], axis=1), bias)
+
+    @property
+    def motor_count(self):
+        return len(self.weights)
+
+    def sensor_positions(self, positions, headings):
+        """World positions of every sensor, shape (n, sensors, 2)."""
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        radians = np.radians(np.asarray(headings, dtype=float).reshape(-1))
+        forward = np.column_stack((np.sin(radians), -np.cos(radians)))
+        right = np.column_stack((np.cos(radians), np.sin(radians)))
+        return (positions[:, None, :] + self.sensors[None, :, 0, None] * forward[:, None, :]
+                + self.sensors[None, :, 1, None] * right[:, None, :])
+
+    def motors(self, inputs):
+        """Motor outputs (n, motors) for inputs of shape (n, channels, sensors)."""
+        inputs = np.asarray(inputs, dtype=float)
+        return inputs.reshape(len(inputs), -1) @ self.weights.T + self.bias